@@ -3,7 +3,7 @@ from __future__ import annotations
 import re
 from collections import defaultdict
 from io import BytesIO, StringIO
-from typing import List, Sequence, Set, cast
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, cast
 
 import orjson
 import sm.outputs.semantic_model as O
@@ -28,6 +28,7 @@ from drepr.models.prelude import (
     ResourceType,
 )
 from kgdata.misc.resource import RDFResource
+from peewee import chunked
 from rdflib import RDF, Graph, URIRef
 from sand.config import AppConfig
 from sand.extension_interface.export import IExport
@@ -41,6 +42,9 @@ from sand_drepr.resources import get_entity_resource, get_table_resource
 from sand_drepr.semanticmodel import get_drepr_sm, get_entity_data_nodes
 from sand_drepr.transformation import get_transformation, has_transformation
 
+# number of rows converted at a time when exporting data as a stream
+EXPORT_CHUNK_SIZE = 10000
+
 
 class DreprExport(IExport):
     @inject
@@ -114,14 +118,38 @@ class DreprExport(IExport):
         }
 
         content = convert(
-            repr=self.export_drepr_model(table, sm),
+            repr=self.export_drepr_model(table, sm, len(rows)),
             resources=resources,
             format=output_format,
         )
         return self.post_processing(sm, content, output_format)
 
-    def export_drepr_model(self, table: Table, sm: O.SemanticModel) -> DRepr:
-        """Create a D-REPR model of the dataset."""
+    def export_data_stream(
+        self,
+        table: Table,
+        rows: Iterable[TableRow],
+        sm: O.SemanticModel,
+        output_format: OutputFormat,
+    ) -> Iterator[str]:
+        """Convert a relational table into RDF format, chunk by chunk of rows. New
+        entities & nodes without URIs are blank nodes with random ids, so the outputs of
+        the chunks can be concatenated.
+        """
+        if self.has_post_processing(sm):
+            # post-processing links resources across all rows of the table
+            yield from super().export_data_stream(table, rows, sm, output_format)
+            return
+
+        for chunk in chunked(rows, EXPORT_CHUNK_SIZE):
+            content = self.export_data(table, chunk, sm, output_format)
+            yield content if content.endswith("\n") else content + "\n"
+
+    def export_drepr_model(
+        self, table: Table, sm: O.SemanticModel, n_rows: Optional[int] = None
+    ) -> DRepr:
+        """Create a D-REPR model of the dataset (or of the first `n_rows` rows)."""
+        if n_rows is None:
+            n_rows = table.size
         columns = [slugify(c).replace("-", "_") for c in table.columns]
 
         existing_attr_names = {}
@@ -148,7 +176,7 @@ class DreprExport(IExport):
                 resource_id="table",
                 path=Path(
                     steps=[
-                        RangeExpr(start=1, end=table.size + 1, step=1),
+                        RangeExpr(start=1, end=n_rows + 1, step=1),
                         IndexExpr(val=ci),
                     ]
                 ),
@@ -162,7 +190,7 @@ class DreprExport(IExport):
                 resource_id="entity",
                 path=Path(
                     steps=[
-                        RangeExpr(start=1, end=table.size + 1, step=1),
+                        RangeExpr(start=1, end=n_rows + 1, step=1),
                         IndexExpr(val=node.col_index),
                     ]
                 ),
@@ -200,7 +228,7 @@ class DreprExport(IExport):
                         resource_id="table",
                         path=Path(
                             steps=[
-                                RangeExpr(start=1, end=table.size + 1, step=1),
+                                RangeExpr(start=1, end=n_rows + 1, step=1),
                                 IndexExpr(val=node.col_index),
                             ]
                         ),
@@ -247,12 +275,7 @@ class DreprExport(IExport):
 
         1. D-REPR doesn't generate relationships for literals that have outgoing edges to class nodes
         """
-        outliterals = []
-        for node in sm.iter_nodes():
-            if isinstance(node, O.LiteralNode):
-                if sm.out_degree(node.id) > 0:
-                    outliterals.append(node)
-
+        outliterals = self.get_literals_with_outgoing_edges(sm)
         if len(outliterals) == 0:
             return ttldata
 
@@ -286,3 +309,15 @@ class DreprExport(IExport):
         file = BytesIO()
         g.serialize(file, format="turtle")
         return file.getvalue().decode()
+
+    def has_post_processing(self, sm: O.SemanticModel) -> bool:
+        return len(self.get_literals_with_outgoing_edges(sm)) > 0
+
+    def get_literals_with_outgoing_edges(
+        self, sm: O.SemanticModel
+    ) -> List[O.LiteralNode]:
+        return [
+            node
+            for node in sm.iter_nodes()
+            if isinstance(node, O.LiteralNode) and sm.out_degree(node.id) > 0
+        ]
@@ -1,21 +1,24 @@
 import os
+import tempfile
 
 from dependency_injector.wiring import Provide, inject
 from flask import jsonify
-from gena import generate_api, generate_app, generate_readonly_api_4dict
+from gena import generate_app, generate_readonly_api_4dict
+from playhouse.pool import PooledDatabase
 from sm.misc.funcs import identity_func
 from werkzeug.exceptions import HTTPException
 
-import sand.deserializer as sand_deser
 import sand.serializer as sand_ser
 from sand.controllers.assistant import assistant_bp
 from sand.controllers.project import project_bp
 from sand.controllers.search import search_bp
+from sand.controllers.semantic_model import semantic_model_bp
 from sand.controllers.settings import setting_bp
 from sand.controllers.table import table_bp, table_row_bp
 from sand.controllers.transformation import transformation_bp
+from sand.helpers.json_provider import ORJSONProvider
 from sand.helpers.namespace import NamespaceService
-from sand.models import EntityAR, SemanticModel
+from sand.models import EntityAR, db
 from sand.models.ontology import OntClassAR, OntPropertyAR
 
 
@@ -35,11 +38,7 @@ def get_flask_app(
             setting_bp,
             search_bp,
             transformation_bp,
-            generate_api(
-                SemanticModel,
-                deserializers={"data": sand_deser.deserialize_graph},
-                batch_serialize=sand_ser.batch_serialize_sms,
-            ),
+            semantic_model_bp,
             generate_readonly_api_4dict(
                 "entities",
                 serialize=sand_ser.serialize_entity,
@@ -74,5 +73,21 @@ def get_flask_app(
             e.code,
         )
 
-    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # maximum upload of 16 MB
+    if isinstance(db.obj, PooledDatabase):
+        # each request uses its own connection and returns it to the pool afterward
+        @app.before_request
+        def open_db_connection():
+            db.connect(reuse_if_open=True)
+
+        @app.teardown_request
+        def close_db_connection(exc):
+            if not db.is_closed():
+                db.close()
+
+    # responses of views decorated with `orjson_response` are encoded with orjson
+    app.json = ORJSONProvider(app)
+    # maximum size of a request, larger files are sent in chunks through upload sessions
+    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
+    # where files of upload sessions are assembled
+    app.config["UPLOAD_DIR"] = os.path.join(tempfile.gettempdir(), "sand-uploads")
     return app
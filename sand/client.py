@@ -1,4 +1,3 @@
-from dataclasses import asdict
 from functools import lru_cache
 from pathlib import Path
 from typing import Union
@@ -60,16 +59,22 @@ class Client:
             column: column index
             links: list of links of each cell. A cell may have more than one link or no links.
         """
-        for ri, clinks in enumerate(links):
-            rowid = self.table_rows.get_one(
-                {"table": table_id, "index": ri, "fields": "id"}
-            )["id"]
-            resp = requests.put(
-                f"{self.table_rows.endpoint}/{rowid}/cells/{column}",
-                json={"links": [asdict(l) for l in clinks]},
-            )
-            self.table_rows.assert_resp(resp)
-            assert resp.json()["success"]
+        resp = requests.put(
+            f"{self.table_rows.endpoint}/cells",
+            json={
+                "table": table_id,
+                "patches": [
+                    {
+                        "index": ri,
+                        "column": column,
+                        "links": [l.to_dict() for l in clinks],
+                    }
+                    for ri, clinks in enumerate(links)
+                ],
+            },
+        )
+        self.table_rows.assert_resp(resp)
+        assert resp.json()["success"]
 
     def get_column_links(self, table_id: int, column: int) -> list[list[Link]]:
         """Get annotated links of a column of a table.
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import click
+import zstandard
+from loguru import logger
+from peewee import Field, SqliteDatabase
+
+from sand.commands.migrate import has_column, rewrite_column
+from sand.container import use_container
+from sand.models import CompressionDictionary, all_tables
+from sand.models import db as dbconn
+from sand.models import init_db
+from sand.models.base import BlobField, PackedField, codec, get_column_name
+
+
+@click.command(name="compress")
+@click.option("-d", "--db", required=True, help="sand database file or url")
+@click.option(
+    "-c",
+    "--config",
+    help="Path to the configuration file",
+)
+@click.option(
+    "--dict-size",
+    type=int,
+    default=112640,
+    help="maximum size (in bytes) of the dictionary of a column",
+)
+@click.option(
+    "--samples",
+    type=int,
+    default=10000,
+    help="number of values sampled to train the dictionary of a column",
+)
+@click.option("--level", type=int, default=3, help="compression level")
+@click.option(
+    "--decompress",
+    is_flag=True,
+    help="rewrite values uncompressed instead (e.g., before turning compression off)",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=1000,
+    help="number of records updated per transaction",
+)
+@click.option(
+    "--vacuum", is_flag=True, help="reclaim the freed space afterward (sqlite)"
+)
+def compress(
+    db: str,
+    config: Optional[str],
+    dict_size: int,
+    samples: int,
+    level: int,
+    decompress: bool,
+    batch_size: int,
+    vacuum: bool,
+):
+    """Train zstd dictionaries on blob columns (rows, column chunks, semantic models) and
+    rewrite their values compressed. Set `db.compression` to zstd in the configuration
+    so that new values are compressed as well.
+    """
+    with use_container(config) as container:
+        init_db(db, container.appcfg().db)
+        dbconn.create_tables([CompressionDictionary], safe=True)
+        codec.configure(not decompress, level)
+
+        for field in get_compressed_fields():
+            table_name = field.model._meta.table_name
+            if not has_column(table_name, field.column_name):
+                continue
+            if not decompress:
+                train_dictionary(field, dict_size, samples)
+
+            column = get_column_name(field)
+
+            def rewrite(value):
+                newvalue = codec.decompress(value)
+                if not decompress:
+                    newvalue = codec.compress(column, bytes(newvalue))
+                return newvalue if newvalue != value else None
+
+            rewrite_column(
+                table_name,
+                field.column_name,
+                rewrite,
+                batch_size,
+                desc=f"{'decompressing' if decompress else 'compressing'} {column}",
+            )
+
+        if vacuum and isinstance(dbconn.obj, SqliteDatabase):
+            dbconn.execute_sql("VACUUM")
+
+
+def get_compressed_fields() -> list[Field]:
+    return [
+        field
+        for model in all_tables
+        for field in model._meta.sorted_fields
+        if isinstance(field, (BlobField, PackedField))
+    ]
+
+
+def train_dictionary(field: Field, dict_size: int, n_samples: int):
+    """Train a dictionary on a random sample of values of a column and make it the
+    dictionary used to compress new values of the column"""
+    table_name, column = field.model._meta.table_name, field.column_name
+    samples = [
+        bytes(codec.decompress(value))
+        for (value,) in dbconn.execute_sql(
+            f'SELECT "{column}" FROM {table_name} WHERE "{column}" IS NOT NULL '
+            f"ORDER BY RANDOM() LIMIT {dbconn.param}",
+            (n_samples,),
+        )
+    ]
+    try:
+        zdict = zstandard.train_dictionary(dict_size, samples, level=codec.level)
+    except zstandard.ZstdError as e:
+        # happens when there are too few samples, values are compressed without dictionary
+        logger.warning(
+            "Skip training dictionary of {}.{} ({} samples): {}",
+            table_name,
+            column,
+            len(samples),
+            e,
+        )
+        return
+
+    if CompressionDictionary.get_or_none(dict_id=zdict.dict_id()) is None:
+        CompressionDictionary.create(
+            name=get_column_name(field), dict_id=zdict.dict_id(), data=zdict.as_bytes()
+        )
+    codec.load()
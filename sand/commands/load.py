@@ -1,17 +1,39 @@
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import (
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sized,
+    Tuple,
+)
 
 import click
+import orjson
+import sm.outputs.semantic_model as O
 from dependency_injector.wiring import Provide, inject
+from peewee import chunked
 from sm.dataset import Dataset, Example, FullTable
 from sm.misc.funcs import import_func
-from sm.outputs.semantic_model import ClassNode, DataNode
+from sm.outputs.semantic_model import DataNode
 from tqdm.auto import tqdm
 
 from sand.container import use_container
+from sand.helpers.column_types import infer_column_types
+from sand.helpers.dataset import iter_dataset
 from sand.helpers.dependency_injection import use_auto_inject
+from sand.helpers.readable_label import ReadableLabelService
 from sand.models import (
     ContextPage,
     Link,
@@ -21,9 +43,21 @@ from sand.models import (
     TableRow,
     Value,
 )
+from sand.models import add_missing_columns, all_tables
 from sand.models import db as dbconn
 from sand.models import init_db
+from sand.models.base import relaxed_durability
 from sand.models.ontology import OntClassAR, OntPropertyAR
+from sand.models.semantic_model import bulk_create_sms
+from sand.models.table import TableStorage, save_rows
+
+# a table & its rows that are not saved yet and the semantic models of the table
+ConvertedExample = Tuple[Table, List[TableRow], List[O.SemanticModel]]
+# what to do with tables of the loading dataset that already exist in the project:
+# fail (unique names), skip them, or skip the unchanged ones and replace the others
+ExistingTableAction = Literal["error", "skip", "resume"]
+# number of examples submitted to each worker process that are not saved yet
+PENDING_EXAMPLES_PER_WORKER = 4
 
 
 @click.command(name="load")
@@ -51,6 +85,40 @@ from sand.models.ontology import OntClassAR, OntPropertyAR
     is_flag=True,
     help="Attempt to add readable label for nodes and edges that don't have them",
 )
+@click.option(
+    "--storage",
+    type=click.Choice(["row", "columnar"]),
+    default="row",
+    help="How cells and links of the loaded tables are stored",
+)
+@click.option(
+    "--batch-tables",
+    default=50,
+    type=int,
+    help="Number of tables saved per transaction",
+)
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Do not sync the database to disk after each transaction while loading (sqlite). The database may be corrupted if the machine crashes in the meantime",
+)
+@click.option(
+    "-w",
+    "--workers",
+    default=1,
+    type=int,
+    help="Number of processes converting tables, which are saved by the main process",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Skip tables that have been loaded with the same content (e.g., by an interrupted load) and replace tables whose content has changed",
+)
+@click.option(
+    "--skip-existing",
+    is_flag=True,
+    help="Skip tables that already exist in the project regardless of their content",
+)
 def load_dataset(
     db: str,
     config: Optional[str],
@@ -58,72 +126,165 @@ def load_dataset(
     dataset: str,
     n_tables: int,
     add_missing_readable_label: bool,
+    storage: TableStorage,
+    batch_tables: int,
+    fast: bool,
+    workers: int,
+    resume: bool,
+    skip_existing: bool,
 ):
     """Load a dataset into a project"""
-    init_db(db)
+    if resume and skip_existing:
+        raise click.UsageError("--resume and --skip-existing cannot be used together")
 
     if dataset.find("::") != -1:
         func, dsquery = dataset.split("::")
-        examples = import_func(func)(dsquery).load()
+        ds = import_func(func)(dsquery)
     else:
-        examples = Dataset(Path(dataset)).load()
+        ds = Dataset(Path(dataset))
+    # read examples one by one instead of loading the whole dataset when possible
+    examples: Iterable[Example[FullTable]] = (
+        iter_dataset(ds) if isinstance(ds, Dataset) else ds.load()
+    )
 
     if n_tables > 0:
-        examples = examples[:n_tables]
+        examples = islice(examples, n_tables)
 
     with use_container(config) as container:
+        init_db(db, container.appcfg().db)
+        dbconn.create_tables(all_tables, safe=True)
+        add_missing_columns(all_tables)
         with use_auto_inject(container):
             import_examples(
                 project,
                 examples,
                 add_missing_readable_label,
+                storage,
+                batch_tables,
+                fast,
+                workers,
+                "resume" if resume else "skip" if skip_existing else "error",
             )
 
 
 @inject
 def import_examples(
     project: str,
-    examples: list[Example[FullTable]],
+    examples: Iterable[Example[FullTable]],
     add_missing_readable_label: bool,
+    storage: TableStorage = "row",
+    batch_tables: int = 50,
+    fast: bool = False,
+    workers: int = 1,
+    on_existing: ExistingTableAction = "error",
     ontclass_ar: OntClassAR = Provide["classes"],
     ontprop_ar: OntPropertyAR = Provide["properties"],
 ):
     if add_missing_readable_label:
-        for ex in tqdm(examples, "add missing readable labels"):
-            for sm in ex.sms:
-                for n in sm.iter_nodes():
-                    if isinstance(n, ClassNode):
-                        if n.readable_label is None:
-                            n.readable_label = (
-                                tmp.readable_label
-                                if (tmp := ontclass_ar.get_by_uri(n.abs_uri))
-                                is not None
-                                else None
-                            )
-                for e in sm.iter_edges():
-                    if e.readable_label is None:
-                        if e.readable_label is None:
-                            e.readable_label = (
-                                tmp.readable_label
-                                if (tmp := ontprop_ar.get_by_uri(e.abs_uri)) is not None
-                                else None
-                            )
-
-    with dbconn:
+        examples = add_readable_labels(
+            examples,
+            ReadableLabelService(ontclass_ar, ontprop_ar),
+            max(batch_tables, 1),
+        )
+
+    with dbconn.connection_context(), relaxed_durability() if fast else nullcontext():
         p = Project.get(name=project)
-        for e in tqdm(examples, desc="Loading examples"):
-            save_example(p, e)
 
+        # content hashes of tables in the project by name
+        existing_hashes = {}
+        if on_existing != "error":
+            existing_hashes = dict(
+                Table.select(Table.name, Table.content_hash)
+                .where(Table.project == p)
+                .tuples()
+            )
+        if on_existing == "skip":
+            examples = (
+                e for e in examples if e.table.table.table_id not in existing_hashes
+            )
 
-def save_example(project: Project, example: Example[FullTable]):
-    mtbl, mrows = convert_linked_table(example.table)
-    mtbl.project = project
-    mtbl.save()
+        with tqdm(
+            total=len(examples) if isinstance(examples, Sized) else None,
+            desc="Loading examples",
+        ) as pbar:
+            for batch in chunked(
+                iter_converted_examples(examples, workers, existing_hashes),
+                max(batch_tables, 1),
+            ):
+                with dbconn.atomic():
+                    save_examples(
+                        p,
+                        [ex for ex in batch if ex is not None],
+                        storage,
+                        replace=on_existing == "resume",
+                    )
+                pbar.update(len(batch))
 
-    for row in mrows:
-        row.save()
 
-    for i, sm in enumerate(example.sms):
+def add_readable_labels(
+    examples: Iterable[Example[FullTable]],
+    service: ReadableLabelService,
+    batch_size: int,
+) -> Iterator[Example[FullTable]]:
+    """Add readable labels to nodes and edges of semantic models of examples that don't
+    have them, looking up labels of a batch of examples at once
+    """
+    for batch in chunked(examples, batch_size):
+        service.add_readable_labels(sm for example in batch for sm in example.sms)
+        yield from batch
+
+
+def iter_converted_examples(
+    examples: Iterable[Example[FullTable]],
+    workers: int = 1,
+    skip_hashes: Optional[Dict[str, Optional[str]]] = None,
+) -> Iterator[Optional[ConvertedExample]]:
+    """Convert examples (see `convert_example`) in their order, yielding None for examples
+    whose content hash is the one of their table names in `skip_hashes`. If there are more
+    than one worker, they are converted in a pool of processes, keeping a few examples per
+    worker in flight so that the results do not pile up when saving is slower.
+    """
+    skip_hashes = skip_hashes or {}
+    if workers <= 1:
+        for example in examples:
+            yield convert_example(
+                example, skip_hashes.get(example.table.table.table_id, None)
+            )
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        pending: Deque[Future[ConvertedExample]] = deque()
+        for example in examples:
+            pending.append(
+                pool.submit(
+                    convert_example,
+                    example,
+                    skip_hashes.get(example.table.table.table_id, None),
+                )
+            )
+            if len(pending) >= workers * PENDING_EXAMPLES_PER_WORKER:
+                yield pending.popleft().result()
+        while len(pending) > 0:
+            yield pending.popleft().result()
+
+
+def convert_example(
+    example: Example[FullTable], skip_hash: Optional[str] = None
+) -> Optional[ConvertedExample]:
+    """Convert the table of an example to smc's table and rows, and complete its semantic
+    models so that they have all columns of the table. Return None if the content hash of
+    the example is `skip_hash`.
+    """
+    content_hash = get_example_hash(example)
+    if content_hash == skip_hash:
+        return None
+
+    mtbl, mrows = convert_linked_table(example.table)
+    mtbl.content_hash = content_hash
+    sms = []
+    for sm in example.sms:
         # make sure that the semantic model has all columns in the table
         newsm = sm.deep_copy()
         for col in example.table.table.columns:
@@ -131,14 +292,54 @@ def save_example(project: Project, example: Example[FullTable]):
                 newsm.add_node(
                     DataNode(col_index=col.index, label=col.clean_multiline_name or "")
                 )
+        sms.append(newsm)
+    return mtbl, mrows, sms
 
-        SemanticModel(
-            table=mtbl,
-            name=f"sm-{i}",
-            description="",
-            version=1,
-            data=newsm,
-        ).save()
+
+def get_example_hash(example: Example[FullTable]) -> str:
+    """Hash the table (with its context & links) and semantic models of an example"""
+    return hashlib.sha256(
+        orjson.dumps(
+            [example.table.to_dict(), [sm.to_dict() for sm in example.sms]],
+            option=orjson.OPT_SORT_KEYS,
+        )
+    ).hexdigest()
+
+
+def save_examples(
+    project: Project,
+    examples: List[ConvertedExample],
+    storage: TableStorage = "row",
+    replace: bool = False,
+):
+    """Save converted tables with their rows, then insert their semantic models at once.
+    If `replace` is True, tables of the project with the same names are deleted first.
+    Must be called inside a transaction.
+    """
+    if replace and len(examples) > 0:
+        Table.delete().where(
+            Table.project == project,
+            Table.name.in_([mtbl.name for mtbl, _, _ in examples]),
+        ).execute()
+
+    sms = []
+    for mtbl, mrows, example_sms in examples:
+        mtbl.project = project
+        mtbl.storage = storage
+        mtbl.save()
+
+        save_rows(mtbl, (row.row for row in mrows), (row.links for row in mrows))
+        sms.extend(
+            SemanticModel(
+                table=mtbl,
+                name=f"sm-{i}",
+                description="",
+                version=1,
+                data=sm,
+            )
+            for i, sm in enumerate(example_sms)
+        )
+    bulk_create_sms(sms)
 
 
 def convert_linked_table(tbl: FullTable) -> Tuple[Table, List[TableRow]]:
@@ -194,4 +395,15 @@ def convert_linked_table(tbl: FullTable) -> Tuple[Table, List[TableRow]]:
         row = [tbl.table[ri, ci] for ci in range(len(columns))]
         mrows.append(TableRow(table=mtbl, index=ri, row=row, links=links[ri]))
 
+    column_types = infer_column_types((row.row for row in mrows), ncols)
+    # columns whose most cells are linked contain entities regardless of their values
+    n_linked_cells = [0] * ncols
+    for ri in range(nrows):
+        for ci in links[ri]:
+            n_linked_cells[ci] += 1
+    for ci in range(ncols):
+        if column_types[ci] == "text" and n_linked_cells[ci] * 2 > nrows:
+            column_types[ci] = "entity"
+    mtbl.column_types = column_types
+
     return mtbl, mrows
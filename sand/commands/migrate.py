@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from itertools import groupby
+from typing import Callable, Optional
+
+import click
+import orjson
+from peewee import SqliteDatabase
+from playhouse.migrate import SchemaMigrator, migrate
+from tqdm.auto import tqdm
+
+from sand.container import use_container
+from sand.models import (
+    CellIndex,
+    CellLink,
+    Link,
+    TableColumnChunk,
+    TableRow,
+    add_missing_columns,
+)
+from sand.models import db as dbconn
+from sand.models import init_db
+from sand.models.base import is_json_encoded
+from sand.models.table import (
+    COLUMN_CHUNK_SIZE,
+    CandidateEntity,
+    Table,
+    insert_links,
+    reindex_cells,
+)
+
+
+@click.command(name="migrate-links")
+@click.option("-d", "--db", required=True, help="sand database file")
+@click.option(
+    "-c",
+    "--config",
+    help="Path to the configuration file",
+)
+def migrate_links(db: str, config: Optional[str]):
+    """Move links embedded in rows & column chunks to the CellLink table"""
+    with use_container(config) as container:
+        init_db(db, container.appcfg().db)
+        dbconn.create_tables([CellLink], safe=True)
+        add_missing_columns([CellLink])
+        migrator = SchemaMigrator.from_database(dbconn.obj)
+
+        with dbconn.atomic():
+            if has_column("tablerow", "links"):
+                cursor = dbconn.execute_sql(
+                    'SELECT table_id, "index", links FROM tablerow'
+                )
+                for table_id, ri, links in tqdm(cursor, desc="migrating links of rows"):
+                    insert_links(
+                        Table(id=table_id),
+                        (
+                            (ri, int(ci), Link.from_tuple(link))
+                            for ci, lst in orjson.loads(links).items()
+                            for link in lst
+                        ),
+                    )
+                migrate(migrator.drop_column("tablerow", "links"))
+
+            if has_column("tablecolumnchunk", "links"):
+                cursor = dbconn.execute_sql(
+                    'SELECT table_id, chunk, "column", links FROM tablecolumnchunk'
+                )
+                for table_id, chunk, ci, links in tqdm(
+                    cursor, desc="migrating links of column chunks"
+                ):
+                    insert_links(
+                        Table(id=table_id),
+                        (
+                            (
+                                chunk * COLUMN_CHUNK_SIZE + int(offset),
+                                ci,
+                                Link.from_tuple(link),
+                            )
+                            for offset, lst in orjson.loads(links).items()
+                            for link in lst
+                        ),
+                    )
+                migrate(migrator.drop_column("tablecolumnchunk", "links"))
+
+
+@click.command(name="migrate-encoding")
+@click.option("-d", "--db", required=True, help="sand database file")
+@click.option(
+    "-c",
+    "--config",
+    help="Path to the configuration file",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=1000,
+    help="number of records updated per transaction",
+)
+@click.option(
+    "--vacuum", is_flag=True, help="reclaim the freed space afterward (sqlite)"
+)
+def migrate_encoding(db: str, config: Optional[str], batch_size: int, vacuum: bool):
+    """Re-encode rows, column chunks and link candidates stored as JSON with msgpack"""
+    with use_container(config) as container:
+        init_db(db, container.appcfg().db)
+        add_missing_columns([CellLink])
+
+        for field in [TableRow.row, TableColumnChunk.cells]:
+            table_name = field.model._meta.table_name
+            if not has_column(table_name, field.column_name):
+                continue
+            rewrite_column(
+                table_name,
+                field.column_name,
+                lambda value: (
+                    field.db_value(orjson.loads(value))
+                    if is_json_encoded(value)
+                    else None
+                ),
+                batch_size,
+                desc=f"re-encoding {table_name}.{field.column_name}",
+            )
+
+        if dbconn.table_exists("celllinkcandidate"):
+            cursor = dbconn.execute_sql(
+                "SELECT link_id, entity_id, probability FROM celllinkcandidate ORDER BY link_id, rank"
+            )
+            with dbconn.atomic():
+                for link_id, group in tqdm(
+                    groupby(cursor, key=lambda x: x[0]), desc="packing link candidates"
+                ):
+                    CellLink.update(
+                        candidates=[
+                            CandidateEntity(entity_id, prob)
+                            for _, entity_id, prob in group
+                        ]
+                    ).where(CellLink.id == link_id).execute()
+                dbconn.execute_sql("DROP TABLE celllinkcandidate")
+
+        if vacuum and isinstance(dbconn.obj, SqliteDatabase):
+            dbconn.execute_sql("VACUUM")
+
+
+@click.command(name="index-cells")
+@click.option("-d", "--db", required=True, help="sand database file")
+@click.option(
+    "-c",
+    "--config",
+    help="Path to the configuration file",
+)
+def index_cells(db: str, config: Optional[str]):
+    """(Re-)build the index of cells used to find and search cells of tables"""
+    with use_container(config) as container:
+        init_db(db, container.appcfg().db)
+        dbconn.create_tables([CellIndex], safe=True)
+        for table in tqdm(list(Table.select()), desc="indexing cells"):
+            reindex_cells(table)
+
+
+def rewrite_column(
+    table_name: str,
+    column: str,
+    rewrite: Callable[[bytes], Optional[bytes]],
+    batch_size: int,
+    desc: str,
+):
+    """Rewrite non-null values of a column, one batch of records per transaction.
+    `rewrite` returns the new value or None to keep the current value.
+    """
+    param = dbconn.param
+    last_id = 0
+    with tqdm(desc=desc) as pbar:
+        while True:
+            records = dbconn.execute_sql(
+                f'SELECT id, "{column}" FROM {table_name} '
+                f"WHERE id > {param} ORDER BY id LIMIT {param}",
+                (last_id, batch_size),
+            ).fetchall()
+            if len(records) == 0:
+                break
+            with dbconn.atomic():
+                for id, value in records:
+                    if value is None:
+                        continue
+                    newvalue = rewrite(value)
+                    if newvalue is not None:
+                        dbconn.execute_sql(
+                            f'UPDATE {table_name} SET "{column}" = {param} WHERE id = {param}',
+                            (newvalue, id),
+                        )
+            last_id = records[-1][0]
+            pbar.update(len(records))
+
+
+def has_column(table_name: str, column: str) -> bool:
+    return dbconn.table_exists(table_name) and column in {
+        col.name for col in dbconn.get_columns(table_name)
+    }
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
 from typing import Literal, TypedDict
@@ -29,6 +29,7 @@ class AppConfig:
     assistant: FnConfig
     search: SearchConfig
     export: FnConfig
+    db: DBConfig
 
     @staticmethod
     def from_yaml(infile: Path | str) -> AppConfig:
@@ -68,6 +69,7 @@ class AppConfig:
                 funcs=AppConfig._parse_args(obj["assistant"], cwd),
             ),
             export=FnConfig(default=obj["export"].pop("default"), funcs=obj["export"]),
+            db=DBConfig.from_dict(obj.get("db", {})),
         )
 
     @staticmethod
@@ -93,6 +95,46 @@ class AppConfig:
         return out
 
 
+# pragmas of sqlite engines so that readers don't block the writer and the writer waits
+# for the lock instead of failing immediately
+DEFAULT_SQLITE_PRAGMAS = {
+    "foreign_keys": 1,
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 10000,  # milliseconds
+    "cache_size": -64 * 1024,  # in KiB
+    "mmap_size": 256 * 1024 * 1024,  # in bytes
+}
+
+
+@dataclass
+class DBConfig:
+    # database engine, it is used when the database passed to sand is a file path,
+    # the engine of a database url (e.g., postgresql://...) is determined by its scheme
+    engine: Literal["sqlite", "apsw", "postgres"] = "sqlite"
+    # pragmas of sqlite engines (sqlite & apsw)
+    pragmas: dict = field(default_factory=lambda: dict(DEFAULT_SQLITE_PRAGMAS))
+    # maximum number of connections in the pool of the postgres engine
+    max_connections: int = 20
+    # number of seconds a pooled connection is allowed to be idle before it is recycled
+    stale_timeout: int = 300
+    # compress blob fields (rows, column chunks, semantic models) when writing them,
+    # compressed values are always readable regardless of this option
+    compression: Literal["none", "zstd"] = "none"
+    compression_level: int = 3
+
+    @staticmethod
+    def from_dict(obj: dict) -> DBConfig:
+        return DBConfig(
+            engine=obj.get("engine", "sqlite"),
+            pragmas={**DEFAULT_SQLITE_PRAGMAS, **obj.get("pragmas", {})},
+            max_connections=obj.get("max_connections", 20),
+            stale_timeout=obj.get("stale_timeout", 300),
+            compression=obj.get("compression", "none"),
+            compression_level=obj.get("compression_level", 3),
+        )
+
+
 @dataclass
 class SearchConfig:
     entity: str
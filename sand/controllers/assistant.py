@@ -3,7 +3,6 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 
-import sm.outputs.semantic_model as O
 from dependency_injector.wiring import Provide, inject
 from flask import jsonify, request
 from flask.blueprints import Blueprint
@@ -14,11 +13,12 @@ from werkzeug.exceptions import BadRequest, NotFound
 import sand.serializer as sand_ser
 from sand.config import AppConfig
 from sand.extension_interface.assistant import IAssistant
+from sand.helpers.readable_label import ReadableLabelService
 from sand.helpers.service_provider import MultiServiceProvider
 from sand.helpers.tree_utils import TreeStruct
 from sand.models.entity import Entity, EntityAR
-from sand.models.ontology import OntClass, OntClassAR
-from sand.models.table import Link, Table, TableRow
+from sand.models.ontology import OntClass, OntClassAR, OntPropertyAR
+from sand.models.table import Link, Table, TableRow, get_column_links, get_rows
 
 
 @dataclass
@@ -43,12 +43,10 @@ def predict_semantic_desc(
     assistant_service: MultiServiceProvider[IAssistant] = Provide["assistant"],
     entity_ar: EntityAR = Provide["entities"],
     ontclass_ar: OntClassAR = Provide["classes"],
-    ontprop_ar: OntClassAR = Provide["properties"],
+    ontprop_ar: OntPropertyAR = Provide["properties"],
 ):
     table = Table.get_by_id(table_id)
-    rows: List[TableRow] = list(
-        TableRow.select().where(TableRow.table == table).order_by(TableRow.index)
-    )
+    rows = get_rows(table)
 
     selected_assistants = {
         name: assistant_service.get(name)
@@ -58,36 +56,18 @@ def predict_semantic_desc(
     if len(selected_assistants) == 0:
         selected_assistants = {"default": assistant_service.get_default()}
 
+    predictions = {
+        name: assistant.predict(table, rows)
+        for name, assistant in selected_assistants.items()
+    }
+    ReadableLabelService(ontclass_ar, ontprop_ar, entity_ar).add_readable_labels(
+        (sm for sm, _ in predictions.values() if sm is not None),
+        use_uri_as_default=True,
+    )
+
     outputs = {}
-    for name, assistant in selected_assistants.items():
-        sm, outputrows = assistant.predict(table, rows)
+    for name, (sm, outputrows) in predictions.items():
         if sm is not None:
-            for node in sm.iter_nodes():
-                if isinstance(node, O.ClassNode):
-                    if node.readable_label is None:
-                        tmpcls = ontclass_ar.get_by_uri(node.abs_uri)
-                        if tmpcls is not None:
-                            node.readable_label = tmpcls.readable_label
-                        else:
-                            node.readable_label = node.rel_uri
-                elif isinstance(node, O.LiteralNode):
-                    if (
-                        node.readable_label is None
-                        and node.datatype == O.LiteralNodeDataType.Entity
-                    ):
-                        tmpent = entity_ar.get_by_uri(node.value)
-                        if tmpent is not None:
-                            node.readable_label = tmpent.readable_label
-                        else:
-                            node.readable_label = node.value
-            for edge in sm.iter_edges():
-                if edge.readable_label is None:
-                    tmpprop = ontprop_ar.get_by_uri(edge.abs_uri)
-                    if tmpprop is not None:
-                        edge.readable_label = tmpprop.readable_label
-                    else:
-                        edge.readable_label = edge.rel_uri
-
             sm = sand_ser.serialize_graph(sm, columns=None)
         if outputrows is not None:
             # preserved the manual entity linking from the users
@@ -136,13 +116,11 @@ def gather_column_types(
     if args.column >= len(table.columns):
         raise BadRequest(f"Invalid column {args.column} value")
 
-    rows: List[TableRow] = list(TableRow.select().where(TableRow.table == table))
-    column = str(args.column)
     ents: Dict[str, Optional[Entity]] = {}
 
     nil_entity_id = appcfg.entity.nil.id
-    for row in rows:
-        for link in row.links.get(column, []):
+    for links in get_column_links(table, args.column).values():
+        for link in links:
             if (
                 link.entity_id is not None
                 and link.entity_id != nil_entity_id
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from zipfile import ZipFile
+
+import orjson
+from serde.helper import DEFAULT_ORJSON_OPTS
+from sm.dataset import FullTable, get_friendly_fs_id
+from sm.prelude import I, M, O
+
+from sand.models.semantic_model import SemanticModel
+from sand.models.table import ContextPage, Link, Table, get_rows
+
+# number of worker processes converting tables of exported projects
+EXPORT_WORKERS = os.cpu_count() or 1
+# number of tables read from the database and waiting for the workers, per worker
+PENDING_TABLES_PER_WORKER = 2
+
+# name, columns, rows, links of the rows, context page & semantic models of a table
+TableData = Tuple[
+    str,
+    List[str],
+    List[List[Union[str, float]]],
+    List[Dict[str, List[Link]]],
+    Optional[ContextPage],
+    List[O.SemanticModel],
+]
+
+
+class ZipStream:
+    """A write-only file collecting the output of a `ZipFile`, so the zip file can be
+    sent in pieces while it is written: `pop` takes out what has been written so far.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_export_zip(
+    tables: Iterable[Table], pool: Optional[ProcessPoolExecutor] = None
+) -> Iterator[bytes]:
+    """Export tables as a zip file of a dataset (see `sm.dataset.Dataset`), yielding
+    pieces of the zip file as the tables are written.
+
+    Tables are read from the database one at a time. If a pool is given, they are
+    converted and serialized in its worker processes, at most `PENDING_TABLES_PER_WORKER`
+    tables per worker are waiting at once, and they are written in the given order.
+    """
+    stream = ZipStream()
+    with ZipFile(stream, "w") as zf:  # type: ignore
+        for name, desc, content in iter_serialized_tables(tables, pool):
+            zf.writestr(f"descriptions/{name}.json", desc)
+            zf.writestr(f"tables/{name}.json", content)
+            yield stream.pop()
+    yield stream.pop()
+
+
+def iter_serialized_tables(
+    tables: Iterable[Table], pool: Optional[ProcessPoolExecutor] = None
+) -> Iterator[Tuple[str, bytes, bytes]]:
+    """Serialize tables in order, see `serialize_table`"""
+    if pool is None:
+        for table in tables:
+            yield serialize_table(get_table_data(table))
+        return
+
+    pending: Deque[Future] = deque()
+    for table in tables:
+        if len(pending) >= PENDING_TABLES_PER_WORKER * EXPORT_WORKERS:
+            yield pending.popleft().result()
+        pending.append(pool.submit(serialize_table, get_table_data(table)))
+    while len(pending) > 0:
+        yield pending.popleft().result()
+
+
+def get_table_data(table: Table) -> TableData:
+    """Read everything of a table that is exported"""
+    rows = get_rows(table)
+    return (
+        table.name,
+        table.columns,
+        [row.row for row in rows],
+        [row.links for row in rows],
+        table.context_page,
+        [
+            sm.data
+            for sm in SemanticModel.select(SemanticModel.data).where(
+                SemanticModel.table == table
+            )
+        ],
+    )
+
+
+def serialize_table(data: TableData) -> Tuple[str, bytes, bytes]:
+    """Convert a table to a `FullTable` and serialize it & its semantic models in the
+    format read by `Dataset.load`. Returns the file name (without extension) of the
+    table, the serialized semantic models and the serialized table.
+    """
+    name, columns, records, links, context_page, sms = data
+    basetbl = I.ColumnBasedTable.from_rows(
+        records=records,
+        table_id=name,
+        headers=columns,
+        strict=True,
+    )
+    table = FullTable(
+        table=basetbl,
+        context=(
+            I.Context(
+                page_title=context_page.title,
+                page_url=context_page.url,
+                entities=(
+                    [I.EntityId(context_page.entity, "")]
+                    if context_page.entity is not None
+                    else []
+                ),
+            )
+            if context_page is not None
+            else I.Context()
+        ),
+        links=M.Matrix.default(basetbl.shape(), list),
+    )
+    table.links = table.links.map_index(
+        lambda ri, ci: [to_sm_link(link) for link in links[ri].get(str(ci), [])]
+    )
+
+    return (
+        get_friendly_fs_id(name),
+        orjson.dumps([sm.to_dict() for sm in sms]),
+        orjson.dumps(table.to_dict(), option=DEFAULT_ORJSON_OPTS | orjson.OPT_INDENT_2),
+    )
+
+
+def to_sm_link(link: Link) -> I.Link:
+    """Convert a link of a cell to a link of the `sm` library, which only keeps the linked entity"""
+    return I.Link(
+        start=link.start,
+        end=link.end,
+        url=link.url,
+        entities=[I.EntityId(link.entity_id, "")] if link.entity_id is not None else [],
+    )
+
+
+_export_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_export_pool() -> ProcessPoolExecutor:
+    """Get the pool of worker processes converting exported tables, created on the first use"""
+    global _export_pool
+    if _export_pool is None:
+        # spawn instead of fork as the server process has threads & database connections
+        _export_pool = ProcessPoolExecutor(
+            max_workers=EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _export_pool
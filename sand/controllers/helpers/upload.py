@@ -1,12 +1,24 @@
+from __future__ import annotations
+
 from uuid import uuid4
 import csv
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from io import StringIO
-from typing import Dict, List, Literal, Optional, Union, cast
+from io import TextIOWrapper
+from itertools import islice
+from typing import IO, Any, Dict, Iterator, List, Literal, Optional, Tuple, Union
 
 import orjson
+from sand.helpers.column_types import (
+    ColumnType,
+    ColumnTypeInference,
+    infer_column_types,
+)
 from sand.models.project import Project
-from sand.models.table import Link, Table, TableRow
+from sand.models.table import Link, Table, TableRow, TableStorage, save_rows
 from werkzeug.datastructures import FileStorage
 from sand.models import db
 
@@ -24,16 +36,111 @@ class JSONParserOpts:
     format: Literal["json"] = "json"
 
 
-ParserOpts = Union[CSVParserOpts, JSONParserOpts]
+@dataclass
+class JSONLinesParserOpts:
+    format: Literal["jsonl"] = "jsonl"
+
+
+@dataclass
+class ParquetParserOpts:
+    format: Literal["parquet"] = "parquet"
+
+
+@dataclass
+class ArrowParserOpts:
+    format: Literal["arrow"] = "arrow"
+
+
+ParserOpts = Union[
+    CSVParserOpts,
+    JSONParserOpts,
+    JSONLinesParserOpts,
+    ParquetParserOpts,
+    ArrowParserOpts,
+]
 
 
 @dataclass
 class RawTable:
     name: str
     header: List[str]
-    # each item in the outer list of `rows` and `links` is for a row
-    rows: List[List[Union[str, int, float]]]
-    links: List[Dict[str, List[Link]]]
+    # each item in the outer list of `rows` and `links` is for a row, rows can be a
+    # CSVRows that reads the rows from the uploaded file instead of keeping them in memory
+    rows: Union[List[List[Union[str, int, float]]], CSVRows, JSONRows, ArrowRows]
+    # None if the rows do not have links
+    links: Optional[List[Dict[str, List[Link]]]]
+    # inferred type of each column
+    column_types: Optional[List[ColumnType]] = None
+
+    def to_dict(self, limit: Optional[int] = None):
+        """Convert the table to a dictionary, keeping only the first `limit` rows if provided"""
+        rows = list(islice(self.rows, limit))
+        return {
+            "name": self.name,
+            "header": self.header,
+            "column_types": self.column_types,
+            "size": len(self.rows),
+            "rows": rows,
+            "links": (
+                [{} for _ in rows]
+                if self.links is None
+                else [
+                    {
+                        ci: [link.to_dict() for link in links]
+                        for ci, links in row_links.items()
+                    }
+                    for row_links in islice(self.links, limit)
+                ]
+            ),
+        }
+
+
+class CSVRows:
+    """Rows of a CSV file that are parsed from the file every time they are iterated,
+    padded to the same number of columns. The file is either an open file or the path
+    of a file on disk, which can be sent to other processes.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, IO[bytes]],
+        delimiter: str,
+        skip_header: bool,
+        n_columns: int,
+        size: int,
+    ):
+        self.file = file
+        self.delimiter = delimiter
+        self.skip_header = skip_header
+        self.n_columns = n_columns
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[List[Union[str, int, float]]]:
+        for i, row in enumerate(iter_csv(self.file, self.delimiter)):
+            if i == 0 and self.skip_header:
+                continue
+            if len(row) < self.n_columns:
+                row.extend([""] * (self.n_columns - len(row)))
+            yield row
+
+
+def iter_csv(file: Union[str, IO[bytes]], delimiter: str) -> Iterator[List[str]]:
+    """Parse rows of a CSV file (an open file or a path) from the beginning of the file"""
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            yield from iter_csv(f, delimiter)
+        return
+
+    file.seek(0)
+    stream = TextIOWrapper(file, encoding="utf-8", newline="")
+    try:
+        yield from csv.reader(stream, delimiter=delimiter)
+    finally:
+        # detach so that closing the wrapper does not close the file
+        stream.detach()
 
 
 @dataclass
@@ -42,7 +149,7 @@ class UploadingTable:
     tables: List[RawTable]
 
 
-ALLOWED_EXTENSIONS = {"json", "csv", "tsv"}
+ALLOWED_EXTENSIONS = {"json", "jsonl", "csv", "tsv", "parquet", "arrow", "feather"}
 
 
 def get_extension(filename: str) -> Optional[str]:
@@ -52,7 +159,9 @@ def get_extension(filename: str) -> Optional[str]:
     return lst[1].lower()
 
 
-def save_upload(project: Project, raw_tables: List[RawTable]) -> List[Table]:
+def save_upload(
+    project: Project, raw_tables: List[RawTable], storage: TableStorage = "row"
+) -> List[Table]:
     """Save the upload results to the database"""
     with db.transaction():
         cursor = Table.select(Table.name).where(
@@ -75,18 +184,14 @@ def save_upload(project: Project, raw_tables: List[RawTable]) -> List[Table]:
                 size=len(raw_table.rows),
                 context_values=[],
                 context_tree=[],
+                storage=storage,
+                column_types=raw_table.column_types,
             )
             table.save()
             tables.append(table)
 
-        table_rows = []
         for raw_table, table in zip(raw_tables, tables):
-            for i, row in enumerate(raw_table.rows):
-                table_rows.append(
-                    TableRow(table=table, index=i, row=row, links=raw_table.links[i])
-                )
-
-        TableRow.bulk_create(table_rows, batch_size=200)
+            save_rows(table, raw_table.rows, raw_table.links)
         return tables
 
 
@@ -105,36 +210,95 @@ def parse_upload(
             parser_opts = CSVParserOpts(format="csv", delimiter=delimiter)
         elif ext == "json":
             parser_opts = JSONParserOpts(format="json")
+        elif ext == "jsonl":
+            parser_opts = JSONLinesParserOpts(format="jsonl")
+        elif ext == "parquet":
+            parser_opts = ParquetParserOpts(format="parquet")
+        elif ext in {"arrow", "feather"}:
+            parser_opts = ArrowParserOpts(format="arrow")
         else:
             raise ValueError(f"Invalid format: {ext}")
 
     if isinstance(parser_opts, CSVParserOpts):
         return parse_csv_file(name, file, parser_opts)
 
-    if isinstance(parser_opts, JSONParserOpts):
+    if isinstance(parser_opts, (JSONParserOpts, JSONLinesParserOpts)):
         return parse_json_file(name, file, parser_opts)
 
+    if isinstance(parser_opts, (ParquetParserOpts, ArrowParserOpts)):
+        return parse_arrow_file(name, file, parser_opts)
+
     raise NotImplementedError()
 
 
-def parse_csv_file(name: str, file: FileStorage, parser_opts: CSVParserOpts):
-    reader = csv.reader(StringIO(file.read().decode()), delimiter=parser_opts.delimiter)
-    rows = list(reader)
+def parse_upload_files(
+    files: Dict[str, Tuple[str, str, Optional[ParserOpts]]],
+) -> Dict[str, Union[List[UploadingTable], str]]:
+    """Parse files on disk, each given as (path, filename, user-preferred parser options).
+    Multiple files are parsed concurrently in worker processes. Returns the tables of
+    each file, or the error message if the file cannot be parsed.
+    """
+    if len(files) <= 1:
+        return {file_id: _parse_upload_file(*args) for file_id, args in files.items()}
 
-    n_columns = max(len(row) for row in rows)
+    pool = get_parser_pool()
+    futures = {
+        file_id: pool.submit(_parse_upload_file, *args)
+        for file_id, args in files.items()
+    }
+    return {file_id: future.result() for file_id, future in futures.items()}
+
+
+_parser_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parser_pool() -> ProcessPoolExecutor:
+    """Get the pool of worker processes parsing uploaded files, created on the first use"""
+    global _parser_pool
+    if _parser_pool is None:
+        # spawn instead of fork as the server process has threads & database connections
+        _parser_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parser_pool
+
+
+def _parse_upload_file(
+    path: str, filename: str, parser_opts: Optional[ParserOpts]
+) -> Union[List[UploadingTable], str]:
+    try:
+        with open(path, "rb") as f:
+            return parse_upload(parser_opts, FileStorage(stream=f, filename=filename))
+    except Exception as e:
+        return f"Cannot parse {filename}: {e}"
+
+
+def parse_csv_file(name: str, file: FileStorage, parser_opts: CSVParserOpts):
+    """Parse a CSV file without loading it into memory: the first pass finds the header
+    and the shape of the table, the rows are parsed again when they are read (see `CSVRows`).
+    """
+    # read the rows by the path of the file if it is on disk
+    source = get_file_source(file)
+
+    header = []
+    n_columns = 0
+    n_rows = 0
+    column_types = ColumnTypeInference()
+    for row in iter_csv(source, parser_opts.delimiter):
+        if n_rows == 0 and parser_opts.first_row_is_header:
+            header = row
+        else:
+            column_types.update((row,))
+        n_columns = max(n_columns, len(row))
+        n_rows += 1
 
     if parser_opts.first_row_is_header:
-        header, rows = rows[0], rows[1:]
-        if len(header) < n_columns:
-            for i in range(len(header), n_columns):
-                header.append(f"")
+        header.extend([""] * (n_columns - len(header)))
+        n_rows = max(n_rows - 1, 0)
     else:
         header = [""] * n_columns
 
-    for row in rows:
-        if len(row) < n_columns:
-            row.extend([""] * (n_columns - len(row)))
-
     return [
         UploadingTable(
             parser_opts=parser_opts,
@@ -142,23 +306,41 @@ def parse_csv_file(name: str, file: FileStorage, parser_opts: CSVParserOpts):
                 RawTable(
                     name=name,
                     header=header,
-                    rows=cast(List[List[Union[str, int, float]]], rows),
-                    links=[{} for _ in rows],
+                    rows=CSVRows(
+                        source,
+                        parser_opts.delimiter,
+                        parser_opts.first_row_is_header,
+                        n_columns,
+                        n_rows,
+                    ),
+                    links=None,
+                    column_types=column_types.get_types(n_columns),
                 )
             ],
         )
     ]
 
 
-def parse_json_file(name: str, file: FileStorage, parser_opts: JSONParserOpts):
-    records = orjson.loads(file.read())
-    if not isinstance(records, list):
-        raise Exception("JSON file must contain a list of rows")
+def parse_json_file(
+    name: str,
+    file: FileStorage,
+    parser_opts: Union[JSONParserOpts, JSONLinesParserOpts],
+):
+    """Parse a JSON file containing a list of records (or a JSON Lines file, one record per
+    line) without loading it into memory: the first pass collects the attributes of the
+    records in the order they appear, the records are parsed again when the rows are read
+    (see `JSONRows`).
+    """
+    source = get_file_source(file)
 
     # now normalize and check the content & construct schema
     attrs = {}
-    for record in records:
-        for key, value in record:
+    n_rows = 0
+    column_types = ColumnTypeInference()
+    for record in iter_json_records(source, parser_opts.format):
+        if not isinstance(record, dict):
+            raise Exception(f"Record {n_rows} is not an object")
+        for key, value in record.items():
             if key not in attrs:
                 attrs[key] = len(attrs)
 
@@ -166,17 +348,243 @@ def parse_json_file(name: str, file: FileStorage, parser_opts: JSONParserOpts):
                 raise Exception(
                     f"Invalid value type for attribute {key}. Expect string, number, or null"
                 )
+        column_types.update(([record.get(key, None) for key in attrs],))
+        n_rows += 1
 
-    rows = []
     header = list(attrs.keys())
-    for record in records:
-        rows.append([record.get(key, None) for key in attrs])
+    return [
+        UploadingTable(
+            parser_opts=parser_opts,
+            tables=[
+                RawTable(
+                    name=name,
+                    header=header,
+                    rows=JSONRows(source, parser_opts.format, header, n_rows),
+                    links=None,
+                    column_types=column_types.get_types(len(header)),
+                )
+            ],
+        )
+    ]
+
+
+class JSONRows:
+    """Rows of a JSON (or JSON Lines) file that are parsed from the file every time they
+    are iterated, the values of each row are the values of the record's attributes in
+    the header. Similar to `CSVRows`, the file is either an open file or a path.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, IO[bytes]],
+        format: Literal["json", "jsonl"],
+        header: List[str],
+        size: int,
+    ):
+        self.file = file
+        self.format = format
+        self.header = header
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[List[Union[str, int, float]]]:
+        for record in iter_json_records(self.file, self.format):
+            yield [record.get(key, None) for key in self.header]
+
+
+def iter_json_records(
+    file: Union[str, IO[bytes]], format: Literal["json", "jsonl"]
+) -> Iterator[Any]:
+    """Parse records of a JSON file (a list of records) or a JSON Lines file one by one
+    from the beginning of the file (an open file or a path).
+    """
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            yield from iter_json_records(f, format)
+        return
+
+    file.seek(0)
+    if format == "jsonl":
+        for line in file:
+            if not line.isspace():
+                yield orjson.loads(line)
+    else:
+        yield from iter_json_array(file)
+
+
+# tokens that change the nesting level outside of strings, a whole string & the content
+# of a string up to its end (or an escape at the end of the buffer)
+JSON_STRUCTURE_TOKENS = re.compile(rb'[][{}",]')
+JSON_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+JSON_STRING_CONTENT = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+
+def iter_json_array(file: IO[bytes], chunk_size: int = 1024 * 1024) -> Iterator[Any]:
+    """Parse items of a JSON array, which is the top-level value of a file, one by one.
+
+    The file is read in chunks and scanned for the boundaries of the items (commas at the
+    first nesting level outside of strings), then each item is parsed with orjson, so
+    only one item is in memory at a time. Scanning continues from where the previous
+    chunk ends, so each byte is scanned once.
+    """
+    buf = bytearray()
+    # position to continue scanning from & start of the current item (after `[` or `,`)
+    pos = 0
+    start = -1
+    depth = 0
+    in_string = False
+    is_eof = False
+    # whether the current item follows a comma, so it cannot be empty
+    after_comma = False
+
+    while True:
+        if in_string:
+            pos = JSON_STRING_CONTENT.match(buf, pos).end()  # type: ignore
+            if pos < len(buf) and buf[pos] == ord('"'):
+                pos += 1
+                in_string = False
+                continue
+            m = None
+        else:
+            m = JSON_STRUCTURE_TOKENS.search(buf, pos)
+
+        if m is None:
+            # need more content (an escape at the end of the buffer needs the next byte)
+            if is_eof:
+                break
+            if depth == 0 and not buf.isspace() and len(buf) > 0:
+                # content before the array
+                break
+            if not in_string:
+                pos = len(buf)
+            # drop the scanned content that is not part of the current item
+            keep = start if start != -1 else pos
+            del buf[:keep]
+            pos -= keep
+            if start != -1:
+                start = 0
+            chunk = file.read(chunk_size)
+            is_eof = len(chunk) == 0
+            buf += chunk
+            continue
+
+        token = m.group()
+        pos = m.end()
+        if depth == 0:
+            if token != b"[" or (start != -1) or buf[: m.start()].strip() != b"":
+                break
+            depth = 1
+            start = pos
+        elif token == b'"':
+            # skip the whole string if it ends in the buffer, otherwise scan it in pieces
+            string = JSON_STRING.match(buf, m.start())
+            if string is None:
+                in_string = True
+            else:
+                pos = string.end()
+        elif token in (b"[", b"{"):
+            depth += 1
+        elif token in (b"]", b"}"):
+            depth -= 1
+            if depth == 0:
+                if token != b"]":
+                    break
+                item = buf[start : m.start()]
+                if after_comma or (len(item) > 0 and not item.isspace()):
+                    yield orjson.loads(item)
+                # the content after the array must be whitespace
+                rest = buf[pos:]
+                while True:
+                    if len(rest) > 0 and not rest.isspace():
+                        raise ValueError("Unexpected content after the list of records")
+                    rest = file.read(chunk_size)
+                    if len(rest) == 0:
+                        return
+        elif token == b"," and depth == 1:
+            yield orjson.loads(buf[start : m.start()])
+            start = pos
+            after_comma = True
+
+    raise ValueError("JSON file must contain a list of records")
+
+
+def parse_arrow_file(
+    name: str,
+    file: FileStorage,
+    parser_opts: Union[ParquetParserOpts, ArrowParserOpts],
+):
+    """Parse a Parquet or Arrow IPC file. The header and the number of rows come from the
+    metadata of the file, and so do the types of numeric & temporal columns, the types of
+    other columns are inferred from their values. The rows are read when they are used
+    (see `ArrowRows`).
+    """
+    # pyarrow is an optional dependency
+    from sand.helpers import arrow
+
+    source = get_file_source(file)
+    schema = arrow.read_schema(source, parser_opts.format)
+    header = list(schema.names)
+    column_types = [arrow.get_column_type(field.type) for field in schema]
+    if any(type is None for type in column_types):
+        inferred_types = infer_column_types(
+            arrow.iter_rows(source, parser_opts.format), len(header)
+        )
+        column_types = [
+            inferred_types[ci] if type is None else type
+            for ci, type in enumerate(column_types)
+        ]
 
     return [
         UploadingTable(
             parser_opts=parser_opts,
             tables=[
-                RawTable(name=name, header=header, rows=rows, links=[{} for _ in rows])
+                RawTable(
+                    name=name,
+                    header=header,
+                    rows=ArrowRows(
+                        source,
+                        parser_opts.format,
+                        arrow.count_rows(source, parser_opts.format),
+                    ),
+                    links=None,
+                    column_types=column_types,
+                )
             ],
         )
     ]
+
+
+class ArrowRows:
+    """Rows of a Parquet or Arrow IPC file that are read from the file every time they are
+    iterated. Similar to `CSVRows`, the file is either an open file or a path.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, IO[bytes]],
+        format: Literal["parquet", "arrow"],
+        size: int,
+    ):
+        self.file = file
+        self.format = format
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[List[Union[str, int, float]]]:
+        from sand.helpers import arrow
+
+        return arrow.iter_rows(self.file, self.format)
+
+
+def get_file_source(file: FileStorage) -> Union[str, IO[bytes]]:
+    """Get the path of an uploaded file if it is on disk so that it can be read again by
+    other processes, otherwise its stream.
+    """
+    source = getattr(file.stream, "name", None)
+    if not isinstance(source, str) or not os.path.isfile(source):
+        return file.stream
+    return source
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import fcntl
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple, Union
+from uuid import uuid4
+
+import orjson
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import BadRequest, Conflict, NotFound
+
+from sand.controllers.helpers.upload import (
+    ParserOpts,
+    UploadingTable,
+    parse_upload_files,
+)
+
+# sessions that are not updated for this number of seconds are removed
+UPLOAD_SESSION_TTL = 24 * 60 * 60
+# number of bytes copied from the request to the file at a time
+COPY_BUFFER_SIZE = 1024 * 1024
+SESSION_ID_REGEX = re.compile(r"^[0-9a-f]{32}$")
+# number of parsed pending uploads kept in memory by each process
+PARSED_UPLOAD_CACHE_SIZE = 8
+
+
+@dataclass
+class UploadSession:
+    """A resumable upload of a file. The content is sent in chunks, which are appended
+    to a temporary file in the upload directory (`UPLOAD_DIR` of the app config) until
+    the number of received bytes (offset) reaches the size of the file.
+    """
+
+    id: str
+    project: int
+    filename: str
+    # total number of bytes of the file
+    size: int
+    # number of bytes received so far
+    offset: int = 0
+
+    @property
+    def is_complete(self) -> bool:
+        return self.offset == self.size
+
+    def to_dict(self):
+        return {**asdict(self), "is_complete": self.is_complete}
+
+
+def get_upload_dir() -> Path:
+    upload_dir = Path(current_app.config["UPLOAD_DIR"])
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    return upload_dir
+
+
+def create_upload_session(project: int, filename: str, size: int) -> UploadSession:
+    upload_dir = get_upload_dir()
+    remove_expired_upload_sessions(upload_dir)
+
+    session = UploadSession(
+        id=uuid4().hex, project=project, filename=filename, size=size
+    )
+    (upload_dir / f"{session.id}.json").write_bytes(
+        orjson.dumps(
+            {"project": project, "filename": filename, "size": size},
+        )
+    )
+    (upload_dir / f"{session.id}.part").touch()
+    return session
+
+
+def get_upload_session(project: int, id: str) -> UploadSession:
+    upload_dir = get_upload_dir()
+    if SESSION_ID_REGEX.match(id) is None:
+        raise NotFound(f"Upload session {id} not found")
+
+    try:
+        meta = orjson.loads((upload_dir / f"{id}.json").read_bytes())
+        offset = os.path.getsize(upload_dir / f"{id}.part")
+    except FileNotFoundError:
+        raise NotFound(f"Upload session {id} not found")
+
+    if meta["project"] != project:
+        raise NotFound(f"Upload session {id} not found")
+    return UploadSession(id=id, offset=offset, **meta)
+
+
+def append_upload_chunk(
+    session: UploadSession, offset: int, stream: IO[bytes]
+) -> UploadSession:
+    """Append a chunk of the file starting at `offset`, which must be the number of bytes
+    received so far. If the connection drops in the middle of a chunk, the received part
+    is kept and the client resumes from the offset of the session.
+
+    The file is locked while the chunk is appended, so a chunk that is sent again while
+    it is still being received waits for the first one, then is rejected as its offset
+    no longer matches the file.
+    """
+    path = get_upload_dir() / f"{session.id}.part"
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        raise NotFound(f"Upload session {session.id} not found")
+
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        # the session may have received bytes since it was read
+        session.offset = f.seek(0, os.SEEK_END)
+        if offset != session.offset:
+            raise Conflict(
+                f"Chunk starts at byte {offset} but the upload session has received {session.offset} bytes"
+            )
+
+        while True:
+            buf = stream.read(COPY_BUFFER_SIZE)
+            if len(buf) == 0:
+                break
+            if session.offset + len(buf) > session.size:
+                f.truncate(session.offset)
+                raise BadRequest(
+                    f"The chunk exceeds the file size of {session.size} bytes"
+                )
+            f.write(buf)
+            session.offset += len(buf)
+    return session
+
+
+def get_upload_file(session: UploadSession) -> str:
+    """Get the path of the assembled file of a completed upload session"""
+    if not session.is_complete:
+        raise BadRequest(
+            f"Upload session {session.id} has received {session.offset}/{session.size} bytes"
+        )
+    return str(get_upload_dir() / f"{session.id}.part")
+
+
+def delete_upload_session(session: UploadSession):
+    upload_dir = get_upload_dir()
+    for ext in ["json", "part"]:
+        (upload_dir / f"{session.id}.{ext}").unlink(missing_ok=True)
+
+
+def remove_expired_upload_sessions(upload_dir: Path):
+    expired_time = time.time() - UPLOAD_SESSION_TTL
+    for file in upload_dir.glob("*.part"):
+        if file.stat().st_mtime < expired_time:
+            file.unlink(missing_ok=True)
+            file.with_suffix(".json").unlink(missing_ok=True)
+    for file in upload_dir.glob("*.upload"):
+        if file.stat().st_mtime < expired_time:
+            file.unlink(missing_ok=True)
+
+
+@dataclass
+class PendingUpload:
+    """Files of an upload that has been previewed but not saved yet. The token is returned
+    with the preview so that the tables are saved (or parsed with other options) without
+    sending and parsing the files again.
+    """
+
+    token: str
+    project: int
+    # upload session of each file id
+    sessions: Dict[str, UploadSession]
+
+
+# parse results of files of pending uploads (by token then file id): the
+# user-preferred parser options and the parsed tables or the error message
+_parsed_uploads: OrderedDict[
+    str,
+    Dict[str, Tuple[Optional[ParserOpts], Union[List[UploadingTable], str]]],
+] = OrderedDict()
+_parsed_uploads_lock = threading.Lock()
+
+
+def create_pending_upload(
+    project: int, files: Dict[str, Union[FileStorage, UploadSession]]
+) -> PendingUpload:
+    """Keep files of an upload in the upload directory, files that are sent in the request
+    are stored as completed upload sessions.
+    """
+    for file in files.values():
+        if isinstance(file, UploadSession):
+            # make sure the sessions are completed before storing anything
+            get_upload_file(file)
+
+    sessions = {}
+    for file_id, file in files.items():
+        if isinstance(file, UploadSession):
+            sessions[file_id] = file
+            continue
+
+        assert file.filename is not None
+        file.stream.seek(0, os.SEEK_END)
+        size = file.stream.tell()
+        file.stream.seek(0)
+        sessions[file_id] = append_upload_chunk(
+            create_upload_session(project, file.filename, size), 0, file.stream
+        )
+
+    upload = PendingUpload(token=uuid4().hex, project=project, sessions=sessions)
+    (get_upload_dir() / f"{upload.token}.upload").write_bytes(
+        orjson.dumps(
+            {
+                "project": project,
+                "sessions": {
+                    file_id: session.id for file_id, session in sessions.items()
+                },
+            }
+        )
+    )
+    return upload
+
+
+def get_pending_upload(project: int, token: str) -> PendingUpload:
+    if SESSION_ID_REGEX.match(token) is None:
+        raise NotFound(f"Upload {token} not found")
+    try:
+        meta = orjson.loads((get_upload_dir() / f"{token}.upload").read_bytes())
+    except FileNotFoundError:
+        raise NotFound(f"Upload {token} not found")
+    if meta["project"] != project:
+        raise NotFound(f"Upload {token} not found")
+
+    return PendingUpload(
+        token=token,
+        project=project,
+        sessions={
+            file_id: get_upload_session(project, session_id)
+            for file_id, session_id in meta["sessions"].items()
+        },
+    )
+
+
+def parse_pending_upload(
+    upload: PendingUpload, parser_opts: Dict[str, ParserOpts]
+) -> Tuple[List[UploadingTable], Dict[str, str]]:
+    """Parse files of a pending upload, returning the tables and the error message of each
+    file that cannot be parsed. The results of each file are cached, so they are reused
+    when the file is parsed again with the same options (including the detected options
+    of files that do not have user-preferred options).
+    """
+    with _parsed_uploads_lock:
+        cached = _parsed_uploads.pop(upload.token, {})
+
+    results = {}
+    for file_id, (opts, result) in cached.items():
+        if file_id not in parser_opts or (
+            parser_opts[file_id] == opts
+            if isinstance(result, str)
+            else all(table.parser_opts == parser_opts[file_id] for table in result)
+        ):
+            results[file_id] = (opts, result)
+
+    files = {
+        file_id: (
+            get_upload_file(session),
+            session.filename,
+            parser_opts.get(file_id, None),
+        )
+        for file_id, session in upload.sessions.items()
+        if file_id not in results
+    }
+    if len(files) > 0:
+        for file_id, result in parse_upload_files(files).items():
+            results[file_id] = (parser_opts.get(file_id, None), result)
+
+    with _parsed_uploads_lock:
+        _parsed_uploads[upload.token] = results
+        while len(_parsed_uploads) > PARSED_UPLOAD_CACHE_SIZE:
+            _parsed_uploads.popitem(last=False)
+
+    tables = []
+    errors = {}
+    # keep the order of the files in the upload
+    for file_id in upload.sessions:
+        result = results[file_id][1]
+        if isinstance(result, str):
+            errors[file_id] = result
+        else:
+            tables.extend(result)
+    return tables, errors
+
+
+def delete_pending_upload(upload: PendingUpload):
+    with _parsed_uploads_lock:
+        _parsed_uploads.pop(upload.token, None)
+    for session in upload.sessions.values():
+        delete_upload_session(session)
+    (get_upload_dir() / f"{upload.token}.upload").unlink(missing_ok=True)
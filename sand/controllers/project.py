@@ -1,42 +1,134 @@
-import tempfile
 from dataclasses import asdict
-from pathlib import Path
-from typing import List
+from itertools import chain
+from typing import Dict, List
 
 import orjson
-from flask import jsonify, make_response, request
+from flask import Response, jsonify, request, stream_with_context
 from gena import generate_api
 from gena.deserializer import get_dataclass_deserializer
-from sm.dataset import Dataset, Example, FullTable
-from sm.prelude import I, M, O
+from werkzeug.datastructures import FileStorage
 from werkzeug.exceptions import BadRequest
 
+from sand.controllers.helpers.export import (
+    EXPORT_WORKERS,
+    get_export_pool,
+    iter_export_zip,
+)
 from sand.controllers.helpers.upload import (
     ALLOWED_EXTENSIONS,
+    ArrowParserOpts,
     CSVParserOpts,
+    JSONLinesParserOpts,
     JSONParserOpts,
-    UploadingTable,
+    ParquetParserOpts,
     get_extension,
-    parse_upload,
     save_upload,
 )
-from sand.controllers.table import get_friendly_fs_name
+from sand.controllers.helpers.upload_session import (
+    UploadSession,
+    append_upload_chunk,
+    create_pending_upload,
+    create_upload_session,
+    delete_pending_upload,
+    delete_upload_session,
+    get_pending_upload,
+    get_upload_session,
+    parse_pending_upload,
+)
+from sand.controllers.table import (
+    LINKED_ENTITIES_HEADER,
+    get_friendly_fs_name,
+    iter_csv,
+    make_export_response,
+    search_cells_response,
+)
 from sand.models import Project
-from sand.models.semantic_model import SemanticModel
-from sand.models.table import Table, TableRow
+from sand.models.table import Table, iter_cell_links
 
 project_bp = generate_api(Project)
 
-deser_CSVParserOpts = get_dataclass_deserializer(CSVParserOpts, {})
-deser_JSONParserOpts = get_dataclass_deserializer(JSONParserOpts, {})
-assert deser_CSVParserOpts is not None
-assert deser_JSONParserOpts is not None
+# deserializers of parser options by their format
+deser_parser_opts = {
+    opts_cls.format: get_dataclass_deserializer(opts_cls, {})
+    for opts_cls in [
+        CSVParserOpts,
+        JSONParserOpts,
+        JSONLinesParserOpts,
+        ParquetParserOpts,
+        ArrowParserOpts,
+    ]
+}
+assert all(deser is not None for deser in deser_parser_opts.values())
+
+# number of rows of each table returned in the preview of an upload
+UPLOAD_PREVIEW_ROWS = 100
+
+
+@project_bp.route(f"/{project_bp.name}/<id>/upload-sessions", methods=["POST"])
+def create_upload(id: int):
+    """Start a resumable upload of a file. The file is sent in chunks to the returned session,
+    then the session id is passed to the `/upload` endpoint in place of the file.
+    """
+    filename = request.json.get("filename")
+    size = request.json.get("size")
+    if (
+        not isinstance(filename, str)
+        or get_extension(filename) not in ALLOWED_EXTENSIONS
+    ):
+        raise BadRequest(
+            f"`filename` must have one of the extensions: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    if not isinstance(size, int) or size < 0:
+        raise BadRequest("`size` must be a non-negative number")
+    if Project.get_or_none(Project.id == id) is None:
+        raise BadRequest("Project not found")
+
+    return jsonify(create_upload_session(int(id), filename, size).to_dict())
+
+
+@project_bp.route(
+    f"/{project_bp.name}/<id>/upload-sessions/<session_id>", methods=["GET"]
+)
+def get_upload(id: int, session_id: str):
+    """Get the progress of an upload session, the next chunk starts at its `offset`"""
+    return jsonify(get_upload_session(int(id), session_id).to_dict())
+
+
+@project_bp.route(
+    f"/{project_bp.name}/<id>/upload-sessions/<session_id>", methods=["PUT"]
+)
+def upload_chunk(id: int, session_id: str):
+    """Append the request body to the file of an upload session. The `offset` query argument
+    is the position of the chunk in the file and must match the offset of the session.
+    """
+    session = get_upload_session(int(id), session_id)
+    offset = request.args.get("offset", type=int)
+    if offset is None:
+        raise BadRequest("Missing `offset` of the chunk")
+    return jsonify(append_upload_chunk(session, offset, request.stream).to_dict())
+
+
+@project_bp.route(
+    f"/{project_bp.name}/<id>/upload-sessions/<session_id>", methods=["DELETE"]
+)
+def delete_upload(id: int, session_id: str):
+    """Cancel an upload session and remove its file"""
+    delete_upload_session(get_upload_session(int(id), session_id))
+    return jsonify({"status": "success"})
 
 
 @project_bp.route(f"/{project_bp.name}/<id>/upload", methods=["POST"])
 def upload(id: int):
-    """Upload tables to the project"""
-    files = {}
+    """Upload tables to the project. Besides files in the request, the `upload_sessions` form
+    field can map file ids to completed upload sessions, whose files are used instead.
+
+    Multiple files are parsed concurrently, and files that cannot be parsed are reported in
+    `errors` (by file id) without failing the others. Without `selected_tables`, the first
+    rows of the parsed tables are returned with an `upload_token`. Passing the token instead of the files to a later
+    request (to save the tables or to parse with other options) reuses the uploaded files
+    and their parsed tables.
+    """
+    files: Dict[str, FileStorage] = {}
 
     for file_id, file in request.files.items():
         if (
@@ -46,7 +138,32 @@ def upload(id: int):
         ):
             files[file_id] = file
 
-    if len(files) == 0:
+    sessions: Dict[str, UploadSession] = {}
+    if "upload_sessions" in request.form:
+        try:
+            session_ids = orjson.loads(request.form["upload_sessions"])
+        except ValueError:
+            raise BadRequest("Invalid value for `upload_sessions`")
+        if not isinstance(session_ids, dict) or any(
+            not isinstance(x, str) for x in session_ids.values()
+        ):
+            raise BadRequest(
+                "Invalid value for `upload_sessions`. Expect a dictionary of upload session id for each file id"
+            )
+        sessions = {
+            file_id: get_upload_session(int(id), session_id)
+            for file_id, session_id in session_ids.items()
+        }
+
+    pending_upload = None
+    if "upload_token" in request.form:
+        # files of a previous preview request
+        pending_upload = get_pending_upload(int(id), request.form["upload_token"])
+        file_ids = set(pending_upload.sessions.keys())
+    else:
+        file_ids = set(files.keys()).union(sessions.keys())
+
+    if len(file_ids) == 0:
         raise BadRequest(f"No files provided")
 
     if "parser_opts" in request.form:
@@ -60,7 +177,7 @@ def upload(id: int):
                 "Invalid value for `parser_opts`. Expect a dictionary of parser options for each file id"
             )
 
-        if len(set(raw_parser_opts.keys()).difference(files.keys())) > 0:
+        if len(set(raw_parser_opts.keys()).difference(file_ids)) > 0:
             raise BadRequest(
                 "Invalid value for `parser_opts`. Contains unknown file ids"
             )
@@ -71,19 +188,19 @@ def upload(id: int):
                 raise BadRequest(
                     f"Invalid parser options for `{file_id}`. Expect a dictionary with a `format` key"
                 )
-            if opts["format"] == "csv":
-                parser_opts[file_id] = deser_CSVParserOpts(opts)
-            elif opts["format"] == "json":
-                parser_opts[file_id] = deser_JSONParserOpts(opts)
-            else:
+            if opts["format"] not in deser_parser_opts:
                 raise BadRequest(f"Invalid format `{file_id}`.")
+            parser_opts[file_id] = deser_parser_opts[opts["format"]](opts)
     else:
         parser_opts = {}
 
-    # parse the content
-    tables: List[UploadingTable] = []
-    for file_id, file in files.items():
-        tables += parse_upload(parser_opts.get(file_id, None), file)
+    if pending_upload is None:
+        # keep the files on disk, so they can be parsed in worker processes and a preview
+        # can be saved later without uploading and parsing the files again
+        pending_upload = create_pending_upload(int(id), {**files, **sessions})
+
+    # parse the content, files that cannot be parsed are reported in `errors`
+    tables, errors = parse_pending_upload(pending_upload, parser_opts)
 
     if "selected_tables" in request.form:
         # signal that we go ahead with the selected tables and save it to the database
@@ -116,20 +233,37 @@ def upload(id: int):
             else:
                 names[tbl.name][1] += 1
                 raw_tables[names[tbl.name][0]].name = tbl.name + "-1"
-                tbl.name = tbl.name + "-" + names[tbl.name][1]
+                tbl.name = f"{tbl.name}-{names[tbl.name][1]}"
 
-        dbtables = save_upload(project, [raw_tables[i] for i in selected_tables])
+        storage = request.form.get("storage", "row")
+        if storage not in ("row", "columnar"):
+            raise BadRequest("`storage` must be either `row` or `columnar`")
+
+        dbtables = save_upload(
+            project, [raw_tables[i] for i in selected_tables], storage
+        )
+        # the tables are saved, the uploaded files are no longer needed
+        delete_pending_upload(pending_upload)
         return jsonify(
-            {"status": "success", "table_ids": [table.id for table in dbtables]}
+            {
+                "status": "success",
+                "table_ids": [table.id for table in dbtables],
+                "errors": errors,
+            }
         )
 
+    preview_rows = request.form.get("preview_rows", UPLOAD_PREVIEW_ROWS, type=int)
     return jsonify(
         {
             "status": "success",
+            "upload_token": pending_upload.token,
+            "errors": errors,
             "tables": [
                 {
                     "parser_opts": asdict(table.parser_opts),
-                    "tables": [asdict(raw_table) for raw_table in table.tables],
+                    "tables": [
+                        raw_table.to_dict(preview_rows) for raw_table in table.tables
+                    ],
                 }
                 for table in tables
             ],
@@ -137,56 +271,48 @@ def upload(id: int):
     )
 
 
+@project_bp.route(f"/{project_bp.name}/<id>/search-cells", methods=["GET"])
+def search_project_cells(id: int):
+    """Search cells of all tables in the project containing the text in the `q` query argument"""
+    return search_cells_response(Table.select(Table.id).where(Table.project == id))
+
+
+@project_bp.route(f"/{project_bp.name}/<id>/export-linked-entities", methods=["GET"])
+def export_linked_entities(id: int):
+    """Export links of all tables in the project as a single CSV file, in which the `table`
+    column is the name of the table of each link. Links are streamed table by table.
+    """
+    project = Project.get_by_id(id)
+    tables = list(
+        Table.select(Table.id, Table.name)
+        .where(Table.project == project)
+        .order_by(Table.id)
+    )
+    records = (
+        (table.name, *link) for table in tables for link in iter_cell_links(table.id)
+    )
+    return make_export_response(
+        str(project.name),
+        iter_csv(chain([["table", *LINKED_ENTITIES_HEADER]], records)),
+        "csv",
+    )
+
+
 @project_bp.route(f"/{project_bp.name}/<id>/export", methods=["GET"])
 def export(id: int):
-    """Export tables from the project"""
+    """Export tables from the project as a zip file of a dataset. Tables are converted in
+    worker processes (if there are more than one) and the zip file is streamed as they
+    are written.
+    """
     try:
         project = Project.get_by_id(id)
     except:
         raise BadRequest("Project not found")
 
-    examples = []
-    for tbl in Table.select().where(Table.project == project):
-        tblrows = list(TableRow.select().where(TableRow.table == tbl))
-        basetbl = I.ColumnBasedTable.from_rows(
-            records=[row.row for row in tblrows],
-            table_id=tbl.name,
-            headers=tbl.columns,
-            strict=True,
-        )
-        table = FullTable(
-            table=basetbl,
-            context=(
-                I.Context(
-                    page_title=tbl.context_page.title,
-                    page_url=tbl.context_page.url,
-                    entities=(
-                        [I.EntityId(tbl.context_page.entity, "")]
-                        if tbl.context_page.entity is not None
-                        else []
-                    ),
-                )
-                if tbl.context_page is not None
-                else I.Context()
-            ),
-            links=M.Matrix.default(basetbl.shape(), list),
-        )
-        table.links = table.links.map_index(
-            lambda ri, ci: tblrows[ri].links.get(ci, [])
-        )
-
-        ex = Example(id=table.table.table_id, sms=[], table=table)
-
-        for sm in SemanticModel.select().where(SemanticModel.table == tbl):
-            ex.sms.append(sm.data)
-
-        examples.append(ex)
-
-    with tempfile.NamedTemporaryFile(suffix=".zip") as file:
-        Dataset(Path(file.name)).save(examples, table_fmt_indent=2)
-        dataset = Path(file.name).read_bytes()
+    tables = Table.select().where(Table.project == project).order_by(Table.id)
+    pool = get_export_pool() if EXPORT_WORKERS > 1 and tables.count() > 1 else None
 
-    resp = make_response(dataset)
+    resp = Response(stream_with_context(iter_export_zip(tables.iterator(), pool)))
     resp.headers["Content-Type"] = "application/zip; charset=utf-8"
     resp.headers["Content-Disposition"] = (
         f"attachment; filename={get_friendly_fs_name(str(project.name))}.zip"
@@ -0,0 +1,53 @@
+from flask import jsonify
+from gena import generate_api
+from werkzeug.exceptions import NotFound
+
+import sand.deserializer as sand_deser
+import sand.serializer as sand_ser
+from sand.models import SemanticModel
+from sand.models.semantic_model import get_sm_version, get_sm_versions
+
+semantic_model_bp = generate_api(
+    SemanticModel,
+    deserializers={"data": sand_deser.deserialize_graph},
+    batch_serialize=sand_ser.batch_serialize_sms,
+)
+
+
+@semantic_model_bp.route(
+    f"/{semantic_model_bp.name}/<int:id>/versions",
+    methods=["GET"],
+)
+def get_versions(id: int):
+    """List versions of a semantic model in the history"""
+    sm = (
+        SemanticModel.select(SemanticModel.id, SemanticModel.version)
+        .where(SemanticModel.id == id)
+        .get_or_none()
+    )
+    if sm is None:
+        raise NotFound(f"Record {id} does not exist")
+
+    versions = get_sm_versions(sm)
+    return jsonify({"items": versions, "total": len(versions)})
+
+
+@semantic_model_bp.route(
+    f"/{semantic_model_bp.name}/<int:id>/versions/<int:version>",
+    methods=["GET"],
+)
+def get_version(id: int, version: int):
+    """Get a semantic model at a given version"""
+    sm = SemanticModel.get_or_none(SemanticModel.id == id)
+    if sm is None:
+        raise NotFound(f"Record {id} does not exist")
+
+    if sm.version != version:
+        data = get_sm_version(sm, version)
+        if data is None:
+            raise NotFound(
+                f"Version {version} of the semantic model {id} does not exist"
+            )
+        sm.version = version
+        sm.data = data
+    return jsonify(sand_ser.batch_serialize_sms([sm])[0])
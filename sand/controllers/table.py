@@ -1,22 +1,34 @@
 from __future__ import annotations
 
 import csv
+import re
 import zipfile
 from dataclasses import dataclass
-from functools import lru_cache
+from functools import lru_cache, wraps
+from itertools import chain
 from io import BytesIO, StringIO
-from typing import List, Literal, Optional
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import sm.outputs.semantic_model as O
 from dependency_injector.wiring import Provide, inject
-from flask import jsonify, make_response, request
+from flask import Response, jsonify, make_response, request, stream_with_context
 from gena import generate_api
 from gena.deserializer import (
     generate_deserializer,
     get_dataclass_deserializer,
     get_deserializer_from_type,
 )
-from peewee import DoesNotExist, fn
+from peewee import DoesNotExist, Select, chunked
 from slugify import slugify
 from sm.misc.funcs import import_func
 from werkzeug.exceptions import BadRequest, NotFound
@@ -24,11 +36,25 @@ from werkzeug.exceptions import BadRequest, NotFound
 from sand.config import AppConfig
 from sand.deserializer import deser_context_tree
 from sand.extension_interface.export import IExport, OutputFormat
+from sand.helpers.json_provider import orjson_response
 from sand.helpers.namespace import NamespaceService
+from sand.helpers.readable_label import ReadableLabelService
 from sand.helpers.service_provider import MultiServiceProvider
-from sand.models import SemanticModel, Table, TableRow
+from sand.models import SemanticModel, Table, TableRow, db
 from sand.models.ontology import OntClassAR, OntPropertyAR
-from sand.models.table import Link
+from sand.models.table import (
+    MAX_BATCH_VALUES,
+    Link,
+    find_cells,
+    get_column,
+    get_row_links,
+    get_rows,
+    hydrate_rows,
+    iter_cell_links,
+    iter_rows,
+    search_cells,
+    set_column_links,
+)
 
 table_bp = generate_api(
     Table,
@@ -49,39 +75,10 @@ def export_sms(
     ontclass_ar: OntClassAR = Provide["classes"],
     ontprop_ar: OntPropertyAR = Provide["properties"],
 ):
-    subquery = (
-        SemanticModel.select(
-            SemanticModel.id, fn.MAX(SemanticModel.version).alias("version")
-        )
-        .where(SemanticModel.table == id)
-        .group_by(SemanticModel.table, SemanticModel.name)
-        .alias("q1")
-    )
-
-    query = (
-        SemanticModel.select()
-        .where(SemanticModel.table == id)
-        .join(subquery, on=(SemanticModel.id == subquery.c.id))
-    )
-
+    # a table has one record per semantic model, holding its latest version
+    query = SemanticModel.select().where(SemanticModel.table == id)
     sms: List[O.SemanticModel] = [r.data for r in query]
-    for sm in sms:
-        for n in sm.iter_nodes():
-            if isinstance(n, O.ClassNode):
-                if n.readable_label is None:
-                    n.readable_label = (
-                        tmp.readable_label
-                        if (tmp := ontclass_ar.get_by_uri(n.abs_uri)) is not None
-                        else None
-                    )
-        for e in sm.iter_edges():
-            if e.readable_label is None:
-                if e.readable_label is None:
-                    e.readable_label = (
-                        tmp.readable_label
-                        if (tmp := ontprop_ar.get_by_uri(e.abs_uri)) is not None
-                        else None
-                    )
+    ReadableLabelService(ontclass_ar, ontprop_ar).add_readable_labels(sms)
 
     resp = jsonify([sm.to_dict() for sm in sms])
     if request.args.get("attachment", "false") == "true":
@@ -91,6 +88,41 @@ def export_sms(
     return resp
 
 
+@table_bp.route(
+    f"/{table_bp.name}/<id>/search-cells",
+    methods=["GET"],
+)
+def search_table_cells(id: int):
+    """Search cells of a table containing the text in the `q` query argument, optionally
+    restricted to a `column`"""
+    column = request.args.get("column", None, type=int)
+    if "column" in request.args and (column is None or column < 0):
+        raise BadRequest("`column` must be a non-negative integer")
+    return search_cells_response([int(id)], column)
+
+
+# maximum number of cells returned by a search
+MAX_SEARCH_LIMIT = 1000
+
+
+def search_cells_response(
+    tables: Union[list[int], Select], column: Optional[int] = None
+):
+    """Search cells of the given tables using `q` & `limit` query arguments"""
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", 50, type=int)
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise BadRequest(f"`limit` must be between 1 and {MAX_SEARCH_LIMIT}")
+    if query == "":
+        return jsonify({"items": [], "total": 0})
+
+    items = [
+        {"table": table_id, "row": ri, "column": ci, "value": value}
+        for table_id, ri, ci, value in search_cells(query, tables, column, limit)
+    ]
+    return jsonify({"items": items, "total": len(items)})
+
+
 @table_bp.route(
     f"/{table_bp.name}/<id>/export-linked-entities",
     methods=["GET"],
@@ -100,40 +132,140 @@ def export_linked_entities(
     id: int, export: MultiServiceProvider[IExport] = Provide["export"]
 ):
     table: Table = Table.get_by_id(id)
-    rows: List[TableRow] = list(TableRow.select().where(TableRow.table == table))
-
-    output = []
-    for ri, row in enumerate(rows):
-        for ci, col in enumerate(row.row):
-            links = row.links.get(str(ci), [])
-            for link in links:
-                output.append(
-                    {
-                        "row": ri,
-                        "col": ci,
-                        "start": link.start,
-                        "end": link.end,
-                        "url": link.url,
-                        "entity": link.entity_id,
-                    }
-                )
-    f = StringIO()
-    writer = csv.writer(
-        f, delimiter=",", quoting=csv.QUOTE_MINIMAL, lineterminator="\n"
+
+    format = get_table_export_format()
+    if format != "csv":
+        # pyarrow is an optional dependency
+        import pyarrow as pa
+
+        from sand.helpers.arrow import BATCH_SIZE, iter_write_batches
+
+        schema = pa.schema(
+            [
+                (h, pa.string() if h in ("url", "entity") else pa.int64())
+                for h in LINKED_ENTITIES_HEADER
+            ]
+        )
+        batches = (
+            pa.RecordBatch.from_arrays(
+                [pa.array(column) for column in zip(*links)], schema=schema
+            )
+            for links in chunked(iter_cell_links(table), BATCH_SIZE)
+        )
+        return make_export_response(
+            str(table.name), iter_write_batches(schema, batches, format), format
+        )
+
+    return make_export_response(
+        str(table.name),
+        iter_csv(chain([LINKED_ENTITIES_HEADER], iter_cell_links(table))),
+        format,
+    )
+
+
+@table_bp.route(
+    f"/{table_bp.name}/<id>/export-rows",
+    methods=["GET"],
+)
+def export_rows(id: int):
+    """Export the header & rows of a table as CSV, Parquet or Arrow IPC (`format` query
+    argument). Columns of Parquet & Arrow files have the inferred types of the columns.
+    """
+    table: Table = Table.get_by_id(id)
+    format = get_table_export_format()
+
+    if format != "csv":
+        # pyarrow is an optional dependency
+        import pyarrow as pa
+
+        from sand.helpers.arrow import to_arrow_array, write_table
+
+        column_types = table.column_types or ["text"] * len(table.columns)
+        content = write_table(
+            pa.Table.from_arrays(
+                [
+                    to_arrow_array(get_column(table, ci), column_types[ci])
+                    for ci in range(len(table.columns))
+                ],
+                # names of columns must be unique
+                names=[
+                    name if table.columns.index(name) == ci else f"{name}_{ci}"
+                    for ci, name in enumerate(table.columns)
+                ],
+            ),
+            format,
+        )
+        return make_export_response(str(table.name), content, format)
+
+    return make_export_response(
+        str(table.name),
+        iter_csv(
+            chain(
+                [table.columns],
+                (row.row for row in iter_rows(table, EXPORT_BATCH_SIZE)),
+            )
+        ),
+        format,
     )
-    header = ["row", "col", "start", "end", "url", "entity"]
-    writer.writerow(header)
-    for record in output:
-        writer.writerow([record[h] for h in header])
-    resp = make_response(f.getvalue())
-    resp.headers["Content-Type"] = "text/csv; charset=utf-8"
+
+
+# number of rows read at a time when exporting rows of a table
+EXPORT_BATCH_SIZE = 1000
+# number of characters of CSV exports buffered before they are sent to the client
+CSV_CHUNK_SIZE = 64 * 1024
+# header of CSV files of exported links of tables
+LINKED_ENTITIES_HEADER = ["row", "col", "start", "end", "url", "entity"]
+# content types of formats that tables can be exported to
+TABLE_EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+def get_table_export_format() -> Literal["csv", "parquet", "arrow"]:
+    format = request.args.get("format", "csv")
+    if format not in TABLE_EXPORT_FORMATS:
+        raise BadRequest(
+            f"`format` must be one of: {', '.join(TABLE_EXPORT_FORMATS.keys())}"
+        )
+    return format  # type: ignore
+
+
+def make_export_response(
+    name: str, content: Union[str, bytes, Iterator[str], Iterator[bytes]], format: str
+):
+    """Make the response of an exported file, which is streamed if the content is an
+    iterator of its parts. `name` is the name of the file without extension.
+    """
+    if isinstance(content, (str, bytes)):
+        resp = make_response(content)
+    else:
+        resp = Response(stream_with_context(content))
+    resp.headers["Content-Type"] = TABLE_EXPORT_FORMATS[format]
     if request.args.get("attachment", "false") == "true":
         resp.headers["Content-Disposition"] = (
-            f"attachment; filename={get_friendly_fs_name(str(table.name))}.csv"
+            f"attachment; filename={get_friendly_fs_name(name)}.{format}"
         )
     return resp
 
 
+def iter_csv(records: Iterable[Sequence]) -> Iterator[str]:
+    """Write records as CSV, yielding the output in chunks of about `CSV_CHUNK_SIZE` characters"""
+    f = StringIO()
+    writer = csv.writer(
+        f, delimiter=",", quoting=csv.QUOTE_MINIMAL, lineterminator="\n"
+    )
+    for record in records:
+        writer.writerow(record)
+        if f.tell() >= CSV_CHUNK_SIZE:
+            yield f.getvalue()
+            f.seek(0)
+            f.truncate()
+    if f.tell() > 0:
+        yield f.getvalue()
+
+
 @table_bp.route(
     f"/{table_bp.name}/<id>/export-full-model",
     methods=["GET"],
@@ -145,21 +277,10 @@ def export_full_model(
     # load table
     table: Table = Table.get_by_id(id)
 
-    # load models
-    subquery = (
-        SemanticModel.select(
-            SemanticModel.id, fn.MAX(SemanticModel.version).alias("version")
-        )
-        .where(SemanticModel.table == table)
-        .group_by(SemanticModel.table, SemanticModel.name)
-        .alias("q1")
+    # load the latest version of models
+    sms: List[SemanticModel] = list(
+        SemanticModel.select().where(SemanticModel.table == table)
     )
-    query = (
-        SemanticModel.select()
-        .where(SemanticModel.table == table)
-        .join(subquery, on=(SemanticModel.id == subquery.c.id))
-    )
-    sms: List[SemanticModel] = list(query)
 
     if len(sms) == 0:
         raise BadRequest("Exporting data requires the table to be modeled")
@@ -176,7 +297,7 @@ def export_full_model(
                 "There are more than one semantic model for this table. Please specify the semantic model you want to export via the 'sm' query parameter"
             )
     sm = sms[0]
-    rows: List[TableRow] = list(TableRow.select().where(TableRow.table == table))
+    rows = get_rows(table)
     export_obj = export.get_default()
     datamodel = export_obj.export_data_model(table, sm.data)
     resources = export_obj.export_extra_resources(table, rows, sm.data)
@@ -211,21 +332,10 @@ def export_table_data(
     # load table
     table: Table = Table.get_by_id(id)
 
-    # load models
-    subquery = (
-        SemanticModel.select(
-            SemanticModel.id, fn.MAX(SemanticModel.version).alias("version")
-        )
-        .where(SemanticModel.table == table)
-        .group_by(SemanticModel.table, SemanticModel.name)
-        .alias("q1")
+    # load the latest version of models
+    sms: List[SemanticModel] = list(
+        SemanticModel.select().where(SemanticModel.table == table)
     )
-    query = (
-        SemanticModel.select()
-        .where(SemanticModel.table == table)
-        .join(subquery, on=(SemanticModel.id == subquery.c.id))
-    )
-    sms: List[SemanticModel] = list(query)
 
     if len(sms) == 0:
         raise BadRequest("Exporting data requires the table to be modeled")
@@ -243,11 +353,11 @@ def export_table_data(
             )
     sm = sms[0]
 
-    # load rows
-    rows: List[TableRow] = list(TableRow.select().where(TableRow.table == table))
-
-    content = export.get_default().export_data(table, rows, sm.data, OutputFormat.TTL)
-    resp = make_response(content)
+    # rows are read in batches while the data is exported & sent to the client
+    content = export.get_default().export_data_stream(
+        table, iter_rows(table, EXPORT_BATCH_SIZE), sm.data, OutputFormat.TTL
+    )
+    resp = Response(stream_with_context(content))
     resp.headers["Content-Type"] = "text/ttl; charset=utf-8"
     if request.args.get("attachment", "false") == "true":
         resp.headers["Content-Disposition"] = (
@@ -264,7 +374,164 @@ def get_export(
     return import_func(appcfg.export.get_func(name))()
 
 
-table_row_bp = generate_api(TableRow)
+table_row_bp = generate_api(
+    TableRow,
+    deserializers={
+        "row": get_deserializer_from_type(List[Union[str, float]], {}),
+    },
+    serialize=lambda row: hydrate_rows([row])[0].to_dict(passthrough=True),
+    batch_serialize=lambda rows: [
+        row.to_dict(passthrough=True) for row in hydrate_rows(rows)
+    ],
+)
+
+
+# fields of table rows in the output of their endpoints. `links` is not a column of
+# TableRow (see `TableRow.links`), so the generated endpoints cannot select it
+ROW_FIELDS = ["id", "table", "index", "row", "links"]
+ROW_FIELD_REGEX = re.compile(r"(?P<name>[a-zA-Z_0-9]+)(?:\[(?P<op>[a-zA-Z0-9]+)\])?")
+row_name2field = {
+    **TableRow._meta.fields,  # type: ignore
+    "table_id": TableRow.table,
+}
+deser_row_fields = generate_deserializer(TableRow, known_field_deserializers={"row"})
+
+
+def select_links_field(view, select):
+    """Answer requests of a generated endpoint of table rows that select `links` in the
+    `fields` argument with `select`, which is called with the selected fields and the
+    arguments of the endpoint. Other requests are answered by the generated endpoint.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        field_names = request.args.get("fields", "").split(",")
+        if "links" not in field_names:
+            return view(*args, **kwargs)
+        for name in field_names:
+            if name not in ROW_FIELDS:
+                raise BadRequest(f"Invalid field name: {name}")
+        return select(field_names, *args, **kwargs)
+
+    return wrapper
+
+
+def select_rows(field_names: List[str]) -> Select:
+    """Select the columns of table rows that are needed to output the given fields"""
+    columns = [TableRow.id, TableRow.table, TableRow.index]
+    if "row" in field_names:
+        columns.append(TableRow.row)
+    return TableRow.select(*columns)
+
+
+def serialize_rows(rows: List[TableRow], field_names: List[str]) -> List[dict]:
+    return [
+        row.to_dict(passthrough=True, fields=field_names)
+        for row in hydrate_rows(rows, fields=field_names)
+    ]
+
+
+def get_rows_with_links(field_names: List[str]):
+    """The `get` endpoint of table rows for requests selecting `links`. It has the same
+    arguments, except `unique`, `group_by` and the `max` condition, which are not supported.
+    """
+    query = select_rows(field_names)
+    for name, value in request.args.items():
+        if name in ("fields", "limit", "offset", "sorted_by"):
+            continue
+        if name in ("unique", "group_by"):
+            raise BadRequest(f"`{name}` is not supported when selecting `links`")
+        m = ROW_FIELD_REGEX.fullmatch(name)
+        if m is None or m.group("name") not in deser_row_fields:
+            raise BadRequest(f"Invalid field name: {name}")
+
+        field = row_name2field[m.group("name")]
+        deser = deser_row_fields[m.group("name")]
+        op = m.group("op")
+        if op == "in":
+            query = query.where(field.in_([deser(x) for x in value.split(",")]))
+            continue
+
+        value = deser(value)
+        if op is None:
+            query = query.where(field == value)
+        elif op == "gt":
+            query = query.where(field > value)
+        elif op == "gte":
+            query = query.where(field >= value)
+        elif op == "lt":
+            query = query.where(field < value)
+        elif op == "lte":
+            query = query.where(field <= value)
+        else:
+            raise BadRequest(f"Does not support {op} when selecting `links`")
+
+    order_by = []
+    for name in request.args.get("sorted_by", "").split(","):
+        if name == "":
+            continue
+        if name.lstrip("-") not in row_name2field:
+            raise BadRequest(f"Invalid field name: {name}")
+        field = row_name2field[name.lstrip("-")]
+        order_by.append(field.desc() if name.startswith("-") else field)
+    if len(order_by) > 0:
+        query = query.order_by(*order_by)
+
+    try:
+        limit = int(request.args.get("limit", "50"))
+        offset = int(request.args.get("offset", "0"))
+    except ValueError:
+        raise BadRequest("`limit` and `offset` must be integers")
+
+    total = query.count()
+    rows = list(query.limit(limit).offset(offset))
+    return jsonify({"items": serialize_rows(rows, field_names), "total": total})
+
+
+def get_row_with_links(field_names: List[str], id):
+    """The `get_one` endpoint of table rows for requests selecting `links`"""
+    rows = list(select_rows(field_names).where(TableRow.id == id))
+    if len(rows) == 0:
+        raise NotFound(f"Record {id} does not exist")
+    return jsonify(serialize_rows(rows, field_names)[0])
+
+
+def get_rows_by_ids_with_links(field_names: List[str]):
+    """The `get_by_ids` endpoint of table rows for requests selecting `links`"""
+    if request.json is None or "ids" not in request.json:
+        raise BadRequest("Bad request. Missing `ids`")
+    rows = list(select_rows(field_names).where(TableRow.id.in_(request.json["ids"])))
+    items = {
+        row.id: row.to_dict(passthrough=True, fields=field_names)  # type: ignore
+        for row in hydrate_rows(rows, fields=field_names)
+    }
+    return jsonify({"items": items, "total": len(items)})
+
+
+@table_row_bp.record_once
+def add_links_field(state):
+    for endpoint, select in [
+        ("get", get_rows_with_links),
+        ("get_one", get_row_with_links),
+        ("get_by_ids", get_rows_by_ids_with_links),
+    ]:
+        endpoint = f"{state.name}.{endpoint}"
+        state.app.view_functions[endpoint] = select_links_field(
+            state.app.view_functions[endpoint], select
+        )
+
+
+@table_row_bp.record_once
+def use_orjson_responses(state):
+    # generated endpoints that output rows, which are passed through as is (see
+    # `TableRow.to_dict`) so they must be encoded with orjson
+    for endpoint in ["get", "get_one", "get_by_ids", "create", "update"]:
+        endpoint = f"{state.name}.{endpoint}"
+        state.app.view_functions[endpoint] = orjson_response(
+            state.app.view_functions[endpoint]
+        )
+
+
 deser_list_links = get_deserializer_from_type(List[Link], {})
 assert deser_list_links is not None
 
@@ -281,6 +548,56 @@ deser_update_column_links = get_dataclass_deserializer(UpdateColumnLinksInput, {
 assert deser_update_column_links is not None
 
 
+# maximum number of rows in a page of `get_row_range`
+MAX_PAGE_SIZE = 1000
+
+
+@table_row_bp.route(f"/{table_row_bp.name}/range", methods=["GET"])
+@orjson_response
+def get_row_range():
+    """Get a page of rows of a table ordered by their index. Rows are selected by the
+    (table, index) key instead of an offset, and the total is the table's size, so
+    fetching a page deep in a large table costs the same as the first page.
+
+    Query arguments:
+        - table: id of the table
+        - start: index of the first row of the page (default 0)
+        - cursor: the `next_cursor` returned with the previous page, replacing `start`
+        - limit: number of rows in the page (default 50, at most `MAX_PAGE_SIZE`)
+    """
+    try:
+        table_id = int(request.args["table"])
+        start = int(request.args.get("cursor", request.args.get("start", "0")))
+        limit = int(request.args.get("limit", "50"))
+    except KeyError:
+        raise BadRequest("Missing `table`")
+    except ValueError:
+        raise BadRequest("`table`, `start`, `cursor` and `limit` must be integers")
+    if start < 0:
+        raise BadRequest("`start` and `cursor` must be non-negative")
+    if limit <= 0:
+        raise BadRequest("`limit` must be positive")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    table = Table.get_or_none(Table.id == table_id)
+    if table is None:
+        raise NotFound(f"Table {table_id} does not exist")
+
+    rows = get_rows(table, offset=start, limit=limit)
+    if len(rows) > 0 and len(rows) == limit and rows[-1].index + 1 < table.size:
+        next_cursor = str(rows[-1].index + 1)
+    else:
+        next_cursor = None
+
+    return jsonify(
+        {
+            "items": [row.to_dict(passthrough=True) for row in rows],
+            "total": table.size,
+            "next_cursor": next_cursor,
+        }
+    )
+
+
 @table_row_bp.route(f"/{table_row_bp.name}/<id>/cells/<column>", methods=["PUT"])
 def update_cell_link(id: int, column: int):
     """
@@ -290,6 +607,7 @@ def update_cell_link(id: int, column: int):
         row: TableRow = TableRow.get_by_id(id)
     except DoesNotExist:
         raise NotFound(f"Record {id} does not exist")
+    hydrate_rows([row])
 
     try:
         column = int(column)
@@ -304,38 +622,126 @@ def update_cell_link(id: int, column: int):
 
     if "links" not in request_json:
         raise KeyError(f"Field 'links' is required")
-    if not isinstance(request_json["links"], list) or not all(
-        isinstance(link, dict) for link in request_json["links"]
-    ):
-        raise KeyError(f"Field 'links' must be a list of dictionaries")
+    links = merge_cell_links(row.links.get(str(column), []), request_json["links"])
+    set_column_links(row.table, column, {row.index: links})
+    return jsonify({"success": True})
 
-    if (
-        len(request_json["links"]) > 0
-        and "candidate_entities" not in request_json["links"][0]
+
+@table_row_bp.route(f"/{table_row_bp.name}/cells", methods=["PUT"])
+def update_cells_links():
+    """Update links of multiple cells in a single transaction. The request body is
+    `{"table": <table id>, "patches": [{"id": <row id>, "column": .., "links": [..]}, ..]}`,
+    a patch can use `index` (the row index in the table) instead of the row id.
+    Links of a patch are handled the same way as updating links of a single cell.
+    """
+    request_json = request.get_json()
+    if request_json is None:
+        raise BadRequest("Missing request body")
+    if not isinstance(request_json.get("patches"), list) or not all(
+        isinstance(patch, dict) and "column" in patch and "links" in patch
+        for patch in request_json["patches"]
     ):
-        # add back the candidate so we can deserialize them
-        for link in request_json["links"]:
-            link["candidate_entities"] = []
-        links: List[Link] = deser_list_links(request_json["links"])
-
-        # then, we just need to update the links' entities
-        if len(row.links.get(str(column), [])) == 0:
-            row.links[str(column)] = links
+        raise BadRequest("Field 'patches' must be a list of {id/index, column, links}")
+    patches: List[dict] = request_json["patches"]
+    if "table" in request_json and not is_int(request_json["table"]):
+        raise BadRequest("Field 'table' must be an integer")
+    for patch in patches:
+        if "id" in patch and not is_int(patch["id"]):
+            raise BadRequest(f"Row id {patch['id']!r} must be an integer")
+
+    # resolve rows of the patches to (table, row index)
+    row_ids = [patch["id"] for patch in patches if "id" in patch]
+    id2row = {}
+    for i in range(0, len(row_ids), MAX_BATCH_VALUES):
+        for id, table_id, ri in (
+            TableRow.select(TableRow.id, TableRow.table, TableRow.index)
+            .where(TableRow.id.in_(row_ids[i : i + MAX_BATCH_VALUES]))
+            .tuples()
+        ):
+            id2row[id] = (table_id, ri)
+
+    cells = []
+    for patch in patches:
+        if "id" in patch:
+            if patch["id"] not in id2row:
+                raise NotFound(f"Record {patch['id']} does not exist")
+            table_id, ri = id2row[patch["id"]]
+        elif "index" in patch and "table" in request_json:
+            table_id, ri = request_json["table"], patch["index"]
         else:
-            if len(row.links[str(column)]) != len(links):
-                raise BadRequest(
-                    "Number of links in request does not match number of links in database"
-                )
-            for i, link in enumerate(links):
-                db_link = row.links[str(column)][i]
-                db_link.start = link.start
-                db_link.end = link.end
-                db_link.entity_id = link.entity_id
-    else:
-        row.links[str(column)] = deser_list_links(request_json["links"])
+            raise BadRequest("A patch needs either the row id or the table & row index")
+        cells.append((table_id, ri, patch["column"], patch["links"]))
 
-    row.save()
-    return jsonify({"success": True})
+    tables: Dict[int, Table] = {
+        table.id: table
+        for table in Table.select().where(
+            Table.id.in_(list({table_id for table_id, _, _, _ in cells}))
+        )
+    }
+    for table_id, ri, ci, _ in cells:
+        if table_id not in tables:
+            raise NotFound(f"Table {table_id} does not exist")
+        if not is_int(ri) or not (0 <= ri < tables[table_id].size):
+            raise BadRequest(f"Invalid row index {ri} of table {table_id}")
+        if not is_int(ci) or not (0 <= ci < len(tables[table_id].columns)):
+            raise BadRequest(f"Invalid column {ci} of table {table_id}")
+
+    # load the current links of the rows, one query per table
+    table2rows: Dict[int, List[int]] = {}
+    for table_id, ri, _, _ in cells:
+        table2rows.setdefault(table_id, []).append(ri)
+    current_links = {
+        table_id: get_row_links(table_id, sorted(set(rows)))
+        for table_id, rows in table2rows.items()
+    }
+
+    updated_links: Dict[Tuple[int, int], Dict[int, List[Link]]] = {}
+    for table_id, ri, ci, raw_links in cells:
+        row_links = current_links[table_id][ri]
+        row_links[str(ci)] = merge_cell_links(row_links.get(str(ci), []), raw_links)
+        updated_links.setdefault((table_id, ci), {})[ri] = row_links[str(ci)]
+
+    with db.atomic():
+        for (table_id, ci), links in updated_links.items():
+            set_column_links(tables[table_id], ci, links)
+    return jsonify({"success": True, "updated": len(cells)})
+
+
+def is_int(value) -> bool:
+    """Check if a value of a JSON request is an integer (booleans are not)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def merge_cell_links(links: List[Link], raw_links: list) -> List[Link]:
+    """Get the new links of a cell given its current links and links sent by the client.
+    When the client's links do not have candidate entities, only the entities of the current
+    links are updated so their candidate entities are kept.
+    """
+    if not isinstance(raw_links, list) or not all(
+        isinstance(link, dict) for link in raw_links
+    ):
+        raise KeyError(f"Field 'links' must be a list of dictionaries")
+
+    if len(raw_links) == 0 or "candidate_entities" in raw_links[0]:
+        return deser_list_links(raw_links)
+
+    # add back the candidate so we can deserialize them
+    newlinks: List[Link] = deser_list_links(
+        [{**link, "candidate_entities": []} for link in raw_links]
+    )
+
+    # then, we just need to update the links' entities
+    if len(links) == 0:
+        return newlinks
+    if len(links) != len(newlinks):
+        raise BadRequest(
+            "Number of links in request does not match number of links in database"
+        )
+    for db_link, link in zip(links, newlinks):
+        db_link.start = link.start
+        db_link.end = link.end
+        db_link.entity_id = link.entity_id
+    return links
 
 
 @table_row_bp.route(f"/{table_row_bp.name}/update_column_links", methods=["PUT"])
@@ -349,29 +755,33 @@ def update_column_links():
     if args.column >= len(table.columns):
         raise BadRequest(f"Invalid column {args.column} value")
 
-    rows: List[TableRow] = list(TableRow.select().where(TableRow.table == table))
-    str_column = str(args.column)
-    for row in rows:
-        if str(row.row[args.column]) != args.text:
-            continue
-
-        if str_column not in row.links:
-            row.links[str_column] = [
+    # only the links of the matched cells are changed
+    rows = find_cells(table, args.column, args.text)
+    row_links = {}
+    for batch in chunked(rows, MAX_BATCH_VALUES):
+        row_links.update(get_row_links(table, batch))
+
+    updated_links = {}
+    for ri in rows:
+        cell_links = row_links[ri].get(str(args.column), [])
+        if len(cell_links) == 0:
+            updated_links[ri] = [
                 Link(
                     start=0,
-                    end=len(str(row.row[args.column])),
+                    end=len(args.text),
                     url=None,
                     entity_id=args.entity_id,
                     candidate_entities=[],
                 )
             ]
         else:
-            db_link = row.links[str_column][0]
+            db_link = cell_links[0]
             db_link.start = 0
-            db_link.end = len(str(row.row[args.column]))
+            db_link.end = len(args.text)
             db_link.entity_id = args.entity_id
+            updated_links[ri] = cell_links
 
-        row.save()
+    set_column_links(table, args.column, updated_links)
     return jsonify({"success": True})
 
 
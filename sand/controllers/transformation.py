@@ -9,7 +9,7 @@ from flask.blueprints import Blueprint
 from RestrictedPython import compile_restricted_function, safe_globals
 from werkzeug.exceptions import BadRequest
 
-from sand.models.table import Link, Table, TableRow
+from sand.models.table import Link, Table, TableRow, get_rows
 from gena.deserializer import get_dataclass_deserializer
 from gena import generate_api
 from sand.models import Transformation
@@ -248,9 +248,7 @@ def transform():
 
     request_data = transform_request_deserializer(request.json)
     table = Table.get_by_id(request_data.table_id)
-    table_rows: List[TableRow] = list(
-        TableRow.select().where(TableRow.table == table).order_by(TableRow.index)
-    )
+    table_rows = get_rows(table, limit=request_data.rows)
     transform_func = compile_function(request_data.code)
     col_index_list = [table.columns.index(column) for column in request_data.datapath]
     data = (
@@ -259,7 +257,7 @@ def transform():
             [table_row.row[col_index] for col_index in col_index_list],
             Context(index=table_row.index, row=table_row.row),
         )
-        for table_row in table_rows[: request_data.rows]
+        for table_row in table_rows
     )
 
     transformed_data = None
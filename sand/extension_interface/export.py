@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 from enum import Enum
+from typing import Iterable, Iterator
 
 import sm.outputs.semantic_model as O
 
@@ -39,3 +40,17 @@ class IExport(ABC):
     ):
         """Export relational data"""
         pass
+
+    def export_data_stream(
+        self,
+        table: Table,
+        rows: Iterable[TableRow],
+        sm: O.SemanticModel,
+        output_format: OutputFormat,
+    ) -> Iterator[str]:
+        """Export relational data in parts that are concatenated to the output, so that
+        the output is sent while it is being produced. `rows` may be read lazily from
+        the database. By default, all rows are exported at once with `export_data`;
+        implementations should override this method to export the rows in chunks.
+        """
+        yield self.export_data(table, list(rows), sm, output_format)
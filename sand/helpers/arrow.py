@@ -0,0 +1,192 @@
+"""Read and write tables in Apache Parquet & Arrow IPC formats. pyarrow is an optional
+dependency (the `arrow` extra), so this module is only imported when it is needed.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from io import BytesIO
+from typing import IO, Iterable, Iterator, List, Literal, Optional, Sequence, Union
+
+import orjson
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from sand.helpers.column_types import ColumnType
+
+ArrowFormat = Literal["parquet", "arrow"]
+CellValue = Union[str, int, float, None]
+
+# number of rows of record batches read from parquet files or written to files
+BATCH_SIZE = 10000
+
+
+def read_schema(file: Union[str, IO[bytes]], format: ArrowFormat) -> pa.Schema:
+    if format == "parquet":
+        return pq.read_schema(file)
+    with open_ipc_file(file) as reader:
+        return reader.schema
+
+
+def count_rows(file: Union[str, IO[bytes]], format: ArrowFormat) -> int:
+    """Get the number of rows of a file from its metadata"""
+    if format == "parquet":
+        return pq.ParquetFile(file).metadata.num_rows
+    with open_ipc_file(file) as reader:
+        return sum(
+            reader.get_batch(i).num_rows for i in range(reader.num_record_batches)
+        )
+
+
+def iter_batches(
+    file: Union[str, IO[bytes]], format: ArrowFormat
+) -> Iterator[pa.RecordBatch]:
+    """Read record batches of a file (a path or an open file) one by one. Arrow IPC files
+    on disk are memory-mapped, so their batches are read without copying.
+    """
+    if format == "parquet":
+        yield from pq.ParquetFile(file).iter_batches(batch_size=BATCH_SIZE)
+        return
+
+    with open_ipc_file(file) as reader:
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+def open_ipc_file(file: Union[str, IO[bytes]]) -> ipc.RecordBatchFileReader:
+    """Open an Arrow IPC file (also known as Feather V2)"""
+    if isinstance(file, str):
+        return ipc.open_file(pa.memory_map(file, "r"))
+    file.seek(0)
+    return ipc.open_file(file)
+
+
+def iter_rows(
+    file: Union[str, IO[bytes]], format: ArrowFormat
+) -> Iterator[List[CellValue]]:
+    """Read rows of a file, values that are not strings or numbers are converted by
+    `to_cell_value`
+    """
+    for batch in iter_batches(file, format):
+        columns = [
+            (
+                [to_cell_value(value) for value in column.to_pylist()]
+                if not is_primitive_type(column.type)
+                else column.to_pylist()
+            )
+            for column in batch.columns
+        ]
+        yield from (list(row) for row in zip(*columns))
+
+
+def get_column_type(type: pa.DataType) -> Optional[ColumnType]:
+    """Get the column type of an arrow type, None if it must be inferred from values"""
+    if pa.types.is_integer(type):
+        return "integer"
+    if pa.types.is_floating(type) or pa.types.is_decimal(type):
+        return "decimal"
+    if pa.types.is_temporal(type) and not pa.types.is_duration(type):
+        return "date"
+    if pa.types.is_boolean(type):
+        # booleans are stored as "true" & "false", which would be inferred as entities
+        return "text"
+    return None
+
+
+def is_primitive_type(type: pa.DataType) -> bool:
+    """Whether values of the type are stored in tables as they are"""
+    return (
+        pa.types.is_integer(type)
+        or pa.types.is_floating(type)
+        or pa.types.is_string(type)
+        or pa.types.is_large_string(type)
+        or pa.types.is_null(type)
+    )
+
+
+def to_cell_value(value) -> CellValue:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return orjson.dumps(value, default=str).decode()
+
+
+def to_arrow_array(values: Sequence[CellValue], type: ColumnType) -> pa.Array:
+    """Convert cells of a column to an arrow array of the column's type. Empty cells are
+    nulls of numeric columns. If a cell does not match the type (e.g., it is edited after
+    the type was inferred), the column is exported as strings.
+    """
+    if type in ("integer", "decimal"):
+        pytype = int if type == "integer" else float
+        try:
+            return pa.array(
+                [
+                    None if value == "" or value is None else pytype(value)
+                    for value in values
+                ],
+                type=pa.int64() if type == "integer" else pa.float64(),
+            )
+        except (ValueError, TypeError, OverflowError):
+            pass
+    return pa.array(
+        [None if value is None else str(value) for value in values], type=pa.string()
+    )
+
+
+def write_table(table: pa.Table, format: ArrowFormat) -> bytes:
+    output = BytesIO()
+    if format == "parquet":
+        pq.write_table(table, output)
+    else:
+        with ipc.new_file(output, table.schema) as writer:
+            writer.write_table(table)
+    return output.getvalue()
+
+
+def iter_write_batches(
+    schema: pa.Schema, batches: Iterable[pa.RecordBatch], format: ArrowFormat
+) -> Iterator[bytes]:
+    """Write record batches to a file, yielding parts of the file as the batches are
+    written so that the file does not have to be in memory
+    """
+    output = ChunkedOutput()
+    writer = (
+        pq.ParquetWriter(output, schema)
+        if format == "parquet"
+        else ipc.new_file(output, schema)
+    )
+    with writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield output.pop()
+    yield output.pop()
+
+
+class ChunkedOutput(BytesIO):
+    """An in-memory file whose content is taken out by `pop` while it is written. The
+    position keeps counting the taken out bytes, as writers use it for the offsets in
+    the file.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.offset = 0
+
+    def tell(self) -> int:
+        return self.offset + super().tell()
+
+    def pop(self) -> bytes:
+        data = self.getvalue()
+        self.offset += len(data)
+        self.seek(0)
+        self.truncate()
+        return data
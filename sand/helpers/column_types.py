@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Literal, Sequence, Union
+
+import numpy as np
+
+ColumnType = Literal[
+    "empty", "integer", "decimal", "date", "coordinate", "url", "entity", "text"
+]
+CellValue = Union[str, int, float, None]
+
+# types are tried in this order, the first one matching all values of a column is chosen
+COLUMN_TYPES: List[ColumnType] = [
+    "integer",
+    "decimal",
+    "date",
+    "coordinate",
+    "url",
+    "entity",
+    "text",
+]
+# types that a column can be changed to when its values no longer match its type,
+# values matching a type also match its generalizations
+GENERALIZATIONS: Dict[ColumnType, List[ColumnType]] = {
+    "empty": COLUMN_TYPES,
+    "integer": ["decimal", "text"],
+    "decimal": ["text"],
+    "date": ["text"],
+    "coordinate": ["text"],
+    "url": ["text"],
+    "entity": ["text"],
+    "text": [],
+}
+# number of rows used to pick the candidate types of columns
+SAMPLE_SIZE = 1000
+# number of rows whose values are checked at once
+CHUNK_SIZE = 10000
+# maximum number of words of an entity name
+MAX_ENTITY_WORDS = 8
+
+DATE_REGEX = re.compile(
+    r"\d{4}(-\d{1,2}(-\d{1,2}([T ]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?)?)?"
+    r"|\d{1,2}[/.-]\d{1,2}[/.-]\d{4}"
+    r"|\d{4}/\d{1,2}/\d{1,2}"
+)
+COORDINATE_REGEX = re.compile(
+    # decimal degrees, e.g., 22.3, 103.77 (latitude, longitude) or POINT(103.77 22.3)
+    # (longitude latitude), the decimal part is required to not match numbers with
+    # thousands separators
+    r"(?P<lat>-?\d{1,2}\.\d+)\s*[,;]\s*(?P<lon>-?\d{1,3}\.\d+)"
+    r"|POINT\s*\(\s*(?P<point_lon>-?\d{1,3}(\.\d+)?)\s+(?P<point_lat>-?\d{1,2}(\.\d+)?)\s*\)"
+    # degrees, minutes & seconds, e.g., 22°18′12″N 103°46′30″E, the hemispheres
+    # can be written in other languages
+    r"|(?P<deg1>\d{1,3}(\.\d+)?)°(\s*\d{1,2}(\.\d+)?[′'])?(\s*\d{1,2}(\.\d+)?[″\"])?\s*[^\W\d_]"
+    r"[\s,;]*(?P<deg2>\d{1,3}(\.\d+)?)°(\s*\d{1,2}(\.\d+)?[′'])?(\s*\d{1,2}(\.\d+)?[″\"])?\s*[^\W\d_]",
+    re.IGNORECASE,
+)
+# numbers as written by python, numbers formatted in other ways (e.g., 1_000, 1,000 or
+# with spaces) are not numbers of the table
+INTEGER_REGEX = re.compile(r"[+-]?\d+")
+DECIMAL_REGEX = re.compile(r"[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?")
+URL_REGEX = re.compile(r"(https?|ftp)://\S+", re.IGNORECASE)
+ENTITY_REGEX = re.compile(r"[^\W\d_]")
+
+
+class ColumnTypeInference:
+    """Infer types of columns of a table from its rows, which are fed in batches so that
+    the table does not need to be in memory.
+
+    The first `SAMPLE_SIZE` rows pick the most specific type matching all values of each
+    column, then the rest of the rows verify the types: if a batch has values that do not
+    match the type of a column, the column is changed to the first generalization of its
+    type that matches the batch. Values of numeric types are matched with a strict
+    number pattern and converted with numpy to check their ranges, values of other types
+    are matched one by one. Empty cells ("" or null) match all types.
+    """
+
+    def __init__(self):
+        self.types: List[ColumnType] = []
+        self.buffer: List[Sequence[CellValue]] = []
+        self.n_rows = 0
+
+    def update(self, rows: Iterable[Sequence[CellValue]]):
+        for row in rows:
+            self.buffer.append(row)
+            self.n_rows += 1
+            if len(self.buffer) == (
+                SAMPLE_SIZE if self.n_rows <= SAMPLE_SIZE else CHUNK_SIZE
+            ):
+                self.flush()
+
+    def flush(self):
+        if len(self.buffer) == 0:
+            return
+        n_columns = max(len(row) for row in self.buffer)
+        if n_columns > len(self.types):
+            self.types.extend(["empty"] * (n_columns - len(self.types)))
+
+        for ci in range(n_columns):
+            # an object array instead of a fixed-width string array, which takes the
+            # space of the longest value for every value
+            values = np.array(
+                [
+                    str(row[ci])
+                    for row in self.buffer
+                    if ci < len(row) and row[ci] is not None and row[ci] != ""
+                ],
+                dtype=object,
+            )
+            if len(values) == 0 or match_type(self.types[ci], values):
+                continue
+            for type in GENERALIZATIONS[self.types[ci]]:
+                if match_type(type, values):
+                    self.types[ci] = type
+                    break
+        self.buffer = []
+
+    def get_types(self, n_columns: int = 0) -> List[ColumnType]:
+        """Get types of the columns, padded with "empty" to at least `n_columns` columns"""
+        self.flush()
+        if n_columns > len(self.types):
+            self.types.extend(["empty"] * (n_columns - len(self.types)))
+        return self.types
+
+
+def infer_column_types(
+    rows: Iterable[Sequence[CellValue]], n_columns: int = 0
+) -> List[ColumnType]:
+    """Infer types of columns of a table, see `ColumnTypeInference`"""
+    inference = ColumnTypeInference()
+    inference.update(rows)
+    return inference.get_types(n_columns)
+
+
+def match_type(type: ColumnType, values: np.ndarray) -> bool:
+    """Check if all (non-empty) values of a column match the given type"""
+    if type == "empty":
+        return False
+    if type == "integer":
+        if not all(INTEGER_REGEX.fullmatch(value) is not None for value in values):
+            return False
+        try:
+            values.astype(np.int64)
+        except (ValueError, OverflowError):
+            return False
+        return True
+    if type == "decimal":
+        if not all(DECIMAL_REGEX.fullmatch(value) is not None for value in values):
+            return False
+        # values that are too large are parsed by numpy as inf
+        return bool(np.isfinite(values.astype(np.float64)).all())
+    if type == "text":
+        return True
+
+    pattern = {
+        "date": DATE_REGEX,
+        "url": URL_REGEX,
+    }.get(type, None)
+    strvalues = [value.strip() for value in values]
+    if type == "coordinate":
+        return all(is_coordinate(value) for value in strvalues)
+    if pattern is not None:
+        return all(pattern.fullmatch(value) is not None for value in strvalues)
+
+    assert type == "entity"
+    return all(
+        value.count(" ") < MAX_ENTITY_WORDS and ENTITY_REGEX.search(value) is not None
+        for value in strvalues
+    )
+
+
+def is_coordinate(value: str) -> bool:
+    """Check if a value is a coordinate whose latitude & longitude are in their ranges"""
+    m = COORDINATE_REGEX.fullmatch(value)
+    if m is None:
+        return False
+    if m.group("deg1") is not None:
+        # the order of latitude & longitude depends on the hemispheres
+        lat, lon = sorted([float(m.group("deg1")), float(m.group("deg2"))])
+    elif m.group("lat") is not None:
+        lat, lon = float(m.group("lat")), float(m.group("lon"))
+    else:
+        lat, lon = float(m.group("point_lat")), float(m.group("point_lon"))
+    return abs(lat) <= 90 and abs(lon) <= 180
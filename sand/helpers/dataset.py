@@ -0,0 +1,160 @@
+"""Read datasets of `sm` (see `sm.dataset.Dataset.load`) one example at a time"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager, nullcontext
+from operator import attrgetter
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+from zipfile import Path as ZipPath
+from zipfile import ZipFile
+
+import orjson
+from sm.dataset import Dataset, Example, FullTable
+from sm.outputs.semantic_model import SemanticModel
+
+
+def iter_dataset(dataset: Dataset) -> Iterator[Example[FullTable]]:
+    """Read examples of a dataset (a folder or a zip file) in the order of their table files,
+    reading the files of each example only when it is requested. The dataset has the
+    same structure as the one read by `Dataset.load`:
+
+        descriptions
+        ├── <table_fs_id>.json (or <table_fs_id>/version.<num>.json)
+        ├── part-<num>.zip (descriptions of tables in tables/part-<num>.zip)
+        tables
+        ├── <table_fs_id>.json
+        ├── part-<num>.zip
+
+    Only JSON files (written by `Dataset.save`) are read one by one, datasets that have
+    files in other formats are read with `Dataset.load`.
+    """
+    if not is_json_dataset(dataset):
+        yield from dataset.load()
+        return
+
+    with open_dataset(dataset) as root:
+        descdir = dataset.description_dir(root)
+        tabledir = dataset.table_dir(root)
+        has_desc = descdir.exists()
+
+        for infile in sorted(tabledir.iterdir(), key=attrgetter("name")):
+            suffixes = Path(infile.name).suffixes
+            if infile.name.startswith(".") or len(suffixes) == 0:
+                continue
+
+            if suffixes[-1] == ".zip":
+                assert isinstance(infile, Path) and isinstance(
+                    descdir, Path
+                ), "Parts of tables must not be in a zip file"
+                yield from iter_dataset_part(
+                    infile, descdir / infile.name if has_desc else None
+                )
+                continue
+
+            table = FullTable.from_dict(orjson.loads(infile.read_bytes()))
+            if has_desc:
+                example_id = infile.name[: -sum(len(x) for x in suffixes)]
+                desc_file = find_description_file(descdir, example_id)
+                sms = deser_sms(desc_file.read_bytes())
+            else:
+                sms = []
+            yield Example(id=table.table.table_id, sms=sms, table=table)
+
+
+def iter_dataset_part(
+    table_file: Path, desc_file: Optional[Path]
+) -> Iterator[Example[FullTable]]:
+    """Read examples of a part of a dataset: a zip file of tables and a zip file of
+    their descriptions. Every table must have a description if the description file
+    exists, the same as `Dataset.load`.
+    """
+    with ZipFile(table_file, mode="r") as tzf, (
+        ZipFile(desc_file, mode="r") if desc_file is not None else nullcontext()
+    ) as dzf:
+        desc_files = (
+            {Path(file.filename).stem: file for file in dzf.infolist()}
+            if dzf is not None
+            else {}
+        )
+
+        for file in tzf.infolist():
+            if not file.filename.endswith(".json"):
+                continue
+
+            table_id = Path(file.filename).stem
+            if dzf is not None and table_id not in desc_files:
+                raise ValueError(f"Description file not found for {table_id}")
+            with tzf.open(file, mode="r") as f:
+                table = FullTable.from_dict(orjson.loads(f.read()))
+
+            if dzf is not None:
+                with dzf.open(desc_files[table_id], mode="r") as f:
+                    sms = deser_sms(f.read())
+            else:
+                sms = []
+            yield Example(id=table.table.table_id, sms=sms, table=table)
+
+
+def deser_sms(data: bytes) -> List[SemanticModel]:
+    """Deserialize semantic models of a description file in JSON"""
+    return [SemanticModel.from_dict(sm) for sm in orjson.loads(data)]
+
+
+@contextmanager
+def open_dataset(dataset: Dataset) -> Iterator[Union[Path, ZipPath]]:
+    """Open the root folder of a dataset, which is either a folder or a zip file
+    containing the folder or its content
+    """
+    if not dataset.is_zip_file():
+        yield dataset.location
+        return
+
+    with ZipFile(dataset.location, mode="r") as zf:
+        root = ZipPath(zf)
+        if not dataset.description_dir(root).exists():
+            subdirs = list(root.iterdir())
+            if len(subdirs) != 1 or not dataset.description_dir(subdirs[0]).exists():
+                raise ValueError("Invalid dataset format")
+            root = subdirs[0]
+        yield root
+
+
+def is_json_dataset(dataset: Dataset) -> bool:
+    """Check if all tables & descriptions of a dataset are in JSON"""
+    with open_dataset(dataset) as root:
+        dirs = [dataset.table_dir(root), dataset.description_dir(root)]
+        for dir in dirs:
+            if not dir.exists():
+                continue
+            for file in dir.iterdir():
+                if file.name.startswith("."):
+                    continue
+                if file.is_dir():
+                    names = [child.name for child in file.iterdir()]
+                elif file.name.endswith(".zip"):
+                    with ZipFile(file, mode="r") as zf:  # type: ignore
+                        names = zf.namelist()
+                else:
+                    names = [file.name]
+                if not all(name.endswith(".json") for name in names):
+                    return False
+    return True
+
+
+def find_description_file(
+    descdir: Union[Path, ZipPath], example_id: str
+) -> Union[Path, ZipPath]:
+    """Find the description file of an example, which is the latest version if the
+    example has a folder of versions
+    """
+    if (descdir / example_id).exists():
+        return max(
+            (descdir / example_id).iterdir(),
+            key=lambda file: int(file.name.split(".")[1]),
+        )
+
+    desc_file = descdir / f"{example_id}.json"
+    if desc_file.exists():
+        return desc_file
+    raise ValueError(f"Description file not found for {example_id}")
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from functools import wraps
+from typing import Any
+
+import orjson
+from flask import Response, g
+from flask.json.provider import DefaultJSONProvider
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """The default JSON provider of Flask, except that responses of views decorated with
+    `orjson_response` are encoded with orjson, so values that are already encoded as
+    JSON can be embedded in them as is by wrapping them in `orjson.Fragment`.
+
+    orjson is not used for every response as its output differs from the default
+    provider: NaN & Infinity are encoded as null, `sort_keys` is not honored, and dates
+    are in ISO 8601 instead of HTTP date format.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if not g.get("orjson_response", False):
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option),
+            mimetype=self.mimetype,
+        )
+
+
+def orjson_response(view):
+    """Encode the JSON responses (`jsonify`) of a view with orjson"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.orjson_response = True
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Set
+
+import sm.outputs.semantic_model as O
+
+from sand.helpers.mapping_utils import KGMapping
+
+if TYPE_CHECKING:
+    from sand.models.entity import EntityAR
+    from sand.models.ontology import OntClassAR, OntPropertyAR
+
+
+class ReadableLabelService:
+    """Add readable labels to class nodes, edges and (optionally) entity literal nodes of
+    semantic models that don't have them.
+
+    URIs of all given semantic models are collected first, so each URI is looked up once
+    no matter how many nodes use it. The labels are memoized, so a URI is not looked up
+    again by later calls of the same service instance.
+    """
+
+    def __init__(
+        self,
+        ontclass_ar: OntClassAR,
+        ontprop_ar: OntPropertyAR,
+        entity_ar: Optional[EntityAR] = None,
+    ):
+        self.ontclass_ar = ontclass_ar
+        self.ontprop_ar = ontprop_ar
+        self.entity_ar = entity_ar
+
+        # readable labels (None if not found) of URIs of classes, properties & entities
+        self.class_labels: Dict[str, Optional[str]] = {}
+        self.prop_labels: Dict[str, Optional[str]] = {}
+        self.entity_labels: Dict[str, Optional[str]] = {}
+
+    def add_readable_labels(
+        self, sms: Iterable[O.SemanticModel], use_uri_as_default: bool = False
+    ):
+        """Add readable labels to the semantic models in place. Resources that are not
+        found are left without labels, or labelled by their relative URIs (values of
+        entity literal nodes) if `use_uri_as_default` is True. Entity literal nodes are
+        only labelled if the service has the entity mapping.
+        """
+        sms = list(sms)
+        class_uris: Set[str] = set()
+        prop_uris: Set[str] = set()
+        entity_uris: Set[str] = set()
+        for sm in sms:
+            for n in sm.iter_nodes():
+                if n.readable_label is not None:
+                    continue
+                if isinstance(n, O.ClassNode):
+                    class_uris.add(n.abs_uri)
+                elif self.is_entity_node(n):
+                    entity_uris.add(n.value)  # type: ignore
+            for e in sm.iter_edges():
+                if e.readable_label is None:
+                    prop_uris.add(e.abs_uri)
+
+        self.fetch_labels(self.ontclass_ar, self.class_labels, class_uris)
+        self.fetch_labels(self.ontprop_ar, self.prop_labels, prop_uris)
+        if self.entity_ar is not None:
+            self.fetch_labels(self.entity_ar, self.entity_labels, entity_uris)
+
+        for sm in sms:
+            for n in sm.iter_nodes():
+                if n.readable_label is not None:
+                    continue
+                if isinstance(n, O.ClassNode):
+                    n.readable_label = self.class_labels[n.abs_uri]
+                    if n.readable_label is None and use_uri_as_default:
+                        n.readable_label = n.rel_uri
+                elif self.is_entity_node(n):
+                    assert isinstance(n, O.LiteralNode)
+                    n.readable_label = self.entity_labels[n.value]
+                    if n.readable_label is None and use_uri_as_default:
+                        n.readable_label = n.value
+            for e in sm.iter_edges():
+                if e.readable_label is None:
+                    e.readable_label = self.prop_labels[e.abs_uri]
+                    if e.readable_label is None and use_uri_as_default:
+                        e.readable_label = e.rel_uri
+
+    def is_entity_node(self, node: O.Node) -> bool:
+        return (
+            self.entity_ar is not None
+            and isinstance(node, O.LiteralNode)
+            and node.datatype == O.LiteralNodeDataType.Entity
+        )
+
+    def fetch_labels(
+        self,
+        mapping: KGMapping,
+        labels: Dict[str, Optional[str]],
+        uris: Set[str],
+    ):
+        """Look up URIs that are not in the memo `labels` and memoize their labels"""
+        for uri in uris:
+            if uri not in labels:
+                resource = mapping.get_by_uri(uri)
+                labels[uri] = resource.readable_label if resource is not None else None
@@ -1,8 +1,27 @@
-from sand.models.base import db, init_db
+from sand.models.base import CompressionDictionary, add_missing_columns, db, init_db
 from sand.models.entity import Value, EntityAR
 from sand.models.project import Project
-from sand.models.semantic_model import SemanticModel
-from sand.models.table import Table, TableRow, Link, ContextPage
+from sand.models.semantic_model import SemanticModel, SemanticModelVersion
+from sand.models.table import (
+    Table,
+    TableRow,
+    TableColumnChunk,
+    CellLink,
+    CellIndex,
+    Link,
+    ContextPage,
+)
 from sand.models.transformation import Transformation
 
-all_tables = [Project, SemanticModel, Table, TableRow, Transformation]
+all_tables = [
+    Project,
+    SemanticModel,
+    SemanticModelVersion,
+    Table,
+    TableRow,
+    TableColumnChunk,
+    CellLink,
+    CellIndex,
+    Transformation,
+    CompressionDictionary,
+]
@@ -1,11 +1,26 @@
+from collections import Counter
+from typing import List, Optional
+
 import orjson
 import sm.outputs.semantic_model as O
-from peewee import CharField, ForeignKeyField, TextField, IntegerField
+from peewee import (
+    BooleanField,
+    CharField,
+    ForeignKeyField,
+    IntegerField,
+    TextField,
+    chunked,
+)
 from playhouse.shortcuts import model_to_dict
-from sand.models.base import BaseModel, BlobField
+from sand.models.base import BaseModel, BlobField, db
 from sand.models.project import Project
 from sand.models.table import Table
 
+# maximum number of deltas between two snapshots of a semantic model's history
+SNAPSHOT_INTERVAL = 20
+# number of semantic models inserted per query by `bulk_create_sms`
+BULK_INSERT_SIZE = 100
+
 
 def ser_sm(pyvalue: O.SemanticModel):
     return orjson.dumps(pyvalue.to_dict())
@@ -16,6 +31,10 @@ def deser_sm(dbvalue: bytes):
 
 
 class SemanticModel(BaseModel):
+    """The latest version of a semantic model of a table, previous versions are kept
+    in `SemanticModelVersion`.
+    """
+
     table = ForeignKeyField(Table, backref="semantic_models", on_delete="CASCADE")
     # name of the semantic model as we may have more than one version for the same table
     name = CharField()
@@ -26,3 +45,227 @@ class SemanticModel(BaseModel):
 
     class Meta:
         indexes = ((("table", "name"), True),)
+
+    def save(self, *args, **kwargs):
+        """Save the semantic model and record its previous version in the history"""
+        is_data_changed = any(
+            field.name in ("data", "version") for field in self.dirty_fields
+        )
+        with db.atomic():
+            prev = None
+            if is_data_changed and self.id is not None:  # type: ignore
+                prev = (
+                    SemanticModel.select(
+                        SemanticModel.id, SemanticModel.version, SemanticModel.data
+                    )
+                    .where(SemanticModel.id == self.id)  # type: ignore
+                    .get_or_none()
+                )
+            ret = super().save(*args, **kwargs)
+            if prev is not None:
+                add_version(self, prev)
+        return ret
+
+
+class SemanticModelVersion(BaseModel):
+    """A previous version of a semantic model, stored either as a snapshot or as a
+    reverse delta (see `diff_sm`) that turns the next version into this version. The
+    latest version is only stored in `SemanticModel`.
+    """
+
+    model = ForeignKeyField(SemanticModel, backref="versions", on_delete="CASCADE")
+    version = IntegerField()
+    is_snapshot = BooleanField()
+    # number of deltas between this version and the previous snapshot
+    depth = IntegerField()
+    data: dict = BlobField(serialize=orjson.dumps, deserialize=orjson.loads)  # type: ignore
+
+    class Meta:
+        indexes = ((("model", "version"), True),)
+
+
+def add_version(sm: SemanticModel, prev: SemanticModel):
+    """Record the previous version of a saved semantic model in its history, `prev` is
+    the semantic model (id, version & data) before it is saved.
+
+    The previous version is stored as a delta from the saved data, or as a snapshot once
+    there are `SNAPSHOT_INTERVAL` - 1 deltas after the last snapshot, so a version is
+    rebuilt from at most that many deltas. Saving a version that is not newer than the
+    previous one replaces it and discards the versions after it.
+    """
+    data = sm.data.to_dict()
+    if sm.version > prev.version:
+        last = (
+            SemanticModelVersion.select(SemanticModelVersion.depth)
+            .where(SemanticModelVersion.model == sm)
+            .order_by(SemanticModelVersion.version.desc())
+            .first()
+        )
+        depth = 1 if last is None else last.depth + 1
+        if depth >= SNAPSHOT_INTERVAL:
+            SemanticModelVersion.create(
+                model=sm,
+                version=prev.version,
+                is_snapshot=True,
+                depth=0,
+                data=prev.data.to_dict(),
+            )
+        else:
+            SemanticModelVersion.create(
+                model=sm,
+                version=prev.version,
+                is_snapshot=False,
+                depth=depth,
+                data=diff_sm(data, prev.data.to_dict()),
+            )
+        return
+
+    # the latest version that is kept is a delta from a discarded version, so it is
+    # recomputed from the saved data
+    last = (
+        SemanticModelVersion.select(
+            SemanticModelVersion.id,
+            SemanticModelVersion.version,
+            SemanticModelVersion.is_snapshot,
+        )
+        .where(
+            SemanticModelVersion.model == sm,
+            SemanticModelVersion.version < sm.version,
+        )
+        .order_by(SemanticModelVersion.version.desc())
+        .first()
+    )
+    if last is not None and not last.is_snapshot:
+        lastdata = get_version_data(prev, last.version)
+        assert lastdata is not None
+        SemanticModelVersion.update(data=diff_sm(data, lastdata)).where(
+            SemanticModelVersion.id == last.id
+        ).execute()
+    SemanticModelVersion.delete().where(
+        SemanticModelVersion.model == sm, SemanticModelVersion.version >= sm.version
+    ).execute()
+
+
+def bulk_create_sms(sms: List[SemanticModel]):
+    """Insert new semantic models with a few queries instead of saving them one by one
+    and set their ids. New semantic models do not have previous versions, so nothing is
+    added to their history. Must be called inside a transaction.
+    """
+    if len(sms) == 0:
+        return
+    for batch in chunked(sms, BULK_INSERT_SIZE):
+        SemanticModel.insert_many(
+            [
+                {
+                    "table": sm.table_id,  # type: ignore
+                    "name": sm.name,
+                    "description": sm.description,
+                    "version": sm.version,
+                    "data": sm.data,
+                }
+                for sm in batch
+            ]
+        ).execute()
+
+    ids = {
+        (table_id, name): id
+        for id, table_id, name in SemanticModel.select(
+            SemanticModel.id, SemanticModel.table, SemanticModel.name
+        )
+        .where(SemanticModel.table.in_({sm.table_id for sm in sms}))  # type: ignore
+        .tuples()
+    }
+    for sm in sms:
+        sm.id = ids[sm.table_id, sm.name]  # type: ignore
+
+
+def get_sm_versions(sm: SemanticModel) -> List[int]:
+    """Get versions of a semantic model in its history, including the latest version"""
+    return [
+        version
+        for (version,) in SemanticModelVersion.select(SemanticModelVersion.version)
+        .where(SemanticModelVersion.model == sm)
+        .order_by(SemanticModelVersion.version)
+        .tuples()
+    ] + [sm.version]
+
+
+def get_sm_version(sm: SemanticModel, version: int) -> Optional[O.SemanticModel]:
+    """Reconstruct a version of a semantic model from its history, returning None if the version does not exist"""
+    data = get_version_data(sm, version)
+    return O.SemanticModel.from_dict(data) if data is not None else None
+
+
+def get_version_data(sm: SemanticModel, version: int) -> Optional[dict]:
+    """Reconstruct a version of a semantic model in its dictionary form by applying the
+    deltas from the version to the next snapshot (or the latest version) backward.
+    """
+    if version == sm.version:
+        return sm.data.to_dict()
+
+    records: List[SemanticModelVersion] = []
+    for record in (
+        SemanticModelVersion.select()
+        .where(
+            SemanticModelVersion.model == sm,
+            SemanticModelVersion.version >= version,
+        )
+        .order_by(SemanticModelVersion.version)
+    ):
+        if len(records) == 0 and record.version != version:
+            return None
+        records.append(record)
+        if record.is_snapshot:
+            break
+
+    if len(records) == 0:
+        return None
+    if records[-1].is_snapshot:
+        data = records[-1].data
+        records = records[:-1]
+    else:
+        data = sm.data.to_dict()
+    for record in reversed(records):
+        data = patch_sm(data, record.data)
+    return data
+
+
+def diff_sm(old: dict, new: dict) -> dict:
+    """Compute a delta between two semantic models in their dictionary form, so that
+    `patch_sm(old, diff_sm(old, new))` equals to `new`.
+    """
+    old_nodes = {u["id"]: u for u in old["nodes"]}
+    new_node_ids = {u["id"] for u in new["nodes"]}
+    old_edges = Counter(_edge_key(e) for e in old["edges"])
+    new_edges = Counter(_edge_key(e) for e in new["edges"])
+
+    return {
+        "nodes": [u for u in new["nodes"] if old_nodes.get(u["id"]) != u],
+        "removed_nodes": [uid for uid in old_nodes if uid not in new_node_ids],
+        "edges": [orjson.loads(e) for e in (new_edges - old_edges).elements()],
+        "removed_edges": [orjson.loads(e) for e in (old_edges - new_edges).elements()],
+    }
+
+
+def patch_sm(old: dict, delta: dict) -> dict:
+    """Apply a delta computed by `diff_sm` to a semantic model in its dictionary form"""
+    removed_nodes = set(delta["removed_nodes"])
+    nodes = {u["id"]: u for u in old["nodes"] if u["id"] not in removed_nodes}
+    for u in delta["nodes"]:
+        nodes[u["id"]] = u
+
+    removed_edges = Counter(_edge_key(e) for e in delta["removed_edges"])
+    edges = []
+    for e in old["edges"]:
+        key = _edge_key(e)
+        if removed_edges[key] > 0:
+            removed_edges[key] -= 1
+            continue
+        edges.append(e)
+    edges.extend(delta["edges"])
+
+    return {**old, "nodes": list(nodes.values()), "edges": edges}
+
+
+def _edge_key(edge: dict) -> bytes:
+    return orjson.dumps(edge, option=orjson.OPT_SORT_KEYS)
@@ -1,6 +1,19 @@
 from __future__ import annotations
+from array import array
 from dataclasses import asdict, dataclass
-from typing import Optional, NamedTuple, List, Dict, Tuple, Union
+from itertools import repeat
+from typing import (
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+    NamedTuple,
+    List,
+    Dict,
+    Tuple,
+    Sequence,
+    Union,
+)
 from gena.custom_fields import (
     ListDataClassField,
     DataClassField,
@@ -8,23 +21,35 @@ from gena.custom_fields import (
 )
 from rsoup.core import ContentHierarchy
 
+import msgpack
 import orjson
-from peewee import CharField, ForeignKeyField, CompositeKey, TextField, IntegerField
+from peewee import (
+    CharField,
+    Field,
+    ForeignKeyField,
+    CompositeKey,
+    TextField,
+    IntegerField,
+    FloatField,
+    Select,
+    SqliteDatabase,
+)
 from playhouse.shortcuts import model_to_dict
-from playhouse.sqlite_ext import JSONField
+from playhouse.sqlite_ext import FTS5Model, RowIDField, SearchField
 
-from sand.models.base import BaseModel
+from sand.helpers.column_types import ColumnType
+from sand.models.base import BaseModel, JSONField, PackedField, PackedValue, db
 from sand.models.entity import Value
 from sand.models.project import Project
 
 
-@dataclass
+@dataclass(slots=True)
 class CandidateEntity:
     entity_id: str  # entity id, can't be NIL_ENTITY
     probability: float
 
 
-@dataclass
+@dataclass(slots=True)
 class Link:
     start: int
     end: int
@@ -37,6 +62,26 @@ class Link:
     def from_tuple(value):
         return Link(*value[:-1], [CandidateEntity(*x) for x in value[-1]])  # type: ignore
 
+    def to_dict(self):
+        return {
+            "start": self.start,
+            "end": self.end,
+            "url": self.url,
+            "entity_id": self.entity_id,
+            "candidate_entities": [
+                {"entity_id": can.entity_id, "probability": can.probability}
+                for can in self.candidate_entities
+            ],
+        }
+
+
+# how the cells of a table are stored: "row" stores each row as one record in TableRow,
+# "columnar" stores them in TableColumnChunk so that reading one column doesn't decode the others.
+# links of cells are always stored in CellLink
+TableStorage = Literal["row", "columnar"]
+# number of rows in a chunk of a column when the table is stored in columnar mode
+COLUMN_CHUNK_SIZE = 1000
+
 
 @dataclass
 class ContextPage:
@@ -55,6 +100,12 @@ class Table(BaseModel):
     context_page: Optional[ContextPage] = DataClassField(ContextPage, null=True)  # type: ignore
     context_values: List[Value] = ListDataClassField(Value)  # type: ignore
     context_tree: List[ContentHierarchy] = ListDataClassField(ContentHierarchy)  # type: ignore
+    storage: TableStorage = CharField(default="row")  # type: ignore
+    # inferred type of each column, None for tables created before types are inferred
+    column_types: Optional[List[ColumnType]] = JSONField(null=True)  # type: ignore
+    # hash of the dataset example the table is loaded from by `sand load`, so that
+    # reloading the dataset skips tables that are not changed
+    content_hash: Optional[str] = CharField(null=True)  # type: ignore
 
     class Meta:
         indexes = ((("project", "name"), True),)
@@ -67,6 +118,8 @@ class Table(BaseModel):
             "columns": self.columns,
             "project": self.project_id,  # type: ignore
             "size": self.size,
+            "storage": self.storage,
+            "column_types": self.column_types,
             "context_page": asdict(self.context_page)
             if self.context_page is not None
             else None,
@@ -83,30 +136,616 @@ class TableRow(BaseModel):
     # fmt: off
     table = ForeignKeyField(Table, backref="rows", on_delete="CASCADE")
     index = IntegerField()  # type: ignore
-    row: List[Union[str, float]] = JSONField(json_dumps=orjson.dumps, json_loads=orjson.loads)  # type: ignore
-    links: Dict[str, List[Link]] = Dict2ListDataClassField(Link)  # type: ignore
+    # row is empty when the table is stored in columnar mode, use `hydrate_rows` to fill it
+    row: List[Union[str, float]] = PackedField()  # type: ignore
     # fmt: on
 
     class Meta:
         indexes = ((("table", "index"), True),)
 
-    def to_dict(self):
-        dlinks = {}
-        if self.links is not None:
-            for ci, links in self.links.items():
-                newlinks = []
-                for link in links:
-                    link = asdict(link)
-                    # link["candidate_entities"] = [
-                    #     cent._asdict() for cent in link["candidate_entities"]
-                    # ]
-                    newlinks.append(link)
-                dlinks[ci] = newlinks
+    def __init__(self, *args, links: Optional[Dict[str, List[Link]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._links = links
 
-        return {
+    @property
+    def links(self) -> Dict[str, List[Link]]:
+        """Links of the cells in this row keyed by the column index (as string).
+
+        The links are stored in CellLink and loaded on first access, use `hydrate_rows`
+        to load links of multiple rows at once. Modifying the returned links does not update
+        the database, use `set_column_links` to save them.
+        """
+        if self._links is None:
+            self._links = get_row_links(self.table_id, [self.index])[self.index]  # type: ignore
+        return self._links
+
+    @links.setter
+    def links(self, links: Dict[str, List[Link]]):
+        self._links = links
+
+    def save(self, *args, **kwargs):
+        """Save the row and update the index of its cells if the row is changed"""
+        is_row_changed = any(field.name == "row" for field in self.dirty_fields)
+        with db.atomic():
+            ret = super().save(*args, **kwargs)
+            if is_row_changed:
+                CellIndex.delete().where(
+                    CellIndex.table == self.table_id, CellIndex.row == self.index  # type: ignore
+                ).execute()
+                index_cells(
+                    self.table_id,  # type: ignore
+                    ((self.index, ci, value) for ci, value in enumerate(self.row)),
+                )
+        return ret
+
+    def delete_instance(self, *args, **kwargs):
+        with db.atomic():
+            CellIndex.delete().where(
+                CellIndex.table == self.table_id, CellIndex.row == self.index  # type: ignore
+            ).execute()
+            return super().delete_instance(*args, **kwargs)
+
+    def to_dict(
+        self, passthrough: bool = False, fields: Optional[Sequence[str]] = None
+    ):
+        """Convert the row to a dictionary.
+
+        Args:
+            passthrough: if the row hasn't been decoded and it is stored as JSON, embed it
+                as is (`orjson.Fragment`) instead of decoding it. Only use it when the
+                output is encoded with orjson.
+            fields: names of the fields in the output (all fields if not given), `row`
+                and `links` are not read if they are not in the output.
+        """
+        output = {
             "id": self.id,  # type: ignore
             "table": self.table_id,  # type: ignore
             "index": self.index,
-            "row": self.row,
-            "links": dlinks,
         }
+        if fields is None or "row" in fields:
+            row = self.__data__.get("row")
+            if passthrough and isinstance(row, PackedValue):
+                json = row.get_json()
+                output["row"] = orjson.Fragment(json) if json is not None else self.row
+            else:
+                output["row"] = self.row
+        if fields is None or "links" in fields:
+            output["links"] = {
+                ci: [link.to_dict() for link in links]
+                for ci, links in self.links.items()
+            }
+
+        if fields is not None:
+            return {name: output[name] for name in fields}
+        return output
+
+
+class TableColumnChunk(BaseModel):
+    """Cells of consecutive rows of a column of a table stored in columnar mode"""
+
+    # fmt: off
+    table = ForeignKeyField(Table, backref="column_chunks", on_delete="CASCADE")
+    column = IntegerField()
+    # rows of the chunk are from chunk * COLUMN_CHUNK_SIZE to (chunk + 1) * COLUMN_CHUNK_SIZE (exclusive)
+    chunk = IntegerField()
+    cells: List[Union[str, float]] = PackedField()  # type: ignore
+    # fmt: on
+
+    class Meta:
+        indexes = ((("table", "column", "chunk"), True),)
+
+
+class CandidatesField(Field):
+    """Candidate entities of a link, packed as a list of entity ids and an array of
+    float64 probabilities so that loading them doesn't need a record per candidate.
+    """
+
+    field_type = "BLOB"
+
+    def db_value(self, value: Optional[List[CandidateEntity]]):
+        if value is None or len(value) == 0:
+            return None
+        return msgpack.packb(
+            [
+                [can.entity_id for can in value],
+                array("d", [can.probability for can in value]).tobytes(),
+            ]
+        )
+
+    def python_value(self, value) -> List[CandidateEntity]:
+        if value is None:
+            return []
+        entity_ids, probs = msgpack.unpackb(value)
+        return [
+            CandidateEntity(entity_id, prob)
+            for entity_id, prob in zip(entity_ids, array("d", probs))
+        ]
+
+
+class CellLink(BaseModel):
+    """A link between a span of text in a cell and an entity"""
+
+    # fmt: off
+    table = ForeignKeyField(Table, backref="cell_links", on_delete="CASCADE")
+    row = IntegerField()  # index of the row
+    column = IntegerField()
+    start = IntegerField()
+    end = IntegerField()
+    url = TextField(null=True)
+    # none when the entity is not mapped yet, if there is no entity, use NIL_ENTITY
+    entity_id = CharField(null=True)
+    candidates: List[CandidateEntity] = CandidatesField(null=True)  # type: ignore
+    # fmt: on
+
+    class Meta:
+        indexes = (
+            (("table", "row", "column"), False),
+            (("table", "column", "entity_id"), False),
+        )
+
+
+# maximum number of values bound in a single IN clause
+MAX_BATCH_VALUES = 500
+# cells longer than this are not indexed, looking them up scans their column instead
+MAX_INDEXED_CELL_LENGTH = 1000
+
+
+class CellIndex(BaseModel):
+    """Text of non-empty cells of tables, for finding cells by their exact value
+    (`find_cells`) or by full-text search (`search_cells`). On sqlite, the text is
+    also indexed by the FTS5 table `cellsearch` that is kept in sync by triggers.
+    """
+
+    table = ForeignKeyField(Table, backref="cell_index", on_delete="CASCADE")
+    row = IntegerField()
+    column = IntegerField()
+    value = TextField()
+
+    class Meta:
+        indexes = (
+            (("table", "column", "value"), False),
+            (("table", "row"), False),
+        )
+
+    @classmethod
+    def create_table(cls, safe=True, **options):
+        super().create_table(safe=safe, **options)
+        if has_fts(cls._meta.database):  # type: ignore
+            create_cell_search_table()
+
+    @classmethod
+    def drop_table(cls, safe=True, drop_sequences=True, **options):
+        if has_fts(cls._meta.database):  # type: ignore
+            db.execute_sql("DROP TABLE IF EXISTS cellsearch")
+        super().drop_table(safe=safe, drop_sequences=drop_sequences, **options)
+
+
+class CellSearch(FTS5Model):
+    """The FTS5 index of CellIndex (sqlite only), created by `create_cell_search_table`"""
+
+    rowid = RowIDField()
+    value = SearchField()
+
+    class Meta:
+        database = db
+        table_name = "cellsearch"
+
+
+def has_fts(database) -> bool:
+    """Check if the database supports the FTS5 full-text index (sqlite engines)"""
+    if hasattr(database, "obj"):
+        database = database.obj
+    return isinstance(database, SqliteDatabase)
+
+
+def create_cell_search_table():
+    """Create the FTS5 index of CellIndex (if not exists) and the triggers keeping it in sync"""
+    is_new = not db.table_exists("cellsearch")
+    db.execute_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS cellsearch USING "
+        "fts5(value, content='cellindex', content_rowid='id')"
+    )
+    db.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS cellindex_ai AFTER INSERT ON cellindex BEGIN "
+        "INSERT INTO cellsearch(rowid, value) VALUES (new.id, new.value); END"
+    )
+    db.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS cellindex_ad AFTER DELETE ON cellindex BEGIN "
+        "INSERT INTO cellsearch(cellsearch, rowid, value) "
+        "VALUES ('delete', old.id, old.value); END"
+    )
+    if is_new:
+        db.execute_sql("INSERT INTO cellsearch(cellsearch) VALUES ('rebuild')")
+
+
+def iter_indexed_cells(
+    cells: Iterable[Tuple[int, int, Union[str, float, None]]],
+) -> Iterator[Tuple[int, int, str]]:
+    """Get (row, column, text) of cells that are indexed"""
+    for ri, ci, value in cells:
+        if value is None:
+            continue
+        text = str(value)
+        if text == "" or len(text) > MAX_INDEXED_CELL_LENGTH:
+            continue
+        yield ri, ci, text
+
+
+def index_cells(
+    table: Union[Table, int],
+    cells: Iterable[Tuple[int, int, Union[str, float, None]]],
+    batch_size: int = 500,
+):
+    """Add cells given as (row index, column index, value) of a table to the cell index"""
+    batch = []
+    for ri, ci, text in iter_indexed_cells(cells):
+        batch.append((table, ri, ci, text))
+        if len(batch) == batch_size:
+            CellIndex.insert_many(batch, fields=CELL_INDEX_FIELDS).execute()
+            batch = []
+    if len(batch) > 0:
+        CellIndex.insert_many(batch, fields=CELL_INDEX_FIELDS).execute()
+
+
+def reindex_cells(table: Table):
+    """Rebuild the cell index of a table"""
+    with db.atomic():
+        CellIndex.delete().where(CellIndex.table == table).execute()
+        for ci in range(len(table.columns)):
+            index_cells(
+                table,
+                ((ri, ci, value) for ri, value in enumerate(get_column(table, ci))),
+            )
+
+
+def find_cells(table: Table, column: int, text: str) -> List[int]:
+    """Find rows (by index) of cells in a column of a table that equal to the given text"""
+    if (
+        text == ""
+        or len(text) > MAX_INDEXED_CELL_LENGTH
+        # tables created before the cell index is introduced (see `sand index-cells`)
+        or not CellIndex.select().where(CellIndex.table == table).exists()
+    ):
+        # the cell is not in the index
+        return [
+            ri
+            for ri, value in enumerate(get_column(table, column))
+            if str(value) == text
+        ]
+    return [
+        ri
+        for (ri,) in CellIndex.select(CellIndex.row)
+        .where(
+            CellIndex.table == table,
+            CellIndex.column == column,
+            CellIndex.value == text,
+        )
+        .order_by(CellIndex.row)
+        .tuples()
+    ]
+
+
+def search_cells(
+    query: str,
+    tables: Union[List[int], Select],
+    column: Optional[int] = None,
+    limit: int = 50,
+) -> List[Tuple[int, int, int, str]]:
+    """Search cells of the given tables (list of ids or a select query of table ids) that
+    contain the query, returning (table id, row index, column index, text) of the matched cells.
+    Uses the FTS5 index (prefix match of the query's words, ranked) on sqlite and a
+    substring match on other databases.
+    """
+    conditions = [CellIndex.table.in_(tables)]
+    if column is not None:
+        conditions.append(CellIndex.column == column)
+
+    if has_fts(db) and db.table_exists("cellsearch"):
+        fts_query = '"' + query.replace('"', '""') + '" *'
+        records = (
+            CellIndex.select(
+                CellIndex.table, CellIndex.row, CellIndex.column, CellIndex.value
+            )
+            .join(CellSearch, on=(CellSearch.rowid == CellIndex.id))
+            .where(CellSearch.match(fts_query), *conditions)
+            .order_by(CellSearch.rank())
+            .limit(limit)
+        )
+    else:
+        records = (
+            CellIndex.select(
+                CellIndex.table, CellIndex.row, CellIndex.column, CellIndex.value
+            )
+            .where(CellIndex.value.contains(query), *conditions)
+            .order_by(CellIndex.table, CellIndex.row, CellIndex.column)
+            .limit(limit)
+        )
+    return list(records.tuples())
+
+
+CELL_INDEX_FIELDS = [CellIndex.table, CellIndex.row, CellIndex.column, CellIndex.value]
+
+
+def get_rows(
+    table: Table, offset: int = 0, limit: Optional[int] = None
+) -> List[TableRow]:
+    """Get rows of a table (ordered by their index) regardless of how the table is stored"""
+    query = (
+        TableRow.select()
+        .where(TableRow.table == table, TableRow.index >= offset)
+        .order_by(TableRow.index)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return hydrate_rows(list(query), {table.id: table})  # type: ignore
+
+
+def iter_rows(table: Table, batch_size: int = 1000) -> Iterator[TableRow]:
+    """Iterate over rows of a table (ordered by their index), reading `batch_size` rows at a time"""
+    for offset in range(0, table.size, batch_size):
+        yield from get_rows(table, offset, batch_size)
+
+
+def hydrate_rows(
+    rows: List[TableRow],
+    tables: Optional[Dict[int, Table]] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[TableRow]:
+    """Fill `row` of rows that belong to tables stored in columnar mode and load `links`
+    of all rows. The rows can be of different tables. Rows are updated in place and returned.
+    If `fields` is given, only the fields among `row` and `links` in it are loaded.
+    """
+    table2rows: Dict[int, List[TableRow]] = {}
+    for row in rows:
+        table2rows.setdefault(row.table_id, []).append(row)  # type: ignore
+
+    tables = dict(tables or {})
+    missing_table_ids = set(table2rows.keys()).difference(tables.keys())
+    if len(missing_table_ids) > 0:
+        for table in Table.select().where(Table.id.in_(list(missing_table_ids))):  # type: ignore
+            tables[table.id] = table  # type: ignore
+
+    for table_id, trows in table2rows.items():
+        if fields is None or "links" in fields:
+            row_links = get_row_links(table_id, [row.index for row in trows])
+            for row in trows:
+                row.links = row_links[row.index]
+
+        if tables[table_id].storage != "columnar" or (
+            fields is not None and "row" not in fields
+        ):
+            continue
+
+        ncols = len(tables[table_id].columns)
+        chunk_ids = {row.index // COLUMN_CHUNK_SIZE for row in trows}
+        chunks: Dict[Tuple[int, int], TableColumnChunk] = {
+            (chunk.column, chunk.chunk): chunk  # type: ignore
+            for chunk in TableColumnChunk.select().where(
+                TableColumnChunk.table == table_id,
+                TableColumnChunk.chunk.in_(list(chunk_ids)),
+            )
+        }
+        for row in trows:
+            chunk_id, offset = divmod(row.index, COLUMN_CHUNK_SIZE)
+            row.row = [chunks[ci, chunk_id].cells[offset] for ci in range(ncols)]
+    return rows
+
+
+def get_column(table: Table, column: int) -> List[Union[str, float]]:
+    """Get cells of a column of the table (ordered by row index)"""
+    if table.storage == "columnar":
+        return [
+            cell
+            for chunk in TableColumnChunk.select(TableColumnChunk.cells)
+            .where(TableColumnChunk.table == table, TableColumnChunk.column == column)
+            .order_by(TableColumnChunk.chunk)
+            for cell in chunk.cells
+        ]
+    return [
+        row.row[column]
+        for row in TableRow.select(TableRow.row)
+        .where(TableRow.table == table)
+        .order_by(TableRow.index)
+    ]
+
+
+def get_row_links(
+    table: Union[Table, int], rows: List[int]
+) -> Dict[int, Dict[str, List[Link]]]:
+    """Get links of the given rows (by index) of a table, keyed by the row index and then
+    the column index (as string). Every requested row is in the output.
+    """
+    output: Dict[int, Dict[str, List[Link]]] = {ri: {} for ri in rows}
+    if len(rows) == 0:
+        return output
+
+    lo, hi = min(rows), max(rows)
+    if hi - lo + 1 == len(output):
+        conditions = [CellLink.row.between(lo, hi)]
+    else:
+        conditions = [CellLink.row.in_(rows)]
+
+    query = CellLink.select().where(CellLink.table == table, *conditions)
+    for (ri, ci), links in _load_links(query).items():
+        if ri in output:
+            output[ri][str(ci)] = links
+    return output
+
+
+def get_column_links(table: Table, column: int) -> Dict[int, List[Link]]:
+    """Get links of cells in a column of the table, keyed by the row index.
+    Cells without links are not included.
+    """
+    query = CellLink.select().where(CellLink.table == table, CellLink.column == column)
+    return {ri: links for (ri, _), links in _load_links(query).items()}
+
+
+def iter_cell_links(
+    table: Union[Table, int],
+) -> Iterator[Tuple[int, int, int, int, Optional[str], Optional[str]]]:
+    """Iterate over links of a table as (row, column, start, end, url, entity id) ordered
+    by the row & column, reading them from the database cursor instead of loading all links
+    """
+    yield from (
+        CellLink.select(
+            CellLink.row,
+            CellLink.column,
+            CellLink.start,
+            CellLink.end,
+            CellLink.url,
+            CellLink.entity_id,
+        )
+        .where(CellLink.table == table)
+        .order_by(CellLink.row, CellLink.column, CellLink.id)
+        .tuples()
+        .iterator()
+    )
+
+
+def set_column_links(table: Table, column: int, links: Dict[int, List[Link]]):
+    """Replace links of the given cells (keyed by row index) in a column of the table"""
+    row_indices = list(links.keys())
+    with db.atomic():
+        for i in range(0, len(row_indices), MAX_BATCH_VALUES):
+            CellLink.delete().where(
+                CellLink.table == table,
+                CellLink.column == column,
+                CellLink.row.in_(row_indices[i : i + MAX_BATCH_VALUES]),
+            ).execute()
+        insert_links(
+            table,
+            (
+                (ri, column, link)
+                for ri, cell_links in links.items()
+                for link in cell_links
+            ),
+        )
+
+
+def save_rows(
+    table: Table,
+    rows: Iterable[List[Union[str, float]]],
+    links: Optional[Iterable[Dict[str, List[Link]]]] = None,
+    batch_size: int = 200,
+):
+    """Insert rows of a newly created table using the table's storage mode.
+    The i-th row of `rows` and `links` (None if rows don't have links) gets index i.
+
+    Rows are written in batches as they are read, so they can be streamed (e.g., from
+    a file) without keeping the whole table in memory. Wrap the call in a transaction
+    to insert the table atomically.
+    """
+    is_columnar = table.storage == "columnar"
+    ncols = len(table.columns)
+    # a columnar table is written one chunk of its columns at a time
+    flush_size = COLUMN_CHUNK_SIZE if is_columnar else batch_size
+    buffer: List[Tuple[int, List[Union[str, float]], Dict[str, List[Link]]]] = []
+
+    def flush():
+        if is_columnar:
+            chunk_id = buffer[0][0] // COLUMN_CHUNK_SIZE
+            records = [
+                (table, ci, chunk_id, [row[ci] for _, row, _ in buffer])
+                for ci in range(ncols)
+            ]
+            # chunks are large records, so we insert fewer of them at a time
+            for i in range(0, len(records), 10):
+                TableColumnChunk.insert_many(
+                    records[i : i + 10],
+                    fields=[
+                        TableColumnChunk.table,
+                        TableColumnChunk.column,
+                        TableColumnChunk.chunk,
+                        TableColumnChunk.cells,
+                    ],
+                ).execute()
+
+        for i in range(0, len(buffer), batch_size):
+            TableRow.insert_many(
+                [
+                    (table, ri, [] if is_columnar else row)
+                    for ri, row, _ in buffer[i : i + batch_size]
+                ],
+                fields=[TableRow.table, TableRow.index, TableRow.row],
+            ).execute()
+        insert_links(
+            table,
+            (
+                (ri, int(ci), link)
+                for ri, _, row_links in buffer
+                for ci, lst in row_links.items()
+                for link in lst
+            ),
+            batch_size,
+        )
+        index_cells(
+            table,
+            ((ri, ci, value) for ri, row, _ in buffer for ci, value in enumerate(row)),
+        )
+        buffer.clear()
+
+    for ri, (row, row_links) in enumerate(zip(rows, links or repeat({}))):
+        buffer.append((ri, row, row_links))
+        if len(buffer) == flush_size:
+            flush()
+    if len(buffer) > 0:
+        flush()
+
+
+def _load_links(query) -> Dict[Tuple[int, int], List[Link]]:
+    """Load links selected by a CellLink query, grouped by (row, column)"""
+    output: Dict[Tuple[int, int], List[Link]] = {}
+    for ri, ci, start, end, url, entity_id, candidates in (
+        query.order_by(CellLink.row, CellLink.column, CellLink.id)
+        .select(
+            CellLink.row,
+            CellLink.column,
+            CellLink.start,
+            CellLink.end,
+            CellLink.url,
+            CellLink.entity_id,
+            CellLink.candidates,
+        )
+        .tuples()
+    ):
+        output.setdefault((ri, ci), []).append(
+            Link(start, end, url, entity_id, candidates)
+        )
+    return output
+
+
+def insert_links(
+    table: Table, links: Iterable[Tuple[int, int, Link]], batch_size: int = 200
+):
+    """Insert links given as (row index, column index, link) of a table"""
+    batch = []
+    for ri, ci, link in links:
+        batch.append(
+            (
+                table,
+                ri,
+                ci,
+                link.start,
+                link.end,
+                link.url,
+                link.entity_id,
+                link.candidate_entities,
+            )
+        )
+        if len(batch) == batch_size:
+            CellLink.insert_many(batch, fields=LINK_FIELDS).execute()
+            batch = []
+    if len(batch) > 0:
+        CellLink.insert_many(batch, fields=LINK_FIELDS).execute()
+
+
+LINK_FIELDS = [
+    CellLink.table,
+    CellLink.row,
+    CellLink.column,
+    CellLink.start,
+    CellLink.end,
+    CellLink.url,
+    CellLink.entity_id,
+    CellLink.candidates,
+]
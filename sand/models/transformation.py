@@ -7,9 +7,8 @@ from peewee import (
     IntegerField,
     BooleanField,
 )
-from playhouse.sqlite_ext import JSONField
 
-from sand.models.base import BaseModel
+from sand.models.base import BaseModel, JSONField
 from sand.models.table import Table
 
 
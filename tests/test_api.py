@@ -88,3 +88,172 @@ def test_api_create_table(client, example_db):
     )
 
     assert resp.status_code == 200
+
+
+def test_api_semantic_model_versions(client, example_db):
+    sm = client.get("/api/semanticmodel?table=1").json["items"][0]
+    data = {
+        "nodes": sm["data"]["nodes"],
+        "edges": [e for e in sm["data"]["edges"] if e["target"] != "5"],
+    }
+    resp = client.put(
+        f"/api/semanticmodel/{sm['id']}",
+        json={"version": sm["version"] + 1, "data": data},
+    )
+    assert resp.status_code == 200
+
+    resp = client.get(f"/api/semanticmodel/{sm['id']}/versions")
+    assert resp.json["items"] == [sm["version"], sm["version"] + 1]
+
+    prev = client.get(f"/api/semanticmodel/{sm['id']}/versions/{sm['version']}").json
+    assert prev["data"] == sm["data"]
+    latest = client.get(
+        f"/api/semanticmodel/{sm['id']}/versions/{sm['version'] + 1}"
+    ).json
+    assert latest["data"] == client.get(f"/api/semanticmodel/{sm['id']}").json["data"]
+    assert len(latest["data"]["edges"]) < len(sm["data"]["edges"])
+
+    resp = client.get(f"/api/semanticmodel/{sm['id']}/versions/{sm['version'] + 2}")
+    assert resp.status_code == 404
+    # versions must be numbers
+    urls = client.application.url_map.bind("localhost")
+    assert urls.match(f"/api/semanticmodel/{sm['id']}/versions/1")[0] == (
+        "semanticmodel.get_version"
+    )
+    assert urls.match(f"/api/semanticmodel/{sm['id']}/versions/abc")[0] != (
+        "semanticmodel.get_version"
+    )
+    resp = client.get("/api/semanticmodel/999/versions")
+    assert resp.status_code == 404
+
+
+def test_semantic_model_history(client, example_db, monkeypatch):
+    import sm.outputs.semantic_model as O
+
+    from sand.models import semantic_model
+    from sand.models.semantic_model import (
+        SemanticModel,
+        SemanticModelVersion,
+        get_sm_version,
+        get_sm_versions,
+    )
+
+    monkeypatch.setattr(semantic_model, "SNAPSHOT_INTERVAL", 3)
+    sm = SemanticModel.get_by_id(
+        client.get("/api/semanticmodel?table=1").json["items"][0]["id"]
+    )
+    assert SemanticModelVersion.select().count() == 0
+
+    # remove an edge in each version
+    datas = {sm.version: sm.data.to_dict()}
+    for version in range(sm.version + 1, sm.version + 6):
+        data = datas[version - 1]
+        sm.version = version
+        sm.data = O.SemanticModel.from_dict({**data, "edges": data["edges"][1:]})
+        sm.save()
+        datas[version] = sm.data.to_dict()
+
+    # the latest version is only in the semantic model
+    records = list(SemanticModelVersion.select().order_by(SemanticModelVersion.version))
+    assert [r.version for r in records] == list(datas.keys())[:-1]
+    assert [r.is_snapshot for r in records] == [False, False, True, False, False]
+    assert get_sm_versions(sm) == list(datas.keys())
+    for version, data in datas.items():
+        assert get_sm_version(sm, version).to_dict() == data  # type: ignore
+    assert get_sm_version(sm, sm.version + 1) is None
+
+    # saving an older version discards the versions after it, the version before it is
+    # a delta, which is recomputed from the saved data
+    versions = list(datas.keys())
+    sm.version = versions[4]
+    sm.data = O.SemanticModel.from_dict(datas[versions[0]])
+    sm.save()
+    assert get_sm_versions(sm) == versions[:5]
+    for version in versions[:4]:
+        assert get_sm_version(sm, version).to_dict() == datas[version]  # type: ignore
+    assert get_sm_version(sm, versions[4]).to_dict() == datas[versions[0]]  # type: ignore
+
+
+def test_bulk_create_semantic_models(client, example_db):
+    from sand.models import db
+    from sand.models.semantic_model import SemanticModel, bulk_create_sms
+
+    sm = SemanticModel.get_by_id(
+        client.get("/api/semanticmodel?table=1").json["items"][0]["id"]
+    )
+    with db.atomic():
+        newsms = [
+            SemanticModel(
+                table=sm.table,
+                name=f"bulk-{i}",
+                description="",
+                version=1,
+                data=sm.data,
+            )
+            for i in range(3)
+        ]
+        bulk_create_sms(newsms)
+
+    resp = client.get("/api/semanticmodel?table=1")
+    assert [item["name"] for item in resp.json["items"]][1:] == [
+        "bulk-0",
+        "bulk-1",
+        "bulk-2",
+    ]
+    expected = client.get(f"/api/semanticmodel/{sm.id}").json["data"]
+    for newsm in newsms:
+        resp = client.get(f"/api/semanticmodel/{newsm.id}/versions/1")
+        assert resp.status_code == 200
+        assert resp.json["data"] == expected
+
+
+def test_readable_label_service(client, monkeypatch):
+    import sm.outputs.semantic_model as O
+
+    from sand.helpers.readable_label import ReadableLabelService
+    from sand.models.ontology import OntClassAR, OntPropertyAR
+
+    sms = []
+    for i in range(2):
+        sm = O.SemanticModel()
+        uid = sm.add_node(
+            O.ClassNode(abs_uri="http://www.wikidata.org/entity/Q5", rel_uri="wd:Q5")
+        )
+        vid = sm.add_node(
+            O.ClassNode(abs_uri="http://www.wikidata.org/entity/Q0", rel_uri="wd:Q0")
+        )
+        sm.add_edge(
+            O.Edge(
+                source=uid,
+                target=vid,
+                abs_uri="http://www.wikidata.org/prop/P276",
+                rel_uri="p:P276",
+            )
+        )
+        sms.append(sm)
+
+    ontclass_ar = OntClassAR.init()
+    ontprop_ar = OntPropertyAR.init()
+    lookups = []
+    get_by_uri = ontclass_ar.get_by_uri
+    monkeypatch.setattr(
+        ontclass_ar,
+        "get_by_uri",
+        lambda uri, default=None: lookups.append(uri) or get_by_uri(uri, default),
+    )
+
+    service = ReadableLabelService(ontclass_ar, ontprop_ar)
+    service.add_readable_labels(sms[:1])
+    service.add_readable_labels(sms[1:], use_uri_as_default=True)
+
+    # the classes are looked up once for both semantic models
+    assert sorted(lookups) == [
+        "http://www.wikidata.org/entity/Q0",
+        "http://www.wikidata.org/entity/Q5",
+    ]
+    assert [n.readable_label for n in sms[0].iter_nodes()] == ["human (Q5)", None]
+    assert [n.readable_label for n in sms[1].iter_nodes()] == ["human (Q5)", "wd:Q0"]
+    assert [e.readable_label for sm in sms for e in sm.iter_edges()] == [
+        "location (P276)",
+        "location (P276)",
+    ]
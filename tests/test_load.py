@@ -0,0 +1,131 @@
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+import sm.outputs.semantic_model as O
+from sm.dataset import Dataset, Example, FullTable
+from sm.inputs.table import ColumnBasedTable
+
+from sand.commands.load import iter_converted_examples, save_examples
+from sand.helpers.dataset import iter_dataset
+from sand.models import Project, Table, TableRow, db
+from sand.models.semantic_model import SemanticModelVersion
+
+
+def make_examples(n: int):
+    examples = []
+    for i in range(n):
+        table = ColumnBasedTable.from_rows(
+            [[f"Mount {j}", str(j * i)] for j in range(5)],
+            f"table-{i}",
+            headers=["name", "height"],
+        )
+        sm = O.SemanticModel()
+        sm.add_node(O.DataNode(col_index=0, label="name"))
+        examples.append(
+            Example(
+                id=f"table-{i}",
+                sms=[sm],
+                table=FullTable.from_column_based_table(table),
+            )
+        )
+    return examples
+
+
+def test_load_examples_in_worker_processes(client):
+    resp = client.post("/api/project", json={"name": "load", "description": ""})
+    project = Project.get_by_id(resp.json["id"])
+
+    examples = make_examples(7)
+    converted = list(iter_converted_examples(iter(examples), workers=2))
+    assert [tbl.name for tbl, _, _ in converted] == [f"table-{i}" for i in range(7)]
+    with db.atomic():
+        save_examples(project, converted)
+
+    tables = client.get(f"/api/table?project={project.id}&limit=100").json["items"]
+    assert [tbl["name"] for tbl in tables] == [f"table-{i}" for i in range(7)]
+    assert tables[3]["column_types"] == ["entity", "integer"]
+
+    rows = client.get(f"/api/tablerow?table={tables[3]['id']}&limit=10").json["items"]
+    assert [row["row"] for row in rows] == [
+        [f"Mount {j}", str(j * 3)] for j in range(5)
+    ]
+
+    sms = client.get(f"/api/semanticmodel?table={tables[3]['id']}").json["items"]
+    assert [sm["name"] for sm in sms] == ["sm-0"]
+    # the missing column is added to the semantic model
+    assert len(sms[0]["data"]["nodes"]) == 2
+    # the loaded version is only stored in the semantic model
+    assert SemanticModelVersion.select().count() == 0
+    resp = client.get(f"/api/semanticmodel/{sms[0]['id']}/versions")
+    assert resp.json["items"] == [sms[0]["version"]]
+
+
+def test_reload_changed_examples(client):
+    resp = client.post("/api/project", json={"name": "load", "description": ""})
+    project = Project.get_by_id(resp.json["id"])
+
+    examples = make_examples(3)
+    with db.atomic():
+        save_examples(project, list(iter_converted_examples(examples)))
+    tables = client.get(f"/api/table?project={project.id}").json["items"]
+
+    examples[1].table.table.columns[1].values[0] = "100"
+    hashes = {tbl.name: tbl.content_hash for tbl in Table.select()}
+    converted = list(iter_converted_examples(examples, skip_hashes=hashes))
+    assert [ex is None for ex in converted] == [True, False, True]
+    with db.atomic():
+        save_examples(project, [ex for ex in converted if ex is not None], replace=True)
+
+    newtables = client.get(f"/api/table?project={project.id}").json["items"]
+    assert {tbl["name"]: tbl["id"] for tbl in newtables} == {
+        "table-0": tables[0]["id"],
+        "table-1": tables[2]["id"] + 1,
+        "table-2": tables[2]["id"],
+    }
+    rows = client.get(f"/api/tablerow?table={tables[2]['id'] + 1}").json["items"]
+    assert rows[0]["row"] == ["Mount 0", "100"]
+    assert TableRow.select().where(TableRow.table == tables[1]["id"]).count() == 0
+
+
+@pytest.mark.parametrize(
+    "location, options",
+    [
+        ("dataset.zip", {}),
+        ("dataset", {}),
+        ("dataset", {"batch_compressed": True, "batch_size": 2}),
+        ("dataset", {"multi_desc_version": True}),
+        # not in JSON, read by `Dataset.load`
+        ("dataset", {"table_fmt": "txt"}),
+    ],
+)
+def test_iter_dataset(tmp_path: Path, location: str, options: dict):
+    examples = make_examples(5)
+    dataset = Dataset(tmp_path / location)
+    dataset.save(examples, **options)
+
+    lst = list(iter_dataset(dataset))
+    # tables in other formats than JSON are not the same as the saved ones
+    expected = dataset.load() if "table_fmt" in options else examples
+    assert [ex.id for ex in lst] == [ex.id for ex in dataset.load()]
+    assert [ex.table.to_dict() for ex in lst] == [ex.table.to_dict() for ex in expected]
+    assert [[sm.to_dict() for sm in ex.sms] for ex in lst] == [
+        [sm.to_dict() for sm in ex.sms] for ex in expected
+    ]
+
+
+def test_iter_dataset_missing_description(tmp_path: Path):
+    examples = make_examples(3)
+    dataset = Dataset(tmp_path / "dataset")
+    dataset.save(examples, batch_compressed=True)
+
+    # remove the description of a table
+    (part,) = (tmp_path / "dataset/descriptions").iterdir()
+    with ZipFile(part, mode="r") as zf:
+        files = {info.filename: zf.read(info) for info in zf.infolist()}
+    with ZipFile(part, mode="w") as zf:
+        for filename, content in list(files.items())[1:]:
+            zf.writestr(filename, content)
+
+    with pytest.raises(ValueError, match="Description file not found"):
+        list(iter_dataset(dataset))
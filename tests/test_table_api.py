@@ -0,0 +1,972 @@
+import multiprocessing
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from zipfile import ZipFile
+
+import orjson
+import pytest
+from drepr.models.prelude import OutputFormat
+from flask import jsonify
+from flask.testing import FlaskClient
+from sm.dataset import Dataset
+from werkzeug.exceptions import Conflict
+
+from sand.config import _ROOT_DIR
+from sand.controllers import table as table_controller
+from sand.controllers.helpers import upload_session
+from sand.controllers.helpers.export import iter_export_zip
+from sand.controllers.helpers.upload import iter_json_array, parse_upload_files
+from sand.extension_interface.export import IExport
+from sand.helpers.column_types import infer_column_types
+from sand.helpers.json_provider import orjson_response
+from sand.helpers.namespace import NamespaceService
+from sand.helpers.service_provider import MultiServiceProvider
+from sand.models import Table, db
+from sand.models.base import ZSTD_MAGIC, codec
+from sand.models.ontology import OntProperty, OntPropertyAR, semweb_default_props
+from sand.models.semantic_model import SemanticModel
+from sand.models.table import get_rows
+
+
+def upload_table(client: FlaskClient, **form) -> int:
+    resp = client.post(
+        "/api/project", json={"name": "test_project", "description": "test project"}
+    )
+    project_id = resp.json["id"]
+
+    datafile_path = (
+        _ROOT_DIR / "tests/resources/data/dbload/highest_mountains_in_vn.csv"
+    )
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={
+            "file": open(datafile_path, "rb"),
+            "parser_opts": '{"file":{"delimiter":",","first_row_is_header":true,"format":"csv"}}',
+            "selected_tables": "[0]",
+            **form,
+        },
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    return resp.json["table_ids"][0]
+
+
+def test_api_columnar_table(client: FlaskClient):
+    table_id = upload_table(client, storage="columnar")
+    assert client.get(f"/api/table/{table_id}").json["storage"] == "columnar"
+
+    resp = client.get(f"/api/tablerow?table={table_id}&limit=5&offset=1")
+    assert resp.status_code == 200
+    assert resp.json["total"] == 23
+    rows = resp.json["items"]
+    assert [row["index"] for row in rows] == [1, 2, 3, 4, 5]
+    assert rows[0]["row"] == ["2", "Putaleng", "Lai Châu", "", "3096", ""]
+    assert rows[0]["links"] == {}
+
+    resp = client.put(
+        f"/api/tablerow/{rows[0]['id']}/cells/1",
+        json={"links": [{"start": 0, "end": 8, "url": None, "entity_id": "Q1"}]},
+    )
+    assert resp.status_code == 200
+    resp = client.put(
+        "/api/tablerow/update_column_links",
+        json={"table": table_id, "column": 2, "text": "Lào Cai", "entity_id": "Q2"},
+    )
+    assert resp.status_code == 200
+
+    row = client.get(f"/api/tablerow/{rows[0]['id']}").json
+    assert row["links"]["1"][0]["entity_id"] == "Q1"
+
+    resp = client.get(f"/api/table/{table_id}/export-linked-entities")
+    assert resp.data.decode().splitlines() == [
+        "row,col,start,end,url,entity",
+        "0,2,0,7,,Q2",
+        "1,1,0,8,,Q1",
+        "3,2,0,7,,Q2",
+        "7,2,0,7,,Q2",
+        "11,2,0,7,,Q2",
+    ]
+
+
+def test_api_update_cell_links(client: FlaskClient):
+    table_id = upload_table(client)
+    row = client.get(f"/api/tablerow?table={table_id}&index=2").json["items"][0]
+
+    link = {"start": 0, "end": 10, "url": None, "entity_id": None}
+    resp = client.put(
+        f"/api/tablerow/{row['id']}/cells/1",
+        json={
+            "links": [
+                {
+                    **link,
+                    "candidate_entities": [
+                        {"entity_id": "Q1", "probability": 0.7},
+                        {"entity_id": "Q2", "probability": 0.3},
+                    ],
+                }
+            ]
+        },
+    )
+    assert resp.status_code == 200
+
+    # update the entity without touching the candidate entities
+    resp = client.put(
+        f"/api/tablerow/{row['id']}/cells/1",
+        json={"links": [{**link, "entity_id": "Q2"}]},
+    )
+    assert resp.status_code == 200
+
+    links = client.get(f"/api/tablerow/{row['id']}").json["links"]
+    assert links == {
+        "1": [
+            {
+                **link,
+                "entity_id": "Q2",
+                "candidate_entities": [
+                    {"entity_id": "Q1", "probability": 0.7},
+                    {"entity_id": "Q2", "probability": 0.3},
+                ],
+            }
+        ]
+    }
+
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_api_select_row_links(client: FlaskClient, storage: str):
+    table_id = upload_table(client, storage=storage)
+    resp = client.put(
+        "/api/tablerow/update_column_links",
+        json={"table": table_id, "column": 2, "text": "Lai Châu", "entity_id": "Q1"},
+    )
+    assert resp.status_code == 200
+    link = {
+        "start": 0,
+        "end": 8,
+        "url": None,
+        "entity_id": "Q1",
+        "candidate_entities": [],
+    }
+
+    resp = client.get(f"/api/tablerow?table={table_id}&fields=id,links&limit=2")
+    assert resp.status_code == 200
+    items = resp.json["items"]
+    assert [sorted(item.keys()) for item in items] == [["id", "links"]] * 2
+    assert [item["links"] for item in items] == [{}, {"2": [link]}]
+
+    resp = client.get(f"/api/tablerow/{items[1]['id']}?fields=links")
+    assert resp.json == {"links": {"2": [link]}}
+
+    resp = client.get(
+        f"/api/tablerow?table={table_id}&index[in]=0,1,3&fields=index,row,links"
+        "&sorted_by=-index&offset=1"
+    )
+    assert resp.json["total"] == 3
+    assert [item["index"] for item in resp.json["items"]] == [1, 0]
+    assert resp.json["items"][0]["row"][:2] == ["2", "Putaleng"]
+    assert resp.json["items"][0]["links"] == {"2": [link]}
+    for args in [
+        "fields=id,links,foo",
+        "fields=id,links&unique=true",
+        "foo=1&fields=links",
+    ]:
+        assert client.get(f"/api/tablerow?{args}").status_code == 400
+
+    resp = client.post(
+        "/api/tablerow/find_by_ids?fields=index,links",
+        json={"ids": [item["id"] for item in items]},
+    )
+    assert resp.json["items"] == {
+        str(items[0]["id"]): {"index": 0, "links": {}},
+        str(items[1]["id"]): {"index": 1, "links": {"2": [link]}},
+    }
+
+
+def test_api_compressed_table(client: FlaskClient):
+    codec.configure(True)
+    try:
+        table_id = upload_table(client, storage="columnar")
+    finally:
+        codec.configure(False)
+
+    # values are only compressed when it makes them smaller
+    values = [
+        value
+        for (value,) in db.execute_sql(
+            "SELECT cells FROM tablecolumnchunk WHERE table_id = ?", (table_id,)
+        )
+    ]
+    assert any(value[:4] == ZSTD_MAGIC for value in values)
+
+    row = client.get(f"/api/tablerow?table={table_id}&index=1").json["items"][0]
+    assert row["row"] == ["2", "Putaleng", "Lai Châu", "", "3096", ""]
+
+
+def test_api_rows_stored_as_json(client: FlaskClient):
+    table_id = upload_table(client)
+    # rows written by older versions are encoded as JSON
+    db.execute_sql(
+        'UPDATE tablerow SET row = ? WHERE table_id = ? AND "index" = 0',
+        (b'["1","Fansipan","L\\u00e0o Cai","","3143",""]', table_id),
+    )
+    rows = client.get(f"/api/tablerow?table={table_id}&limit=2").json["items"]
+    assert rows[0]["row"] == ["1", "Fansipan", "Lào Cai", "", "3143", ""]
+    assert rows[1]["row"] == ["2", "Putaleng", "Lai Châu", "", "3096", ""]
+
+
+def test_api_row_range(client: FlaskClient, monkeypatch):
+    table_id = upload_table(client)
+
+    resp = client.get(f"/api/tablerow/range?table={table_id}&start=5&limit=10")
+    assert resp.status_code == 200
+    assert resp.json["total"] == 23
+    assert [row["index"] for row in resp.json["items"]] == list(range(5, 15))
+    assert resp.json["items"][0]["row"][1] == "Tả Liên (Cổ Trâu)"
+
+    cursor = resp.json["next_cursor"]
+    resp = client.get(f"/api/tablerow/range?table={table_id}&cursor={cursor}&limit=10")
+    assert [row["index"] for row in resp.json["items"]] == list(range(15, 23))
+    assert resp.json["next_cursor"] is None
+
+    resp = client.get("/api/tablerow/range?table=10000")
+    assert resp.status_code == 404
+
+    for args in ["limit=0", "limit=-1", "start=-5", "cursor=-1", "limit=abc"]:
+        resp = client.get(f"/api/tablerow/range?table={table_id}&{args}")
+        assert resp.status_code == 400
+
+    monkeypatch.setattr(table_controller, "MAX_PAGE_SIZE", 20)
+    resp = client.get(f"/api/tablerow/range?table={table_id}&limit=100")
+    assert len(resp.json["items"]) == 20
+    assert resp.json["next_cursor"] == "20"
+
+
+def test_api_search_cells(client: FlaskClient):
+    table_id = upload_table(client)
+
+    resp = client.get(f"/api/table/{table_id}/search-cells?q=lao cai")
+    assert resp.status_code == 200
+    assert sorted(item["row"] for item in resp.json["items"]) == [0, 3, 7, 11]
+    assert all(item["value"] == "Lào Cai" for item in resp.json["items"])
+
+    resp = client.get(f"/api/table/{table_id}/search-cells?q=Puta&column=1")
+    assert [(item["row"], item["value"]) for item in resp.json["items"]] == [
+        (1, "Putaleng")
+    ]
+
+    project_id = client.get(f"/api/table/{table_id}").json["project"]
+    resp = client.get(f"/api/project/{project_id}/search-cells?q=Putaleng")
+    assert [(item["table"], item["row"]) for item in resp.json["items"]] == [
+        (table_id, 1)
+    ]
+
+    # updating a row updates the index
+    row = client.get(f"/api/tablerow?table={table_id}&index=1").json["items"][0]
+    resp = client.put(
+        f"/api/tablerow/{row['id']}",
+        json={"row": ["2", "Pu Ta Leng", "Lai Châu", "", "3096", ""]},
+    )
+    assert resp.status_code == 200
+    resp = client.get(f"/api/project/{project_id}/search-cells?q=Putaleng")
+    assert resp.json["items"] == []
+
+    for args in ["limit=0", f"limit={10**9}", "column=abc", "column=-1"]:
+        resp = client.get(f"/api/table/{table_id}/search-cells?q=Lai&{args}")
+        assert resp.status_code == 400
+    # invalid limits fall back to the default
+    resp = client.get(f"/api/table/{table_id}/search-cells?q=Lai&limit=abc")
+    assert resp.status_code == 200
+
+
+def test_api_update_cells_links(client: FlaskClient):
+    table_id = upload_table(client)
+    row = client.get(f"/api/tablerow?table={table_id}&index=2").json["items"][0]
+
+    link = {"start": 0, "end": 4, "url": None, "entity_id": "Q1"}
+    resp = client.put(
+        "/api/tablerow/cells",
+        json={
+            "table": table_id,
+            "patches": [
+                {"id": row["id"], "column": 1, "links": [link]},
+                {
+                    "index": 5,
+                    "column": 2,
+                    "links": [
+                        {
+                            **link,
+                            "candidate_entities": [
+                                {"entity_id": "Q1", "probability": 0.5}
+                            ],
+                        }
+                    ],
+                },
+                {"index": 5, "column": 2, "links": [{**link, "entity_id": "Q2"}]},
+            ],
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.json["updated"] == 3
+
+    rows = client.get(f"/api/tablerow/range?table={table_id}&start=2&limit=4").json
+    assert rows["items"][0]["links"] == {"1": [{**link, "candidate_entities": []}]}
+    assert rows["items"][3]["links"] == {
+        "2": [
+            {
+                **link,
+                "entity_id": "Q2",
+                "candidate_entities": [{"entity_id": "Q1", "probability": 0.5}],
+            }
+        ]
+    }
+
+    resp = client.put(
+        "/api/tablerow/cells",
+        json={"table": table_id, "patches": [{"index": 100, "column": 1, "links": []}]},
+    )
+    assert resp.status_code == 400
+
+    for body in [
+        {"patches": [{"id": str(row["id"]), "column": 1, "links": []}]},
+        {"table": str(table_id), "patches": [{"index": 1, "column": 1, "links": []}]},
+        {"table": table_id, "patches": [{"index": True, "column": 1, "links": []}]},
+    ]:
+        resp = client.put("/api/tablerow/cells", json=body)
+        assert resp.status_code == 400
+
+
+def test_api_upload_ragged_csv(client: FlaskClient):
+    project_id = client.post(
+        "/api/project", json={"name": "test_project", "description": "test project"}
+    ).json["id"]
+
+    def upload(**form):
+        return client.post(
+            f"/api/project/{project_id}/upload",
+            data={
+                "file": (
+                    BytesIO("name,height\nFansipan,3143,Lào Cai\nPutaleng\n".encode()),
+                    "peaks.csv",
+                ),
+                "parser_opts": '{"file":{"delimiter":",","first_row_is_header":true,"format":"csv"}}',
+                **form,
+            },
+            content_type="multipart/form-data",
+        )
+
+    resp = upload()
+    assert resp.status_code == 200
+    table = resp.json["tables"][0]["tables"][0]
+    assert table["header"] == ["name", "height", ""]
+    assert table["rows"] == [["Fansipan", "3143", "Lào Cai"], ["Putaleng", "", ""]]
+    assert table["links"] == [{}, {}]
+    assert table["column_types"] == ["entity", "integer", "entity"]
+
+    resp = upload(selected_tables="[0]")
+    assert resp.status_code == 200
+    table_id = resp.json["table_ids"][0]
+    assert client.get(f"/api/table/{table_id}").json["size"] == 2
+    rows = client.get(f"/api/tablerow/range?table={table_id}").json["items"]
+    assert [row["row"] for row in rows] == [
+        ["Fansipan", "3143", "Lào Cai"],
+        ["Putaleng", "", ""],
+    ]
+
+
+def test_api_upload_session(client: FlaskClient, tmp_path):
+    client.application.config["UPLOAD_DIR"] = str(tmp_path)
+    project_id = client.post(
+        "/api/project", json={"name": "test_project", "description": "test project"}
+    ).json["id"]
+    content = (
+        _ROOT_DIR / "tests/resources/data/dbload/highest_mountains_in_vn.csv"
+    ).read_bytes()
+
+    resp = client.post(
+        f"/api/project/{project_id}/upload-sessions",
+        json={"filename": "peaks.csv", "size": len(content)},
+    )
+    assert resp.status_code == 200
+    session_id = resp.json["id"]
+    url = f"/api/project/{project_id}/upload-sessions/{session_id}"
+
+    resp = client.put(f"{url}?offset=0", data=content[:500])
+    assert resp.json["offset"] == 500
+    # chunks must continue from the received bytes
+    assert client.put(f"{url}?offset=0", data=content[:500]).status_code == 409
+
+    def commit():
+        return client.post(
+            f"/api/project/{project_id}/upload",
+            data={
+                "upload_sessions": orjson.dumps({"file": session_id}).decode(),
+                "selected_tables": "[0]",
+            },
+            content_type="multipart/form-data",
+        )
+
+    assert commit().status_code == 400
+
+    offset = client.get(url).json["offset"]
+    resp = client.put(f"{url}?offset={offset}", data=content[offset:])
+    assert resp.json["is_complete"]
+
+    resp = commit()
+    assert resp.status_code == 200
+    table_id = resp.json["table_ids"][0]
+    assert client.get(f"/api/table/{table_id}").json["size"] == 23
+
+    # the session is removed once its tables are saved
+    assert client.get(url).status_code == 404
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_api_upload_token(client: FlaskClient, tmp_path, monkeypatch):
+    client.application.config["UPLOAD_DIR"] = str(tmp_path)
+    project_id = client.post(
+        "/api/project", json={"name": "test_project", "description": "test project"}
+    ).json["id"]
+    parser_opts = '{"file":{"delimiter":",","first_row_is_header":true,"format":"csv"}}'
+
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={
+            "file": open(
+                _ROOT_DIR / "tests/resources/data/dbload/highest_mountains_in_vn.csv",
+                "rb",
+            ),
+            "preview_rows": "5",
+        },
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    token = resp.json["upload_token"]
+    table = resp.json["tables"][0]["tables"][0]
+    assert table["size"] == 23
+    assert len(table["rows"]) == 5 and len(table["links"]) == 5
+    column_types = ["integer", "entity", "entity", "coordinate", "text", "integer"]
+    assert table["column_types"] == column_types
+
+    # saving the tables with the detected options does not parse the file again
+    n_parses = []
+    monkeypatch.setattr(
+        upload_session,
+        "parse_upload_files",
+        lambda files: n_parses.append(1) or parse_upload_files(files),
+    )
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={
+            "upload_token": token,
+            "parser_opts": parser_opts,
+            "selected_tables": "[0]",
+        },
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    assert n_parses == []
+    table_id = resp.json["table_ids"][0]
+    rows = client.get(f"/api/tablerow/range?table={table_id}&limit=100").json["items"]
+    assert len(rows) == 23
+    assert client.get(f"/api/table/{table_id}").json["column_types"] == column_types
+
+    # the files are removed once the tables are saved
+    assert list(tmp_path.iterdir()) == []
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={"upload_token": token, "selected_tables": "[0]"},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 404
+
+
+def test_api_upload_multiple_files(client: FlaskClient, tmp_path):
+    client.application.config["UPLOAD_DIR"] = str(tmp_path)
+    project_id = client.post(
+        "/api/project", json={"name": "test_project", "description": "test project"}
+    ).json["id"]
+
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={
+            "file1": (BytesIO(b"name,height\nFansipan,3143\n"), "peaks.csv"),
+            "file2": (BytesIO(b'{"name": "Fansipan"'), "broken.json"),
+            "file3": (BytesIO(b"name\tprovince\nPutaleng\tLai Chau\n"), "peaks.tsv"),
+        },
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    assert list(resp.json["errors"].keys()) == ["file2"]
+    assert resp.json["errors"]["file2"].startswith("Cannot parse broken.json")
+    assert [
+        (table["tables"][0]["name"], table["tables"][0]["rows"])
+        for table in resp.json["tables"]
+    ] == [("peaks", [["Fansipan", "3143"]]), ("peaks", [["Putaleng", "Lai Chau"]])]
+
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={"upload_token": resp.json["upload_token"], "selected_tables": "[1]"},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    table = client.get(f"/api/table/{resp.json['table_ids'][0]}").json
+    assert table["columns"] == ["name", "province"]
+
+
+def test_upload_chunk_sent_twice(client: FlaskClient, tmp_path):
+    client.application.config["UPLOAD_DIR"] = str(tmp_path)
+    content = b"0123456789"
+
+    class SlowStream:
+        """A request body that is received after `event` is set"""
+
+        def __init__(self, event: threading.Event):
+            self.event = event
+            self.data = [content]
+
+        def read(self, size: int):
+            self.event.wait()
+            return self.data.pop() if len(self.data) > 0 else b""
+
+    with client.application.app_context():
+        session = upload_session.create_upload_session(1, "x.csv", len(content))
+        event = threading.Event()
+        results = []
+
+        def append():
+            with client.application.app_context():
+                try:
+                    results.append(
+                        upload_session.append_upload_chunk(
+                            upload_session.get_upload_session(1, session.id),
+                            0,
+                            SlowStream(event),
+                        ).offset
+                    )
+                except Conflict:
+                    results.append("conflict")
+
+        # the chunk is sent again while the first request is still receiving it
+        threads = [threading.Thread(target=append) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        event.set()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(results, key=str) == [10, "conflict"]
+        session = upload_session.get_upload_session(1, session.id)
+        assert session.is_complete
+        assert Path(upload_session.get_upload_file(session)).read_bytes() == content
+
+
+def test_api_upload_json(client: FlaskClient):
+    project_id = client.post(
+        "/api/project", json={"name": "test_project", "description": "test project"}
+    ).json["id"]
+    records = [
+        {"name": "Fansipan", "height": 3143},
+        {"name": "Putaleng", "province": "Lai Châu"},
+        {"height": 3073, "name": "Pu Si Lung"},
+    ]
+
+    for filename, content in [
+        ("peaks.json", orjson.dumps(records, option=orjson.OPT_INDENT_2)),
+        ("peaks.jsonl", b"\n".join(orjson.dumps(record) for record in records)),
+    ]:
+        resp = client.post(
+            f"/api/project/{project_id}/upload",
+            data={"file": (BytesIO(content), filename), "selected_tables": "[0]"},
+            content_type="multipart/form-data",
+        )
+        assert resp.status_code == 200
+        table_id = resp.json["table_ids"][0]
+
+        table = client.get(f"/api/table/{table_id}").json
+        assert table["columns"] == ["name", "height", "province"]
+        assert table["column_types"] == ["entity", "integer", "entity"]
+        rows = client.get(f"/api/tablerow/range?table={table_id}").json["items"]
+        assert [row["row"] for row in rows] == [
+            ["Fansipan", 3143, None],
+            ["Putaleng", None, "Lai Châu"],
+            ["Pu Si Lung", 3073, None],
+        ]
+
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={"file": (BytesIO(b'{"name": "Fansipan"}'), "peak.json")},
+        content_type="multipart/form-data",
+    )
+    assert resp.json["tables"] == []
+    assert "must contain a list of records" in resp.json["errors"]["file"]
+
+
+@pytest.mark.parametrize(
+    "content, items",
+    [
+        (b"[]", []),
+        (b" [ ] \n", []),
+        (
+            b'[{"a": 1}, [2, {"b": "]"}], "x,\\"y", null]',
+            [{"a": 1}, [2, {"b": "]"}], 'x,"y', None],
+        ),
+        (b'\n[{"a":1}]\n\n', [{"a": 1}]),
+        (b'[{"a":1}] x', None),
+        (b'[{"a":1}]]', None),
+        (b"x[1]", None),
+        (b'{"a": 1}', None),
+        (b"[1,2,]", None),
+        (b"[1,,2]", None),
+        (b"[,]", None),
+        (b"[1,2}", None),
+        (b"[1,2", None),
+        (b"", None),
+    ],
+)
+def test_iter_json_array(content: bytes, items):
+    for chunk_size in [1, 2, 3, 5, 1024]:
+        if items is None:
+            with pytest.raises(ValueError):
+                list(iter_json_array(BytesIO(content), chunk_size))
+        else:
+            assert list(iter_json_array(BytesIO(content), chunk_size)) == items
+
+
+@pytest.mark.parametrize(
+    "values, type",
+    [
+        (["1", "-20", "+300"], "integer"),
+        (["1.5", "2", "-3e5", ".5"], "decimal"),
+        (["1_000", "2_000"], "text"),
+        ([" 12 ", "13"], "text"),
+        (["1,234", "12,500", "3,000"], "text"),
+        (["nan", "inf"], "entity"),
+        (["22.3, 103.77", "-33.86;151.2"], "coordinate"),
+        (["POINT(103.77 22.3)", "POINT (-74 40.7)"], "coordinate"),
+        (["22°20′51″B 103°49′3″Đ", "40°42′N 74°0′W"], "coordinate"),
+        (["95.1, 103.77"], "text"),
+        (["22.3, 190.5"], "text"),
+        (["POINT(103.77 95)"], "entity"),
+        (["200°N 103°E"], "entity"),
+    ],
+)
+def test_infer_column_types(values, type):
+    assert infer_column_types([[value] for value in values]) == [type]
+
+
+def test_api_parquet_and_arrow(client: FlaskClient, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    from pyarrow import ipc, parquet
+
+    from sand.helpers import arrow
+    from sand.helpers.arrow import get_column_type
+
+    table_id = upload_table(client)
+    project_id = client.get(f"/api/table/{table_id}").json["project"]
+    client.put(
+        "/api/tablerow/update_column_links",
+        json={"table": table_id, "column": 2, "text": "Lào Cai", "entity_id": "Q2"},
+    )
+
+    resp = client.get(f"/api/table/{table_id}/export-rows?format=parquet")
+    assert resp.status_code == 200
+    exported = parquet.read_table(BytesIO(resp.data))
+    assert exported.schema.types[0] == pa.int64()
+    assert exported.schema.types[4] == pa.string()
+    assert exported.column(1).to_pylist()[:2] == ["Fansipan", "Putaleng"]
+    assert exported.column(5).to_pylist()[:2] == [1613, None]
+
+    resp = client.get(f"/api/table/{table_id}/export-linked-entities?format=arrow")
+    links = ipc.open_file(BytesIO(resp.data)).read_all()
+    assert links.column("row").to_pylist() == [0, 3, 7, 11]
+    assert links.column("entity").to_pylist() == ["Q2"] * 4
+
+    # links are written in batches
+    monkeypatch.setattr(arrow, "BATCH_SIZE", 3)
+    for format in ["arrow", "parquet"]:
+        resp = client.get(
+            f"/api/table/{table_id}/export-linked-entities?format={format}"
+        )
+        assert resp.is_streamed
+        if format == "arrow":
+            reader = ipc.open_file(BytesIO(resp.data))
+            assert reader.num_record_batches == 2
+            links = reader.read_all()
+        else:
+            file = parquet.ParquetFile(BytesIO(resp.data))
+            assert file.num_row_groups == 2
+            links = file.read()
+        assert links.column("row").to_pylist() == [0, 3, 7, 11]
+        assert links.column("url").to_pylist() == [None] * 4
+
+    assert get_column_type(pa.bool_()) == "text"
+
+    # upload the exported files back
+    for filename, content in [
+        (
+            "peaks.parquet",
+            client.get(f"/api/table/{table_id}/export-rows?format=parquet").data,
+        ),
+        (
+            "peaks.arrow",
+            client.get(f"/api/table/{table_id}/export-rows?format=arrow").data,
+        ),
+    ]:
+        resp = client.post(
+            f"/api/project/{project_id}/upload",
+            data={"file": (BytesIO(content), filename), "selected_tables": "[0]"},
+            content_type="multipart/form-data",
+        )
+        assert resp.status_code == 200
+        new_table = client.get(f"/api/table/{resp.json['table_ids'][0]}").json
+        assert new_table["size"] == 23
+        assert new_table["column_types"] == [
+            "integer",
+            "entity",
+            "entity",
+            "coordinate",
+            "text",
+            "integer",
+        ]
+        rows = client.get(f"/api/tablerow/range?table={new_table['id']}&limit=2").json[
+            "items"
+        ]
+        assert rows[1]["row"] == [2, "Putaleng", "Lai Châu", "", "3096", None]
+
+
+class RowExport(IExport):
+    def export_data_model(self, table, sm):
+        return {}
+
+    def export_extra_resources(self, table, rows, sm):
+        return {}
+
+    def export_data(self, table, rows, sm, output_format):
+        return "".join(f"row {row.index}: {row.row[1]}\n" for row in rows)
+
+    def export_data_stream(self, table, rows, sm, output_format):
+        for row in rows:
+            yield self.export_data(table, [row], sm, output_format)
+
+
+def test_api_export_table_data_stream(client: FlaskClient, example_db, monkeypatch):
+    monkeypatch.setattr(MultiServiceProvider, "get_default", lambda self: RowExport())
+    monkeypatch.setattr(table_controller, "EXPORT_BATCH_SIZE", 10)
+
+    resp = client.get("/api/table/1/export")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    lines = resp.data.decode().splitlines()
+    assert len(lines) == 23
+    assert lines[:2] == ["row 0: Fansipan", "row 1: Putaleng"]
+
+
+@pytest.mark.parametrize("post_processing", [False, True])
+def test_api_export_table_data_drepr_stream(
+    client: FlaskClient, example_db, monkeypatch, post_processing: bool
+):
+    from rdflib import BNode, Graph
+    from rdflib.compare import isomorphic
+    from sand_drepr import main as drepr_main
+
+    new_entity_uri = re.compile(r"http://www\.wikidata\.org/entity/[0-9a-f-]{36}")
+
+    # the test property db doesn't have properties of the example semantic model
+    props = semweb_default_props()
+    for id, datatype in [
+        ("P17", "string"),
+        ("P131", "entity"),
+        ("P2044", "decimal-number"),
+        ("P2660", "decimal-number"),
+    ]:
+        props[id] = OntProperty(
+            id=id,
+            uri=f"http://www.wikidata.org/prop/{id}",
+            label=id,
+            datatype=datatype,
+            aliases=[],
+            description="",
+            parents=[],
+        )
+    namespace = NamespaceService(default_properties=props)
+    exporter = drepr_main.DreprExport(
+        namespace=namespace, ontprop_ar=OntPropertyAR({}, props, namespace.uri_to_id)
+    )
+    monkeypatch.setattr(MultiServiceProvider, "get_default", lambda self: exporter)
+    monkeypatch.setattr(table_controller, "EXPORT_BATCH_SIZE", 4)
+    monkeypatch.setattr(drepr_main, "EXPORT_CHUNK_SIZE", 5)
+    monkeypatch.setattr(
+        drepr_main.DreprExport, "has_post_processing", lambda self, sm: post_processing
+    )
+    exported_chunks = []
+    export_data = drepr_main.DreprExport.export_data
+
+    def spy_export_data(self, table, rows, sm, output_format):
+        exported_chunks.append(len(rows))
+        return export_data(self, table, rows, sm, output_format)
+
+    monkeypatch.setattr(drepr_main.DreprExport, "export_data", spy_export_data)
+
+    resp = client.get("/api/table/1/export")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    content = resp.data.decode()
+    if post_processing:
+        assert exported_chunks == [23]
+    else:
+        assert exported_chunks == [5, 5, 5, 5, 3]
+
+    table = Table.get_by_id(1)
+    sm = SemanticModel.get(SemanticModel.table == table).data
+    expected = export_data(exporter, table, get_rows(table), sm, OutputFormat.TTL)
+
+    def parse_ttl(content: str) -> Graph:
+        # new entities have random URIs, so they are compared as blank nodes
+        graph = Graph()
+        new_ents = {}
+        for triple in Graph().parse(data=content, format="turtle"):
+            graph.add(
+                tuple(
+                    (
+                        new_ents.setdefault(term, BNode())
+                        if new_entity_uri.fullmatch(term)
+                        else term
+                    )
+                    for term in triple
+                )
+            )
+        return graph
+
+    graph = parse_ttl(content)
+    assert len(graph) == len(Graph().parse(data=expected, format="turtle")) > 0
+    assert isomorphic(graph, parse_ttl(expected))
+
+
+def test_api_export_project_linked_entities(client: FlaskClient, monkeypatch):
+    monkeypatch.setattr(table_controller, "CSV_CHUNK_SIZE", 16)
+    table_ids = [upload_table(client)]
+    project_id = client.get(f"/api/table/{table_ids[0]}").json["project"]
+    resp = client.post(
+        f"/api/project/{project_id}/upload",
+        data={
+            "file": open(
+                _ROOT_DIR / "tests/resources/data/dbload/highest_mountains_in_vn.csv",
+                "rb",
+            ),
+            "selected_tables": "[0]",
+            "storage": "columnar",
+        },
+        content_type="multipart/form-data",
+    )
+    table_ids.append(resp.json["table_ids"][0])
+    for table_id, text, entity_id in zip(
+        table_ids, ["Lai Châu", "Lào Cai"], ["Q1", "Q2"]
+    ):
+        resp = client.put(
+            "/api/tablerow/update_column_links",
+            json={"table": table_id, "column": 2, "text": text, "entity_id": entity_id},
+        )
+        assert resp.status_code == 200
+
+    resp = client.get(f"/api/table/{table_ids[1]}/export-linked-entities")
+    assert resp.is_streamed
+    assert resp.data.decode().splitlines() == [
+        "row,col,start,end,url,entity",
+        "0,2,0,7,,Q2",
+        "3,2,0,7,,Q2",
+        "7,2,0,7,,Q2",
+        "11,2,0,7,,Q2",
+    ]
+
+    resp = client.get(f"/api/project/{project_id}/export-linked-entities")
+    assert resp.status_code == 200
+    lines = resp.data.decode().splitlines()
+    assert lines[0] == "table,row,col,start,end,url,entity"
+    names = [client.get(f"/api/table/{id}").json["name"] for id in table_ids]
+    assert [line.split(",")[0] for line in lines[1:]] == [names[0]] * 6 + [names[1]] * 4
+    assert lines[1] == f"{names[0]},1,2,0,8,,Q1"
+
+
+def test_api_export_project(client: FlaskClient, example_db, tmp_path):
+    resp = client.post(
+        "/api/project/1/upload",
+        data={
+            "file": open(
+                _ROOT_DIR / "tests/resources/data/dbload/highest_mountains_in_vn.csv",
+                "rb",
+            ),
+            "selected_tables": "[0]",
+            "storage": "columnar",
+        },
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    resp = client.put(
+        "/api/tablerow/update_column_links",
+        json={"table": 1, "column": 2, "text": "Lào Cai", "entity_id": "Q2"},
+    )
+    assert resp.status_code == 200
+    sms = [sm.data.to_dict() for sm in SemanticModel.select()]
+
+    resp = client.get("/api/project/1/export")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    (tmp_path / "project.zip").write_bytes(resp.data)
+    examples = sorted(
+        Dataset(tmp_path / "project.zip").load(), key=lambda ex: len(ex.sms)
+    )
+    assert len(examples) == 2
+    assert [ex.table.table.shape() for ex in examples] == [(23, 6), (23, 6)]
+    assert examples[1].table.table.get_column_by_index(1).values[:2] == [
+        "Fansipan",
+        "Putaleng",
+    ]
+    assert examples[0].table.table.get_column_by_index(1).values[:2] == [
+        "Fansipan",
+        "Putaleng",
+    ]
+    assert [sm.to_dict() for sm in examples[1].sms] == sms
+    links = [
+        (ri, ci, [(l.start, l.end, l.url, l.entities) for l in lst])
+        for ri, ci, lst in examples[1].table.links.enumerate_flat_iter()
+        if len(lst) > 0
+    ]
+    assert links == [(ri, 2, [(0, 7, None, ["Q2"])]) for ri in [0, 3, 7, 11]]
+    assert all(len(lst) == 0 for lst in examples[0].table.links.flat_iter())
+
+    # tables converted in worker processes are written in the same order
+    tables = list(Table.select().order_by(Table.id))
+    with ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        zips = [
+            ZipFile(BytesIO(b"".join(iter_export_zip(tables, pool_))))
+            for pool_ in [None, pool]
+        ]
+    assert [info.filename for info in zips[0].infolist()] == [
+        info.filename for info in zips[1].infolist()
+    ]
+    assert len(zips[0].infolist()) == 4
+    assert all(zips[0].read(info) == zips[1].read(info) for info in zips[0].infolist())
+
+
+def test_orjson_responses(client: FlaskClient, example_db):
+    data = {"value": float("nan"), "id": 1}
+    with client.application.test_request_context():
+        # other responses are encoded by the default provider of Flask
+        assert jsonify(data).get_data(as_text=True) == '{"id":1,"value":NaN}\n'
+        resp = orjson_response(lambda: jsonify(data))()
+        assert resp.get_data(as_text=True) == '{"value":null,"id":1}'
+        resp = orjson_response(lambda: jsonify([orjson.Fragment(b'["1",2]')]))()
+        assert resp.get_data(as_text=True) == '[["1",2]]'
+
+    for url in ["/api/tablerow?table=1&limit=1", "/api/tablerow/range?table=1&limit=1"]:
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert resp.json["items"][0]["row"][1] == "Fansipan"
+    resp = client.get("/api/table/1")
+    assert resp.get_data(as_text=True).endswith('"size":23,"storage":"row"}\n')
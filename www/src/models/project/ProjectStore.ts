@@ -4,27 +4,88 @@ import { SERVER } from "../../env";
 import { DraftCreateProject, DraftUpdateProject, Project } from "./Project";
 import { ParserOpts, UploadingTable } from "./ProjectUpload";
 
+/** files larger than this are sent in chunks of this size through upload sessions */
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+/** number of times a chunk is re-sent before giving up */
+const UPLOAD_CHUNK_RETRIES = 3;
+
 export class ProjectStore extends CRUDStore<
   number,
   DraftCreateProject,
   DraftUpdateProject,
   Project
 > {
+  // upload sessions of files that have been (partially) sent to the server
+  protected uploadSessions = new WeakMap<File, string>();
+
   constructor() {
     super(`${SERVER}/api/project`, undefined, false);
   }
 
   /**
-   * Upload a table to the project
+   * Send a file to the server in chunks through a resumable upload session.
+   * If sending a chunk fails, the upload resumes from the bytes that the server
+   * has received. Returns the id of the session.
+   */
+  public uploadFile = async (projectId: number, file: File): Promise<string> => {
+    let sessionId = this.uploadSessions.get(file);
+    let offset = 0;
+    if (sessionId === undefined) {
+      const resp = await axios.post(
+        `${SERVER}/api/project/${projectId}/upload-sessions`,
+        { filename: file.name, size: file.size }
+      );
+      sessionId = resp.data.id as string;
+      this.uploadSessions.set(file, sessionId);
+    } else {
+      const resp = await axios.get(
+        `${SERVER}/api/project/${projectId}/upload-sessions/${sessionId}`
+      );
+      offset = resp.data.offset;
+    }
+
+    const url = `${SERVER}/api/project/${projectId}/upload-sessions/${sessionId}`;
+    let retries = 0;
+    while (offset < file.size) {
+      try {
+        const resp = await axios.put(
+          `${url}?offset=${offset}`,
+          file.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+          { headers: { "Content-Type": "application/octet-stream" } }
+        );
+        offset = resp.data.offset;
+        retries = 0;
+      } catch (error) {
+        if (retries >= UPLOAD_CHUNK_RETRIES) {
+          throw error;
+        }
+        retries += 1;
+        offset = (await axios.get(url)).data.offset;
+      }
+    }
+    return sessionId;
+  };
+
+  /**
+   * Upload a table to the project. Pass the upload token of a previous preview
+   * to reuse the file that has been uploaded.
    */
   public uploadTable = async (
     projectId: number,
     file: File,
     parserOpt?: ParserOpts,
-    selectedTables?: number[]
+    selectedTables?: number[],
+    uploadToken?: string
   ): Promise<UploadingTable | number[]> => {
     const form = new FormData();
-    form.append("file", file);
+    if (uploadToken !== undefined) {
+      form.append("upload_token", uploadToken);
+    } else if (file.size > UPLOAD_CHUNK_SIZE) {
+      const sessionId = await this.uploadFile(projectId, file);
+      form.append("upload_sessions", JSON.stringify({ file: sessionId }));
+    } else {
+      form.append("file", file);
+    }
 
     if (parserOpt !== undefined) {
       form.append("parser_opts", JSON.stringify({ file: parserOpt }));
@@ -43,10 +104,22 @@ export class ProjectStore extends CRUDStore<
         },
       }
     );
+    if (selectedTables !== undefined) {
+      // the server removes the upload session after saving the tables
+      this.uploadSessions.delete(file);
+    }
 
     if (resp.data.tables !== undefined) {
+      if (resp.data.tables.length === 0) {
+        // the file cannot be parsed with the given options
+        throw new Error(Object.values(resp.data.errors).join("\n"));
+      }
       const { parser_opts, tables } = resp.data.tables[0];
-      return { parserOpts: parser_opts, tables };
+      return {
+        parserOpts: parser_opts,
+        tables,
+        uploadToken: resp.data.upload_token,
+      };
     }
     return resp.data.table_ids;
   };
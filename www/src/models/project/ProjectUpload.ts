@@ -10,13 +10,32 @@ export interface JSONParserOpts {
   format: "json";
 }
 
-export type Format = "csv" | "json";
-export const formats: Format[] = ["csv", "json"];
-export type ParserOpts = CSVParserOpts | JSONParserOpts;
+export interface JSONLinesParserOpts {
+  format: "jsonl";
+}
+
+export interface ParquetParserOpts {
+  format: "parquet";
+}
+
+export interface ArrowParserOpts {
+  format: "arrow";
+}
+
+export type Format = "csv" | "json" | "jsonl" | "parquet" | "arrow";
+export const formats: Format[] = ["csv", "json", "jsonl", "parquet", "arrow"];
+export type ParserOpts =
+  | CSVParserOpts
+  | JSONParserOpts
+  | JSONLinesParserOpts
+  | ParquetParserOpts
+  | ArrowParserOpts;
 
 export interface RawTable {
   name: string;
   header: string[];
+  // number of rows of the table, only the first rows are sent in the preview
+  size: number;
   rows: (string | number)[][];
   links: { [columnIndex: string | number]: Link[] }[];
 }
@@ -24,4 +43,6 @@ export interface RawTable {
 export interface UploadingTable {
   parserOpts: ParserOpts;
   tables: RawTable[];
+  // refers to the uploaded file on the server, so it does not need to be sent again
+  uploadToken: string;
 }
@@ -1,6 +1,6 @@
 import axios from "axios";
-import { FetchResult, PairKeysUniqueIndex, SimpleCRUDStore } from "gena-app";
-import { action, flow, makeObservable } from "mobx";
+import { PairKeysUniqueIndex, SimpleCRUDStore } from "gena-app";
+import { action, flow, makeObservable, runInAction } from "mobx";
 import { CancellablePromise } from "mobx/dist/api/flow";
 import { SERVER } from "../../env";
 import { Link, Table, TableRow } from "./Table";
@@ -183,12 +183,7 @@ export class TableRowStore extends SimpleCRUDStore<number, TableRow> {
     let hasLocalData = true;
     const map = this.tableIndex.index.get(table.id);
     if (map === undefined) {
-      const result: FetchResult<TableRow> = yield this.fetch({
-        limit: no,
-        offset: start,
-        conditions: { table: table.id },
-      });
-      return result.records;
+      return yield this.fetchRange(table, start, no);
     }
 
     const output = [];
@@ -202,14 +197,35 @@ export class TableRowStore extends SimpleCRUDStore<number, TableRow> {
     }
 
     if (hasLocalData) return output;
-    const result: FetchResult<TableRow> = yield this.fetch({
-      limit: no,
-      offset: start,
-      conditions: { table: table.id },
-    });
-    return result.records;
+    return yield this.fetchRange(table, start, no);
   });
 
+  /**
+   * Fetch rows of the table from the server using the range API, which selects rows
+   * by their index instead of an offset so fetching rows far from the beginning is fast.
+   *
+   * @param table
+   * @param start the start row
+   * @param no number of rows to return
+   * @returns
+   */
+  fetchRange = async (
+    table: Table,
+    start: number,
+    no: number
+  ): Promise<TableRow[]> => {
+    const resp = await axios.get(`${this.remoteURL}/range`, {
+      params: { table: table.id, start, limit: no },
+    });
+    const rows: TableRow[] = resp.data.items.map(this.deserialize);
+    runInAction(() => {
+      for (const row of rows) {
+        this.set(row);
+      }
+    });
+    return rows;
+  };
+
   protected index(record: TableRow) {
     this.tableIndex.add(record);
   }
@@ -46,6 +46,12 @@ export const RawTableComponent = withStyles(styles)(
           bordered={true}
           toolBarRender={false}
           search={false}
+          footer={
+            table.size > table.rows.length
+              ? () =>
+                  `Showing the first ${table.rows.length} of ${table.size} rows`
+              : undefined
+          }
           pagination={{
             pageSize: 5,
             pageSizeOptions: [
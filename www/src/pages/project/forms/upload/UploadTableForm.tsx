@@ -160,7 +160,8 @@ export const UploadPhase2 = withStyles(styles)(
           projectId,
           uploadingTable.file,
           uploadingTable.table.parserOpts,
-          tableIndex
+          tableIndex,
+          uploadingTable.table.uploadToken
         )
         .then((result) => {
           destroy();
@@ -229,7 +230,13 @@ export const UploadTableForm = ({
         uploadingTable={uploadingTable!}
         setParserOpts={(opts) => {
           projectStore
-            .uploadTable(project.id, uploadingTable!.file, opts)
+            .uploadTable(
+              project.id,
+              uploadingTable!.file,
+              opts,
+              undefined,
+              uploadingTable!.table.uploadToken
+            )
             .then((tbl) => {
               if (Array.isArray(tbl)) {
                 throw new Error("Error");